@@ -25,15 +25,34 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 Thank you for using free software!
 """
 
+import json
 import os
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
 
-from aqt import gui_hooks
+from aqt import gui_hooks, mw
 from aqt.overview import Overview
-from aqt.webview import AnkiWebView
 
-from .config import AddonConfig
-from .data import DeckData
-from .table import Table
+from .instrumentation import backend_calls, phase_timings
+
+# Only needed for type hints. The add-on's modules are imported on first use
+# to keep Anki's startup fast.
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+    from anki.cards import Card
+    from aqt.reviewer import Reviewer
+    from aqt.webview import AnkiWebView
+
+    from .cache import CardState, SearchCache, StatsCache
+    from .config import AddonConfig
+    from .data import DeckData
+    from .forecast import ForecastEngine
+    from .history import StatsHistory
+    from .query import QueryPlanner
+    from .scheduler import RefreshScheduler
+    from .snapshot import RenderSnapshot
+    from .table import Table
 
 
 def overview_table(self) -> str:
@@ -49,50 +68,341 @@ def overview_table(self) -> str:
         contain cards.
     """
 
-    deck_data.refresh()
+    _refresh_deck_data()
 
-    if deck_data.is_empty_deck():
-        return "<p>No cards found.</p>"
+    with phase_timings.phase("html"):
+        return _get_table_html()
 
-    return table.get_html()
 
+def compute_stats_in_background(
+    snapshot: "RenderSnapshot", key: Tuple[int, int]
+) -> None:
+    """Compute the current deck's stats on a background thread.
+
+    The cards are counted in chunks, so the main thread can use the
+    collection in between. Renders requesting the stats of the same deck
+    while they are computed share the running computation. Once done, the
+    cells of the table shown with the last known stats are updated with the
+    current stats.
+
+    Parameters
+    ----------
+    snapshot : RenderSnapshot
+        The snapshot of the render showing the last known stats.
+    key : Tuple[int, int]
+        The deck id and collection modification time the render refreshed
+        the stats for, as read by `DeckData.get_refresh_state`.
+    """
+
+    def on_done(future: "Future") -> None:
+        try:
+            card_counts = future.result()
+        except Exception as e:
+            print(e)
+            return None
+
+        # Discard the results if another deck was opened in the meantime
+        if deck_data.snapshot is None or deck_data.snapshot.deck_id != snapshot.deck_id:
+            return None
+
+        deck_data.apply_card_counts(card_counts)
+        update_table(mw.web, _replace_table)
+
+    refresh_scheduler.run_in_background(
+        key,
+        lambda: deck_data.query_card_counts(snapshot, streaming=True),
+        on_done,
+    )
+
+
+def update_table(
+    web: "AnkiWebView", show_table: Callable[["AnkiWebView", str], None]
+) -> None:
+    """Update the cells of the table shown in the webview to the current stats.
+
+    Only the contents of the cells that changed since the table was last
+    rendered are sent to the webview. If the webview doesn't show the table or
+    the table's layout changed, e.g. because the deck was finished, the
+    complete table is passed to `show_table` instead.
+
+    Parameters
+    ----------
+    web : AnkiWebView
+        The webview showing the table.
+    show_table : Callable[[AnkiWebView, str], None]
+        Shows the given HTML code instead of the webview's table.
+    """
+
+    from .templates import diff_cell_values
+
+    if not deck_data.is_loading and deck_data.is_empty_deck():
+        show_table(web, _get_table_html())
+        return None
+
+    cells: Optional[Dict[str, str]] = diff_cell_values(
+        table.rendered_values, table.get_cell_values()
+    )
+    if cells is None:
+        show_table(web, _get_table_html())
+        return None
 
-def prepend_table(web: AnkiWebView) -> None:
+    def on_updated(updated: bool) -> None:
+        # The table isn't shown or was shown before the update function was
+        # defined
+        if not updated:
+            show_table(web, _get_table_html())
+
+    table.rendered_values = {**table.rendered_values, **cells}
+    web.evalWithCallback(
+        "window.moreOverviewStats !== undefined && moreOverviewStats.update(%s)"
+        % json.dumps(cells, separators=(",", ":")),
+        on_updated,
+    )
+
+
+def prepend_table(web: "AnkiWebView") -> None:
     """Prepend the overview table to Anki's congrats dialog."""
 
     page_uri: str = os.path.basename(web.page().url().path())
     if page_uri != "congrats.html":
         return None
 
+    _refresh_deck_data()
+
+    # Anki can call the hook more than once, so the table is only injected if
+    # the page doesn't contain it yet. Otherwise only the changed cells are
+    # updated.
+    with phase_timings.phase("inject"):
+        update_table(web, _inject_table)
+
+
+def on_js_message(
+    handled: Tuple[bool, Any], message: str, context: Any
+) -> Tuple[bool, Any]:
+    """Show the subdeck breakdown once the user expands it."""
+
+    # Every message of every webview passes this hook, so the add-on's
+    # modules are only imported once the overview table was shown
+    if table is None:
+        return handled
+
+    from .templates import SUBDECK_MESSAGE
+
+    if message != SUBDECK_MESSAGE:
+        return handled
+
+    subdeck_html: str = table.get_subdeck_html()
+    mw.web.eval(
+        """
+        (function () {
+            const subdecks = document.querySelector("#more-overview-stats-subdecks > .subdecks");
+            if (subdecks != null) {
+                subdecks.innerHTML = %s;
+            }
+        })();
+        """
+        % json.dumps(subdeck_html)
+    )
+
+    return (True, None)
+
+
+def remember_card_state(card: "Card") -> None:
+    """Remember the states of the shown card and its siblings."""
+
+    if stats_cache is None:
+        return None
+
+    stats_cache.remember_cards(_get_note_card_states(card), mw.col.mod)
+
+
+def update_card_state(reviewer: "Reviewer", card: "Card", ease: int) -> None:
+    """Apply the answered card's new state to the cached deck stats.
+
+    The states of its siblings are applied too, since answering a card can
+    bury them.
+    """
+
+    if stats_cache is None:
+        return None
+
+    stats_cache.apply_card_changes(
+        _get_note_card_states(card), mw.col.mod, round(time.time())
+    )
+
+
+def on_profile_did_open() -> None:
+    """Reset all profile specific state if the add-on was used before."""
+
+    if deck_data is None:
+        return None
+
+    stats_cache.load(STATS_SNAPSHOT_PATH, mw.pm.name)
+    search_cache.clear()
+    stats_history.load(STATS_HISTORY_PATH, mw.pm.name)
+    forecast_engine.clear()
+    refresh_scheduler.clear()
+
+
+def on_profile_will_close() -> None:
+    """Save the stats to show the next session's first overview right away."""
+
+    if stats_cache is not None:
+        stats_cache.save()
+
+
+def on_config_updated(new_config: Any) -> None:
+    """Reload the config on the next render after the user changed it."""
+
+    if config is not None:
+        config.invalidate()
+        refresh_scheduler.clear()
+
+
+# Return the states of all cards of a card's note
+def _get_note_card_states(card: "Card") -> List["CardState"]:
+    from .cache import CardState
+
+    return [
+        CardState(did=did, queue=queue, ivl=ivl, due=due)
+        for did, queue, ivl, due in mw.col.db.all(
+            "select did, queue, ivl, due from cards where nid = ?", card.nid
+        )
+    ]
+
+
+# Refresh the current deck's stats, computing them in the background if enabled
+def _refresh_deck_data() -> None:
+    _initialize()
+
+    # Count the backend calls of every render, including coalesced ones
+    backend_calls.reset()
+
+    # Bursts of redraws of the same deck reuse the first refresh
+    with phase_timings.phase("refresh"):
+        deck, mod = deck_data.get_refresh_state()
+        key: Tuple[int, int] = (deck["id"], mod)
+        refresh_scheduler.refresh(key, lambda: deck_data.refresh(deck, mod))
+
+    if deck_data.is_loading:
+        compute_stats_in_background(deck_data.snapshot, key)
+
+
+# Return the HTML code of the current deck's table
+def _get_table_html() -> str:
+    if not deck_data.is_loading and deck_data.is_empty_deck():
+        return "<p>No cards found.</p>"
+
+    return table.get_html()
+
+
+# Replace the table shown in Anki's overview page
+def _replace_table(web: "AnkiWebView", html: str) -> None:
+    web.eval(
+        """
+        (function () {
+            const table = document.getElementById("more-overview-stats");
+            if (table != null) {
+                table.outerHTML = %s;
+            }
+        })();
+        """
+        % json.dumps(html)
+    )
+
+
+# Add the table to Anki's congrats dialog or replace the table shown in it
+def _inject_table(web: "AnkiWebView", html: str) -> None:
+    from .templates import UPDATE_SCRIPT
+
     html_style: str = """
     <style>
         #table {margin: 0 auto; display: table}
     </style>
     """
 
-    # Need to check if id "table" already exists to avoid adding the table
-    # multiple times because Anki can call the hook more than once
     web.eval(
         """
-        if (document.getElementById("table") == null) {
-            div = document.createElement("div");
-            div.id = "table";
-            div.innerHTML = `"""
-        + html_style
-        + overview_table(Overview)
-        + """`;
-            document.body.prepend(div);
-        }
+        (function () {
+            let div = document.getElementById("table");
+            if (div == null) {
+                div = document.createElement("div");
+                div.id = "table";
+                document.body.prepend(div);
+            }
+            div.innerHTML = %s;
+        })();
         """
+        % json.dumps(html_style + html)
+        + UPDATE_SCRIPT
     )
 
 
-# Load addon config
-config = AddonConfig()
-# Initialize data manager
-deck_data = DeckData(config=config)
-# Initialize table manager
-table = Table(config=config, deck_data=deck_data)
+# Create the add-on's objects on first use
+def _initialize() -> None:
+    global config, stats_cache, search_cache, stats_history, query_planner
+    global forecast_engine, deck_data, table, refresh_scheduler
+
+    if deck_data is not None:
+        return None
+
+    from .cache import SearchCache, StatsCache
+    from .config import AddonConfig
+    from .data import DeckData
+    from .forecast import ForecastEngine
+    from .history import StatsHistory
+    from .query import QueryPlanner
+    from .scheduler import RefreshScheduler
+    from .table import Table
+
+    # Load addon config
+    config = AddonConfig()
+    # Initialize stats cache and restore the stats of the last session
+    stats_cache = StatsCache()
+    stats_cache.load(STATS_SNAPSHOT_PATH, mw.pm.name)
+    # Initialize search cache
+    search_cache = SearchCache()
+    # Initialize stats history
+    stats_history = StatsHistory()
+    stats_history.load(STATS_HISTORY_PATH, mw.pm.name)
+    # Initialize query planner
+    query_planner = QueryPlanner()
+    # Initialize forecast engine
+    forecast_engine = ForecastEngine()
+    # Initialize data manager
+    deck_data = DeckData(
+        config=config,
+        stats_cache=stats_cache,
+        search_cache=search_cache,
+        query_planner=query_planner,
+        forecast_engine=forecast_engine,
+        stats_history=stats_history,
+    )
+    # Initialize table manager
+    table = Table(config=config, deck_data=deck_data)
+    # Initialize refresh scheduler
+    refresh_scheduler = RefreshScheduler(mw.taskman.run_in_background)
+
+
+# The file the stats are saved to when closing a profile
+STATS_SNAPSHOT_PATH: str = os.path.join(
+    os.path.dirname(__file__), "user_files", "stats_snapshot.sqlite"
+)
+# The file the daily stats of every deck are recorded in
+STATS_HISTORY_PATH: str = os.path.join(
+    os.path.dirname(__file__), "user_files", "stats_history.sqlite"
+)
+
+# The add-on's objects, created by `_initialize` on the first overview render
+config: Optional["AddonConfig"] = None
+stats_cache: Optional["StatsCache"] = None
+search_cache: Optional["SearchCache"] = None
+stats_history: Optional["StatsHistory"] = None
+query_planner: Optional["QueryPlanner"] = None
+forecast_engine: Optional["ForecastEngine"] = None
+deck_data: Optional["DeckData"] = None
+table: Optional["Table"] = None
+refresh_scheduler: Optional["RefreshScheduler"] = None
 
 # Overwrite Anki's stats table
 Overview._table = overview_table
@@ -101,3 +411,13 @@ try:
     gui_hooks.webview_did_inject_style_into_page.append(prepend_table)
 except Exception as excp:
     print(excp)
+# Load the subdeck breakdown when it is expanded
+gui_hooks.webview_did_receive_js_message.append(on_js_message)
+# Reload the config only after the user changed it
+mw.addonManager.setConfigUpdatedAction(__name__, on_config_updated)
+# Keep the cached stats up to date while reviewing
+gui_hooks.reviewer_did_show_question.append(remember_card_state)
+gui_hooks.reviewer_did_answer_card.append(update_card_state)
+# Restore and save the stats of every profile
+gui_hooks.profile_did_open.append(on_profile_did_open)
+gui_hooks.profile_will_close.append(on_profile_will_close)
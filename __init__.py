@@ -1 +1,6 @@
-from . import More_Overview_Stats_2_1
+import sys
+
+# Anki imports aqt before loading any add-on. Without it only the modules not
+# depending on Anki, like the headless report, can be used.
+if "aqt" in sys.modules:
+    from . import More_Overview_Stats_2_1
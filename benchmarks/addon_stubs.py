@@ -0,0 +1,166 @@
+"""
+Load the add-on's modules outside of Anki.
+
+Registers minimal stand-ins for the parts of `aqt` used by the add-on, so its
+modules can be imported and benchmarked without a running Anki instance. The
+add-on's entry point (`__init__.py`) is skipped, so no hooks are installed.
+"""
+
+import importlib
+import json
+import os
+import sqlite3
+import sys
+import time
+import types
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+ADDON_DIR: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_NAME: str = "more_overview_stats"
+
+
+class StubAddonManager:
+    """Serves the add-on's default config like Anki's add-on manager."""
+
+    def __init__(self) -> None:
+        with open(os.path.join(ADDON_DIR, "config.json"), encoding="utf-8") as file:
+            self.config: Dict[str, Any] = json.load(file)
+
+    def getConfig(self, module: str) -> Dict[str, Any]:
+        return json.loads(json.dumps(self.config))
+
+
+class StubMainWindow:
+    """Stands in for `aqt.mw`. The collection has to be set by the caller."""
+
+    def __init__(self) -> None:
+        self.addonManager = StubAddonManager()
+        self.col: Optional[Any] = None
+
+    def button(self, link: str, name: str, id: str = "", extra: str = "") -> str:
+        return f'<button id="{id}" onclick="pycmd(\'{link}\')" {extra}>{name}</button>'
+
+
+class StubDB:
+    """Serves queries like Anki's db object from a SQLite connection."""
+
+    def __init__(self, connection: sqlite3.Connection) -> None:
+        self._connection: sqlite3.Connection = connection
+
+    def all(self, sql: str, *args: Any) -> List[List[Any]]:
+        return [list(row) for row in self._connection.execute(sql, args)]
+
+    def first(self, sql: str, *args: Any) -> Optional[List[Any]]:
+        row: Optional[Tuple[Any, ...]] = self._connection.execute(sql, args).fetchone()
+        return list(row) if row is not None else None
+
+    def scalar(self, sql: str, *args: Any) -> Any:
+        row: Optional[Tuple[Any, ...]] = self._connection.execute(sql, args).fetchone()
+        return row[0] if row is not None else None
+
+
+class DeckNameId(NamedTuple):
+    name: str
+    id: int
+
+
+class StubDecks:
+    """Stands in for `mw.col.decks`, reading the decks table."""
+
+    def __init__(self, db: StubDB, current_deck_id: int) -> None:
+        self._db: StubDB = db
+        self.current_deck_id: int = current_deck_id
+
+    def current(self) -> Dict[str, Any]:
+        name: str = self._db.scalar(
+            "select name from decks where id = ?", self.current_deck_id
+        )
+        return {"id": self.current_deck_id, "name": name}
+
+    def all_names_and_ids(self) -> List[DeckNameId]:
+        rows: List[List[Any]] = self._db.all("select id, name from decks")
+        return [DeckNameId(name, deck_id) for deck_id, name in rows]
+
+    def config_dict_for_deck_id(self, deck_id: int) -> Dict[str, Any]:
+        return {"new": {"perDay": 20}}
+
+
+class StubScheduler:
+    """Stands in for `mw.col.sched` with fixed counts."""
+
+    def __init__(self, db: StubDB, decks: StubDecks) -> None:
+        self._db: StubDB = db
+        self._decks: StubDecks = decks
+
+    @property
+    def today(self) -> int:
+        return int(time.time() // 86400)
+
+    def counts(self) -> Tuple[int, int, int]:
+        return (20, 5, 100)
+
+    def _deckLimit(self) -> str:
+        name: str = self._decks.current()["name"]
+        deck_ids: List[List[int]] = self._db.all(
+            "select id from decks where name = ? or substr(name, 1, ?) = ?",
+            name,
+            len(name) + 2,
+            name + "::",
+        )
+        return "(" + ", ".join(str(deck_id) for deck_id, in deck_ids) + ")"
+
+
+class StubCollection:
+    """Stands in for `mw.col` backed by a SQLite file.
+
+    Parameters
+    ----------
+    path : str
+        The path of the collection file, e.g. a synthetic collection.
+    current_deck_id : int
+        The id of the deck shown in the overview.
+    """
+
+    def __init__(self, path: str, current_deck_id: int = 1) -> None:
+        self.db = StubDB(sqlite3.connect(path))
+        self.decks = StubDecks(self.db, current_deck_id)
+        self.sched = StubScheduler(self.db, self.decks)
+
+    @property
+    def mod(self) -> int:
+        return self.db.scalar("select mod from col")
+
+
+def install_stubs() -> StubMainWindow:
+    """Register the `aqt` stand-ins and return the stubbed main window.
+
+    The add-on's modules keep the main window they were imported with, so the
+    stand-ins are only registered once and reused by later calls.
+    """
+
+    if "aqt" in sys.modules and isinstance(sys.modules["aqt"].mw, StubMainWindow):
+        return sys.modules["aqt"].mw
+
+    main_window = StubMainWindow()
+
+    aqt = types.ModuleType("aqt")
+    aqt.mw = main_window
+    aqt_utils = types.ModuleType("aqt.utils")
+    aqt_utils.showInfo = lambda *args, **kwargs: print(*args)
+    aqt.utils = aqt_utils
+
+    sys.modules["aqt"] = aqt
+    sys.modules["aqt.utils"] = aqt_utils
+
+    return main_window
+
+
+def load_module(name: str) -> types.ModuleType:
+    """Import one of the add-on's modules, e.g. "table", by its name."""
+
+    if PACKAGE_NAME not in sys.modules:
+        package = types.ModuleType(PACKAGE_NAME)
+        package.__path__ = [ADDON_DIR]
+        sys.modules[PACKAGE_NAME] = package
+
+    return importlib.import_module(f"{PACKAGE_NAME}.{name}")
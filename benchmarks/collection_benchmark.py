@@ -0,0 +1,154 @@
+"""
+Benchmark the add-on's hot paths against synthetic collections.
+
+Generates a synthetic collection for every requested size and measures:
+
+- refresh (cold): `DeckData.refresh()` with an empty stats cache, i.e. the
+  card count query of the root deck covering every card
+- refresh (warm): `DeckData.refresh()` served from the stats cache
+- streaming: `DeckData.query_card_counts()` aggregating the cards in chunks
+  like the background computation does
+- render: `Table.get_html()`
+- all decks: `DeckData.get_all_deck_stats()`
+
+Reports latency percentiles and the peak memory allocated by Python. Sizes
+up to several million cards are supported, e.g. `--cards 10000 5000000`.
+
+Usage: python benchmarks/collection_benchmark.py [--cards N [N ...]] [--runs R]
+       [--depth D] [--breadth B] [--queue-weights QUEUE=WEIGHT [QUEUE=WEIGHT ...]]
+       [--mean-interval DAYS]
+
+See `synthetic_collection.py` for the options shaping the collections.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Sequence
+
+from addon_stubs import StubCollection, install_stubs, load_module
+from synthetic_collection import (
+    add_collection_arguments,
+    generate_collection,
+    override_queue_weights,
+)
+
+
+def percentile(timings: Sequence[float], fraction: float) -> float:
+    """Return the percentile of sorted timings using the nearest rank."""
+
+    index: int = min(len(timings) - 1, max(0, round(fraction * len(timings)) - 1))
+    return timings[index]
+
+
+def measure(run: Callable[[], object], runs: int) -> Dict[str, float]:
+    """Run a function repeatedly and return its latency and memory stats.
+
+    Returns
+    -------
+    Dict[str, float]
+        The 50th, 90th and 99th percentile and maximum latency in
+        milliseconds and the peak memory allocated by Python in KiB.
+    """
+
+    timings: List[float] = []
+    tracemalloc.start()
+
+    for _ in range(runs):
+        start: float = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    timings.sort()
+
+    return {
+        "p50": percentile(timings, 0.5),
+        "p90": percentile(timings, 0.9),
+        "p99": percentile(timings, 0.99),
+        "max": timings[-1],
+        "peak_kib": peak / 1024,
+    }
+
+
+def benchmark_collection(path: str, runs: int) -> Dict[str, Dict[str, float]]:
+    """Measure all benchmarked paths against a collection file."""
+
+    main_window = install_stubs()
+    main_window.col = StubCollection(path)
+
+    AddonConfig = load_module("config").AddonConfig
+    StatsCache = load_module("cache").StatsCache
+    SearchCache = load_module("cache").SearchCache
+    DeckData = load_module("data").DeckData
+    QueryPlanner = load_module("query").QueryPlanner
+    ForecastEngine = load_module("forecast").ForecastEngine
+    StatsHistory = load_module("history").StatsHistory
+    Table = load_module("table").Table
+
+    config = AddonConfig()
+    stats_cache = StatsCache()
+    deck_data = DeckData(
+        config=config,
+        stats_cache=stats_cache,
+        search_cache=SearchCache(),
+        query_planner=QueryPlanner(),
+        forecast_engine=ForecastEngine(),
+        stats_history=StatsHistory(),
+    )
+    table = Table(config=config, deck_data=deck_data)
+
+    def refresh_cold() -> None:
+        stats_cache.clear()
+        deck_data.refresh()
+
+    results: Dict[str, Dict[str, float]] = {}
+    results["refresh (cold)"] = measure(refresh_cold, runs)
+    results["refresh (warm)"] = measure(deck_data.refresh, runs)
+    results["streaming"] = measure(
+        lambda: deck_data.query_card_counts(deck_data.snapshot, streaming=True), runs
+    )
+    results["render"] = measure(table.get_html, runs)
+    results["all decks"] = measure(deck_data.get_all_deck_stats, runs)
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--cards", type=int, nargs="+", default=[10000, 100000, 1000000]
+    )
+    parser.add_argument("--runs", type=int, default=20)
+    add_collection_arguments(parser)
+    args = parser.parse_args()
+
+    print(
+        f"{'cards':>9} {'path':<15} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} "
+        f"{'max ms':>9} {'peak KiB':>9}"
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        for cards in args.cards:
+            path: str = os.path.join(directory, f"collection_{cards}.anki2")
+            generate_collection(
+                path,
+                cards,
+                depth=args.depth,
+                breadth=args.breadth,
+                queue_weights=override_queue_weights(args.queue_weights),
+                mean_interval=args.mean_interval,
+            )
+
+            for name, stats in benchmark_collection(path, args.runs).items():
+                print(
+                    f"{cards:>9} {name:<15} {stats['p50']:>9.2f} {stats['p90']:>9.2f} "
+                    f"{stats['p99']:>9.2f} {stats['max']:>9.2f} {stats['peak_kib']:>9.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+Generate synthetic Anki collections for benchmarking.
+
+Creates a SQLite file with the parts of Anki's schema read by the add-on: the
+`col`, `decks` and `cards` tables including Anki's indexes on `cards`. All
+decks are placed below a single root deck named "Benchmark", so the root's
+overview covers every card.
+
+Usage: python benchmarks/synthetic_collection.py PATH [--cards N] [--depth D]
+       [--breadth B] [--queue-weights QUEUE=WEIGHT [QUEUE=WEIGHT ...]]
+       [--mean-interval DAYS] [--seed S]
+
+The queue weights override the default share of the given queues, e.g.
+`--queue-weights new=0.6 review=0.3` for a collection with mostly new cards.
+The queues are named new, learning, review, day-learning, suspended,
+sched-buried and user-buried. A weight of 0 leaves a queue out.
+"""
+
+import argparse
+import random
+import sqlite3
+import time
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+ROOT_DECK_NAME: str = "Benchmark"
+
+# The share of cards in each queue, loosely based on a long-used collection
+DEFAULT_QUEUE_WEIGHTS: Dict[int, float] = {
+    0: 0.30,  # new
+    1: 0.02,  # learning
+    2: 0.55,  # review
+    3: 0.01,  # day learning
+    -1: 0.08,  # suspended
+    -2: 0.02,  # buried by the scheduler
+    -3: 0.02,  # buried by the user
+}
+
+# The queues by the names used on the command line
+QUEUE_NAMES: Dict[str, int] = {
+    "new": 0,
+    "learning": 1,
+    "review": 2,
+    "day-learning": 3,
+    "suspended": -1,
+    "sched-buried": -2,
+    "user-buried": -3,
+}
+
+# The mean interval in days of cards that were reviewed before
+DEFAULT_MEAN_INTERVAL: float = 40.0
+
+_SCHEMA: str = """
+    create table col (
+        id integer primary key, crt integer, mod integer, scm integer,
+        ver integer, dty integer, usn integer, ls integer, conf text,
+        models text, decks text, dconf text, tags text
+    );
+    create table decks (
+        id integer primary key not null, name text not null, mtime_secs integer,
+        usn integer, common blob, kind blob
+    );
+    create table cards (
+        id integer primary key, nid integer not null, did integer not null,
+        ord integer not null, mod integer not null, usn integer not null,
+        type integer not null, queue integer not null, due integer not null,
+        ivl integer not null, factor integer not null, reps integer not null,
+        lapses integer not null, left integer not null, odue integer not null,
+        odid integer not null, flags integer not null, data text not null
+    );
+    create index ix_cards_usn on cards (usn);
+    create index ix_cards_nid on cards (nid);
+    create index ix_cards_sched on cards (did, queue, due);
+"""
+
+# The card type of every queue
+_TYPES: Dict[int, int] = {0: 0, 1: 1, 2: 2, 3: 3, -1: 2, -2: 2, -3: 2}
+
+_BATCH_SIZE: int = 50000
+_PLACEHOLDERS: str = ", ".join("?" * 18)
+
+
+def build_deck_tree(depth: int, breadth: int) -> List[Tuple[int, str]]:
+    """Return the ids and names of a deck tree below the root deck.
+
+    Parameters
+    ----------
+    depth : int
+        The number of subdeck levels below the root deck.
+    breadth : int
+        The number of subdecks of every deck.
+
+    Returns
+    -------
+    List[Tuple[int, str]]
+        The id and full name of every deck, starting with the root deck.
+    """
+
+    decks: List[Tuple[int, str]] = [(1, ROOT_DECK_NAME)]
+    level: List[str] = [ROOT_DECK_NAME]
+
+    for _ in range(depth):
+        level = [
+            f"{parent}::Deck {index + 1}"
+            for parent in level
+            for index in range(breadth)
+        ]
+        decks.extend((len(decks) + 1, name) for name in level)
+
+    return decks
+
+
+def generate_cards(
+    cards: int,
+    deck_ids: List[int],
+    queue_weights: Dict[int, float],
+    mean_interval: float,
+    now: int,
+    seed: int,
+) -> Iterator[Tuple[int, ...]]:
+    """Yield the rows of randomly scheduled cards.
+
+    Parameters
+    ----------
+    cards : int
+        The number of cards.
+    deck_ids : List[int]
+        The decks the cards are spread across evenly.
+    queue_weights : Dict[int, float]
+        The share of cards in each queue.
+    mean_interval : float
+        The mean interval of cards that were reviewed before in days.
+    now : int
+        The time the collection is generated at in seconds since epoch.
+    seed : int
+        The seed of the random number generator.
+    """
+
+    rng = random.Random(seed)
+    queues: List[int] = list(queue_weights)
+    weights: List[float] = list(queue_weights.values())
+    today: int = 1000
+
+    for card_id in range(1, cards + 1):
+        queue: int = rng.choices(queues, weights)[0]
+
+        if queue == 0:
+            ivl, due = 0, card_id
+        elif queue == 1:
+            ivl, due = 0, now + rng.randint(-3600, 3600)
+        else:
+            ivl = max(1, round(rng.expovariate(1 / mean_interval)))
+            due = today + rng.randint(-ivl, ivl)
+
+        yield (
+            card_id,  # id
+            (card_id + 1) // 2,  # nid, two cards per note
+            deck_ids[card_id % len(deck_ids)],  # did
+            card_id % 2,  # ord
+            now,  # mod
+            0,  # usn
+            _TYPES[queue],  # type
+            queue,  # queue
+            due,  # due
+            ivl,  # ivl
+            0 if queue == 0 else rng.randint(1300, 3000),  # factor
+            0,  # reps
+            0,  # lapses
+            0,  # left
+            0,  # odue
+            0,  # odid
+            0,  # flags
+            "",  # data
+        )
+
+
+def generate_collection(
+    path: str,
+    cards: int,
+    depth: int = 2,
+    breadth: int = 5,
+    queue_weights: Dict[int, float] = DEFAULT_QUEUE_WEIGHTS,
+    mean_interval: float = DEFAULT_MEAN_INTERVAL,
+    seed: int = 0,
+) -> List[Tuple[int, str]]:
+    """Write a synthetic collection to a new SQLite file.
+
+    Parameters
+    ----------
+    path : str
+        The path of the file.
+    cards : int
+        The number of cards.
+    depth : int
+        The number of subdeck levels below the root deck.
+    breadth : int
+        The number of subdecks of every deck.
+    queue_weights : Dict[int, float]
+        The share of cards in each queue.
+    mean_interval : float
+        The mean interval of cards that were reviewed before in days.
+    seed : int
+        The seed of the random number generator.
+
+    Returns
+    -------
+    List[Tuple[int, str]]
+        The id and full name of every deck, starting with the root deck.
+    """
+
+    now: int = round(time.time())
+    decks: List[Tuple[int, str]] = build_deck_tree(depth, breadth)
+    deck_ids: List[int] = [deck_id for deck_id, _ in decks]
+
+    connection = sqlite3.connect(path)
+    connection.executescript(_SCHEMA)
+    connection.execute(
+        "insert into col (id, crt, mod, scm, ver) values (1, ?, ?, ?, 18)",
+        (now - 86400 * 1000, now * 1000, now * 1000),
+    )
+    connection.executemany("insert into decks (id, name) values (?, ?)", decks)
+
+    rows: List[Tuple[int, ...]] = []
+    for row in generate_cards(cards, deck_ids, queue_weights, mean_interval, now, seed):
+        rows.append(row)
+        if len(rows) == _BATCH_SIZE:
+            connection.executemany(f"insert into cards values ({_PLACEHOLDERS})", rows)
+            rows = []
+    connection.executemany(f"insert into cards values ({_PLACEHOLDERS})", rows)
+
+    connection.commit()
+    connection.close()
+
+    return decks
+
+
+def parse_queue_weight(text: str) -> Tuple[int, float]:
+    """Parse a queue weight given on the command line like "new=0.3".
+
+    Raises
+    ------
+    argparse.ArgumentTypeError
+        If the text isn't a queue name and a non-negative weight.
+    """
+
+    name, _, weight = text.partition("=")
+
+    try:
+        parsed_weight: float = float(weight)
+    except ValueError:
+        parsed_weight = -1.0
+
+    if name not in QUEUE_NAMES or parsed_weight < 0:
+        raise argparse.ArgumentTypeError(
+            f"expected QUEUE=WEIGHT with QUEUE one of {', '.join(QUEUE_NAMES)} "
+            f"and a non-negative WEIGHT, got {text!r}"
+        )
+
+    return QUEUE_NAMES[name], parsed_weight
+
+
+def override_queue_weights(
+    overrides: Sequence[Tuple[int, float]]
+) -> Dict[int, float]:
+    """Return the default queue weights with the given queues' weights replaced.
+
+    Queues with a weight of 0 are left out.
+    """
+
+    weights: Dict[int, float] = {**DEFAULT_QUEUE_WEIGHTS, **dict(overrides)}
+
+    return {queue: weight for queue, weight in weights.items() if weight > 0}
+
+
+def add_collection_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the options shaping the generated collection to a parser."""
+
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--breadth", type=int, default=5)
+    parser.add_argument(
+        "--queue-weights",
+        type=parse_queue_weight,
+        nargs="+",
+        default=[],
+        metavar="QUEUE=WEIGHT",
+        help="the share of cards in the given queues",
+    )
+    parser.add_argument(
+        "--mean-interval",
+        type=float,
+        default=DEFAULT_MEAN_INTERVAL,
+        metavar="DAYS",
+        help="the mean interval of cards that were reviewed before",
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("path", help="the file to write the collection to")
+    parser.add_argument("--cards", type=int, default=100000)
+    add_collection_arguments(parser)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate_collection(
+        args.path,
+        args.cards,
+        depth=args.depth,
+        breadth=args.breadth,
+        queue_weights=override_queue_weights(args.queue_weights),
+        mean_interval=args.mean_interval,
+        seed=args.seed,
+    )
@@ -0,0 +1,93 @@
+"""
+Micro-benchmark of a single overview table render.
+
+Reports the absolute time of a whole render and of its steps. Substituting
+the cell values into the precompiled sections, which only joins them with
+the sections' static parts, is compared against formatting the same rows as
+a `str.format` template, which parses the template on every render.
+
+Usage: python benchmarks/table_render.py [renders]
+"""
+
+import sys
+import timeit
+from typing import Callable
+
+from addon_stubs import install_stubs, load_module
+
+# The number of times all renders are timed
+REPEATS: int = 5
+
+
+# Return the time of a single call in microseconds, the fastest of several
+# runs being the least disturbed by other processes
+def time_call(run: Callable[[], object], renders: int) -> float:
+    return min(timeit.repeat(run, number=renders, repeat=REPEATS)) / renders * 1e6
+
+
+def main(renders: int) -> None:
+    install_stubs()
+    AddonConfig = load_module("config").AddonConfig
+    StatsCache = load_module("cache").StatsCache
+    SearchCache = load_module("cache").SearchCache
+    DeckData = load_module("data").DeckData
+    RenderSnapshot = load_module("snapshot").RenderSnapshot
+    QueryPlanner = load_module("query").QueryPlanner
+    ForecastEngine = load_module("forecast").ForecastEngine
+    StatsHistory = load_module("history").StatsHistory
+    Table = load_module("table").Table
+    templates = load_module("templates")
+
+    config = AddonConfig()
+    deck_data = DeckData(
+        config=config,
+        stats_cache=StatsCache(),
+        search_cache=SearchCache(),
+        query_planner=QueryPlanner(),
+        forecast_engine=ForecastEngine(),
+        stats_history=StatsHistory(),
+    )
+    deck_data.snapshot = RenderSnapshot(
+        deck={"id": 1, "name": "Default"},
+        scheduled_counts=[20, 5, 100],
+        deck_limit="(1)",
+        mod=0,
+        config=config,
+    )
+    deck_data._refresh_card_counts([40000, 21000, 9000, 8000, 200, 1800, 30])
+    table = Table(config=config, deck_data=deck_data)
+
+    sections = (table._study_section, table._deck_section)
+    values = table.get_cell_values()
+    # The same rows as templates with a positional slot for every value cell
+    format_templates = [
+        "{}".join(
+            part.replace("{", "{{").replace("}", "}}") for part in section.parts
+        )
+        for section in sections
+    ]
+
+    def format_sections() -> None:
+        for section, template in zip(sections, format_templates):
+            template.format(*[values[cell] for cell in section.cells])
+
+    def join_sections() -> None:
+        for section in sections:
+            templates.render_section(section, values)
+
+    render: float = time_call(table.get_html, renders)
+    cell_values: float = time_call(table.get_cell_values, renders)
+    before: float = time_call(format_sections, renders)
+    after: float = time_call(join_sections, renders)
+
+    print(f"renders: {renders}")
+    print(f"whole render:                        {render:8.1f} us")
+    print(f"formatting the cell values:          {cell_values:8.1f} us")
+    print("substituting the cell values into the stat rows:")
+    print(f"  str.format templates (before):     {before:8.1f} us")
+    print(f"  precompiled sections (after):      {after:8.1f} us")
+    print(f"  speedup:                           {before / after:8.2f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,529 @@
+import os
+import sqlite3
+from array import array
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Sequence, Tuple
+
+from .distribution import Distribution
+
+# The typecode of the packed counts and deck ids stored on disk
+_PACKED_TYPECODE: str = "q"
+
+
+class CardState(NamedTuple):
+    """The scheduling state of a single card relevant to the deck stats."""
+
+    did: int
+    queue: int
+    ivl: int
+    due: int
+
+
+class CacheEntry(NamedTuple):
+    """The cached aggregate counts of a single deck.
+
+    Attributes
+    ----------
+    mod : int
+        The collection modification time the counts are valid for.
+    deck_ids : FrozenSet[int]
+        The ids of all decks included in the counts (the deck and its children).
+    values : List[int]
+        The counts as returned by `DeckData._query_db`.
+    next_learning_due : Optional[int]
+        The earliest due time of a learning card that isn't due yet. The "due"
+        count becomes stale once this time is reached. None if there is no such
+        card.
+    is_restored : bool
+        Whether the entry was restored from disk and wasn't queried since.
+    counts_notes : bool
+        Whether the values count notes instead of cards.
+    """
+
+    mod: int
+    deck_ids: FrozenSet[int]
+    values: List[int]
+    next_learning_due: Optional[int]
+    is_restored: bool = False
+    counts_notes: bool = False
+
+
+def classify_card(state: CardState, now: int) -> List[int]:
+    """Return the contribution of a single card to the aggregate counts.
+
+    Mirrors the columns of the aggregate query in `DeckData._query_db` so the
+    cached counts can be adjusted without querying the db again.
+
+    Parameters
+    ----------
+    state : CardState
+        The card's scheduling state.
+    now : int
+        The current time in seconds since epoch.
+
+    Returns
+    -------
+    List[int]
+        The card's counts for total, mature, young, unseen, buried, suspended
+        and due.
+    """
+
+    queue: int = state.queue
+
+    return [
+        1,
+        int(queue == 2 and state.ivl >= 21),
+        int(queue in (1, 3) or (queue == 2 and state.ivl < 21)),
+        int(queue == 0),
+        int(queue in (-2, -3)),
+        int(queue == -1),
+        int(queue == 1 and state.due <= now),
+    ]
+
+
+class StatsCache:
+    """The StatsCache object stores the aggregate card counts per deck.
+
+    Entries are keyed on the deck id and only served while the collection's
+    modification time is unchanged, so unchanged decks are never queried
+    twice. Cards answered in the reviewer are applied to all affected entries
+    as deltas instead of invalidating them.
+
+    The entries can be saved to and restored from a small SQLite file, so the
+    first overview after starting Anki can be shown without querying the
+    collection.
+
+    The interval and ease distribution of every deck is cached next to its
+    counts. It isn't adjusted for answered cards or saved, so it's only
+    served while the collection's modification time is unchanged.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[int, CacheEntry] = {}
+        # The distribution and the collection modification time it is valid
+        # for by deck id
+        self._distributions: Dict[int, Tuple[int, Distribution]] = {}
+        self._pending_cards: Optional[List[CardState]] = None
+        self._pending_mod: Optional[int] = None
+        self._path: Optional[str] = None
+        self._profile: Optional[str] = None
+
+    def get(
+        self, deck_id: int, mod: int, now: int, counts_notes: bool = False
+    ) -> Optional[List[int]]:
+        """Return the cached counts of a deck if they are still valid.
+
+        Parameters
+        ----------
+        deck_id : int
+            The id of the deck.
+        mod : int
+            The current collection modification time.
+        now : int
+            The current time in seconds since epoch.
+        counts_notes : bool
+            Whether note counts are requested instead of card counts.
+
+        Returns
+        -------
+        Optional[List[int]]
+            A copy of the cached counts or None if there is no valid entry.
+        """
+
+        entry: Optional[CacheEntry] = self._entries.get(deck_id)
+        if entry is None or entry.mod != mod or entry.counts_notes != counts_notes:
+            return None
+
+        # Learning cards becoming due change the counts without modifying the
+        # collection
+        if entry.next_learning_due is not None and now >= entry.next_learning_due:
+            return None
+
+        return list(entry.values)
+
+    def get_last(
+        self, deck_id: int, counts_notes: bool = False
+    ) -> Optional[List[int]]:
+        """Return the last known counts of a deck, even if they are outdated.
+
+        Parameters
+        ----------
+        deck_id : int
+            The id of the deck.
+        counts_notes : bool
+            Whether note counts are requested instead of card counts.
+
+        Returns
+        -------
+        Optional[List[int]]
+            A copy of the cached counts or None if the deck was never cached.
+        """
+
+        entry: Optional[CacheEntry] = self._entries.get(deck_id)
+        if entry is None or entry.counts_notes != counts_notes:
+            return None
+
+        return list(entry.values)
+
+    def is_restored(self, deck_id: int) -> bool:
+        """Whether the deck's entry was restored from disk and not queried since.
+
+        Parameters
+        ----------
+        deck_id : int
+            The id of the deck.
+
+        Returns
+        -------
+        bool
+            True if the entry exists and was restored from disk, False otherwise.
+        """
+
+        entry: Optional[CacheEntry] = self._entries.get(deck_id)
+
+        return entry is not None and entry.is_restored
+
+    def put(
+        self,
+        deck_id: int,
+        mod: int,
+        deck_ids: FrozenSet[int],
+        values: List[int],
+        next_learning_due: Optional[int],
+        counts_notes: bool = False,
+    ) -> None:
+        """Store the counts of a deck."""
+
+        self._entries[deck_id] = CacheEntry(
+            mod=mod,
+            deck_ids=deck_ids,
+            values=list(values),
+            next_learning_due=next_learning_due,
+            counts_notes=counts_notes,
+        )
+
+    def get_distribution(
+        self, deck_id: int, mod: int, bucket_bounds: Sequence[int]
+    ) -> Optional[Distribution]:
+        """Return the cached distribution of a deck if it is still valid.
+
+        Parameters
+        ----------
+        deck_id : int
+            The id of the deck.
+        mod : int
+            The current collection modification time.
+        bucket_bounds : Sequence[int]
+            The upper bounds of the requested interval buckets.
+
+        Returns
+        -------
+        Optional[Distribution]
+            The cached distribution or None if there is no valid entry.
+        """
+
+        cached: Optional[Tuple[int, Distribution]] = self._distributions.get(deck_id)
+        if cached is None or cached[0] != mod:
+            return None
+
+        if cached[1].bucket_bounds != tuple(bucket_bounds):
+            return None
+
+        return cached[1]
+
+    def put_distribution(
+        self, deck_id: int, mod: int, distribution: Distribution
+    ) -> None:
+        """Store the interval and ease distribution of a deck."""
+
+        self._distributions[deck_id] = (mod, distribution)
+
+    def clear(self) -> None:
+        """Remove all cached entries, e.g. after switching profiles."""
+
+        self._entries.clear()
+        self._distributions.clear()
+        self._pending_cards = None
+        self._pending_mod = None
+
+    def remember_cards(self, states: Sequence[CardState], mod: int) -> None:
+        """Remember the states of a note's cards before one of them is answered.
+
+        Parameters
+        ----------
+        states : Sequence[CardState]
+            The states of all cards of the shown card's note when its
+            question is shown.
+        mod : int
+            The collection modification time when its question is shown.
+        """
+
+        self._pending_cards = list(states)
+        self._pending_mod = mod
+
+    def apply_card_changes(
+        self, states: Sequence[CardState], mod: int, now: int
+    ) -> None:
+        """Adjust all affected entries after a remembered card was answered.
+
+        Answering a card can change the states of its siblings too, e.g. by
+        burying them, so the states of all cards of the note are compared
+        with the remembered ones. Entries that were already stale before the
+        card was answered are left untouched and will be recomputed on their
+        next lookup.
+
+        Parameters
+        ----------
+        states : Sequence[CardState]
+            The states of all cards of the answered card's note after it was
+            answered.
+        mod : int
+            The collection modification time after the card was answered.
+        now : int
+            The current time in seconds since epoch.
+        """
+
+        old_states: Optional[List[CardState]] = self._pending_cards
+        old_mod: Optional[int] = self._pending_mod
+        self._pending_cards = None
+        self._pending_mod = None
+
+        if old_states is None:
+            return None
+
+        old_counts: List[Tuple[int, List[int]]] = [
+            (state.did, classify_card(state, now)) for state in old_states
+        ]
+        new_counts: List[Tuple[int, List[int]]] = [
+            (state.did, classify_card(state, now)) for state in states
+        ]
+
+        for deck_id, entry in list(self._entries.items()):
+            # A card's change doesn't tell how its note's state changed, so
+            # note counts are queried again
+            if entry.mod != old_mod or entry.counts_notes:
+                continue
+
+            values: List[int] = list(entry.values)
+            for did, counts in old_counts:
+                if did in entry.deck_ids:
+                    values = [value - old for value, old in zip(values, counts)]
+            for did, counts in new_counts:
+                if did in entry.deck_ids:
+                    values = [value + new for value, new in zip(values, counts)]
+
+            next_learning_due: Optional[int] = entry.next_learning_due
+            for state in states:
+                if state.did in entry.deck_ids and state.queue == 1 and state.due > now:
+                    if next_learning_due is None or state.due < next_learning_due:
+                        next_learning_due = state.due
+
+            self._entries[deck_id] = entry._replace(
+                mod=mod, values=values, next_learning_due=next_learning_due
+            )
+
+    def load(self, path: str, profile: str) -> None:
+        """Replace all entries with the ones saved for a profile.
+
+        Parameters
+        ----------
+        path : str
+            The path of the SQLite file storing the entries.
+        profile : str
+            The name of the profile the entries belong to.
+        """
+
+        self.clear()
+        self._path = path
+        self._profile = profile
+
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with sqlite3.connect(path) as connection:
+                rows = connection.execute(
+                    """
+                    select deck_id, mod, next_learning_due, deck_ids, counts
+                    from stats where profile = ?
+                    """,
+                    (profile,),
+                ).fetchall()
+        except sqlite3.Error as e:
+            print(e)
+            return None
+
+        for deck_id, mod, next_learning_due, deck_ids, counts in rows:
+            self._entries[deck_id] = CacheEntry(
+                mod=mod,
+                deck_ids=frozenset(_unpack(deck_ids)),
+                values=_unpack(counts),
+                next_learning_due=next_learning_due,
+                is_restored=True,
+            )
+
+    def save(self) -> None:
+        """Save all entries to the file they were loaded from."""
+
+        if self._path is None:
+            return None
+
+        rows = [
+            (
+                self._profile,
+                deck_id,
+                entry.mod,
+                entry.next_learning_due,
+                _pack(sorted(entry.deck_ids)),
+                _pack(entry.values),
+            )
+            for deck_id, entry in self._entries.items()
+            # Note counts are queried again after restarting Anki
+            if not entry.counts_notes
+        ]
+
+        try:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            with sqlite3.connect(self._path) as connection:
+                connection.execute(
+                    """
+                    create table if not exists stats (
+                        profile text not null,
+                        deck_id integer not null,
+                        mod integer not null,
+                        next_learning_due integer,
+                        deck_ids blob not null,
+                        counts blob not null,
+                        primary key (profile, deck_id)
+                    ) without rowid
+                    """
+                )
+                connection.execute(
+                    "delete from stats where profile = ?", (self._profile,)
+                )
+                connection.executemany(
+                    "insert into stats values (?, ?, ?, ?, ?, ?)", rows
+                )
+        except sqlite3.Error as e:
+            print(e)
+
+
+class SearchCache:
+    """The SearchCache object stores the aggregate counts per search.
+
+    Entries are keyed on the search and only served while the collection's
+    modification time is unchanged, so repeatedly showing the stats of the
+    same search neither resolves the search nor queries the counts again.
+    Only the most recently used searches are kept.
+
+    Parameters
+    ----------
+    max_entries : int
+        The number of searches to keep. Default: 32
+    """
+
+    def __init__(self, max_entries: int = 32) -> None:
+        self._max_entries: int = max_entries
+        # Keyed by the search and whether notes are counted, ordered from the
+        # least to the most recently used entry
+        self._entries: "OrderedDict[Tuple[str, bool], CacheEntry]" = OrderedDict()
+
+    def get(
+        self, search: str, mod: int, now: int, counts_notes: bool = False
+    ) -> Optional[List[int]]:
+        """Return the cached counts of a search if they are still valid.
+
+        Parameters
+        ----------
+        search : str
+            The Anki search.
+        mod : int
+            The current collection modification time.
+        now : int
+            The current time in seconds since epoch.
+        counts_notes : bool
+            Whether note counts are requested instead of card counts.
+
+        Returns
+        -------
+        Optional[List[int]]
+            A copy of the cached counts or None if there is no valid entry.
+        """
+
+        key: Tuple[str, bool] = (search, counts_notes)
+        entry: Optional[CacheEntry] = self._entries.get(key)
+        if entry is None or entry.mod != mod:
+            return None
+
+        # Learning cards becoming due change the counts without modifying the
+        # collection
+        if entry.next_learning_due is not None and now >= entry.next_learning_due:
+            return None
+
+        self._entries.move_to_end(key)
+
+        return list(entry.values)
+
+    def get_last(self, search: str, counts_notes: bool = False) -> Optional[List[int]]:
+        """Return the last known counts of a search, even if they are outdated.
+
+        Parameters
+        ----------
+        search : str
+            The Anki search.
+        counts_notes : bool
+            Whether note counts are requested instead of card counts.
+
+        Returns
+        -------
+        Optional[List[int]]
+            A copy of the cached counts or None if the search was never cached.
+        """
+
+        entry: Optional[CacheEntry] = self._entries.get((search, counts_notes))
+        if entry is None:
+            return None
+
+        return list(entry.values)
+
+    def put(
+        self,
+        search: str,
+        mod: int,
+        values: List[int],
+        next_learning_due: Optional[int],
+        counts_notes: bool = False,
+    ) -> None:
+        """Store the counts of a search."""
+
+        key: Tuple[str, bool] = (search, counts_notes)
+        self._entries[key] = CacheEntry(
+            mod=mod,
+            # Searches aren't limited to any decks
+            deck_ids=frozenset(),
+            values=list(values),
+            next_learning_due=next_learning_due,
+            counts_notes=counts_notes,
+        )
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all cached entries, e.g. after switching profiles."""
+
+        self._entries.clear()
+
+
+# Pack integers into bytes to store them compactly
+def _pack(values: List[int]) -> bytes:
+    return array(_PACKED_TYPECODE, values).tobytes()
+
+
+# Unpack integers packed by `_pack`
+def _unpack(packed: bytes) -> List[int]:
+    values = array(_PACKED_TYPECODE)
+    values.frombytes(packed)
+
+    return values.tolist()
@@ -1,6 +1,16 @@
-from typing import Any, Dict
+import os
+from datetime import date
+from typing import Any, Dict, Optional, Tuple
 
 from aqt import mw
+from aqt.utils import showInfo
+
+from .deck_trie import DeckNameTrie, find_note_correction_factor
+from .instrumentation import backend_calls, phase_timings
+
+# The upper bounds in days of the default interval buckets. The last bucket
+# holds all longer intervals.
+DEFAULT_INTERVAL_BUCKETS: Tuple[int, ...] = (7, 21, 90)
 
 
 class AddonConfig:
@@ -14,38 +24,128 @@ class AddonConfig:
         The format used for dates. Default: "%d.%m.%Y"
     correction_for_notes : int
         The number of note types in the deck. Counts will be divided by
-        this number. Default: 1
+        this number. Always 1 if `count_notes` is set. Default: 1
+    count_notes : bool
+        Whether to count the distinct notes in every state instead of
+        dividing the card counts by the note correction factor.
+        Default: False
+    search : str
+        The Anki search whose cards are counted instead of the deck's cards,
+        e.g. "tag:leech". Read from the longest fragment of the deck's name
+        in the config's deck searches. Default: ""
     learn_per_day : int
         The amount of cards to be learned per day. Read from the deck's
         settings.
     show_table_for_finished_decks : bool
         Whether to show the table for finished decks. Default: True
+    compute_stats_in_background : bool
+        Whether to show the table right away with the last known stats and
+        compute the current stats in the background. Default: False
+    forecast_from_review_history : bool
+        Whether to forecast the done date by simulating the user's past pace
+        from the review log instead of using the deck's new cards per day.
+        Default: False
+    show_render_timings : bool
+        Whether to measure the phases of every render and show their
+        durations below the table. Default: False
+    show_subdeck_breakdown : bool
+        Whether to add an expandable section with the card counts of every
+        subdeck to the table. Default: False
+    show_stats_history : bool
+        Whether to record the stats of every deck once per day and show
+        their trend in the table. Default: False
+    show_interval_distribution : bool
+        Whether to show the review cards per interval bucket and the
+        quartiles of their ease factors in the table. Default: False
+    interval_buckets : Tuple[int, ...]
+        The ascending upper bounds in days of the interval buckets. The last
+        bucket holds all longer intervals. Default: (7, 21, 90)
     config: Dict[str, Any]
         Anki's config object. Used to load user configurations.
+    version : int
+        Incremented whenever the user's config is loaded. Used to invalidate
+        values derived from the config.
     """
 
     def __init__(self) -> None:
         self._initialize_default_values()
-        self._refresh_date_format()
-        self._refresh_stat_colors()
+        self._load_config()
 
-    def refresh(self) -> None:
+    def refresh(self, deck: Dict[str, Any]) -> None:
         """Refreshes this object with the data in the config.
 
         Has to be called before assembling the table to guarantee using the
-        correct settings. Fetches the user's config and updates this object's
-        public attributes.
+        correct settings. The user's config is only loaded again if it
+        changed since it was last loaded. Deck specific settings are
+        refreshed every time.
+
+        Parameters
+        ----------
+        deck : Dict[str, Any]
+            The currently active deck, used for deck specific settings.
+        """
+
+        if self._config_changed():
+            self._load_config()
+
+        self._refresh_note_correction_factors(deck)
+        self._refresh_search(deck)
+        self._refresh_learn_per_day(deck)
+
+    def invalidate(self, *args: Any) -> None:
+        """Reload the user's config on the next refresh.
+
+        Registered as Anki's config updated action, which passes the new
+        config, so any arguments are ignored.
         """
 
-        self.config = mw.addonManager.getConfig(__name__)
-        if self.config is None:
+        self._is_outdated = True
+
+    # Load the user's config and all values derived from it
+    def _load_config(self) -> None:
+        # Read the modification time first to not miss concurrent changes
+        self._config_mtime = self._get_config_mtime()
+        self._is_outdated = False
+
+        config: Optional[Dict[str, Any]] = mw.addonManager.getConfig(__name__)
+        if config is None:
             return None
 
-        self._refresh_note_correction_factors()
+        self.config = config
+        self.version += 1
+        self._correction_factors.clear()
+        self._note_correction_trie = DeckNameTrie(
+            self.config.get("Note Correction Factors", {})
+        )
+        self._search_trie = DeckNameTrie(self.config.get("Deck Searches", {}))
+
         self._refresh_date_format()
         self._refresh_stat_colors()
-        self._refresh_learn_per_day()
         self._refresh_show_table_for_finished_decks()
+        self._refresh_compute_stats_in_background()
+        self._refresh_show_render_timings()
+        self._refresh_forecast_from_review_history()
+        self._refresh_show_subdeck_breakdown()
+        self._refresh_show_stats_history()
+        self._refresh_count_notes()
+        self._refresh_show_interval_distribution()
+        self._refresh_interval_buckets()
+
+    # Whether the user's config changed since it was last loaded
+    def _config_changed(self) -> bool:
+        return self._is_outdated or self._get_config_mtime() != self._config_mtime
+
+    # Return the modification time of the file storing the user's config
+    def _get_config_mtime(self) -> Optional[float]:
+        try:
+            addon_dir: str = mw.addonManager.addonFromModule(__name__)
+            meta_path: str = os.path.join(
+                mw.addonManager.addonsFolder(addon_dir), "meta.json"
+            )
+            return os.stat(meta_path).st_mtime
+        except Exception:
+            # No user config was saved yet
+            return None
 
     # Initialize this object's attributes to their default values
     def _initialize_default_values(self) -> None:
@@ -66,27 +166,63 @@ class AddonConfig:
         }
         self.date_format: str = "%d.%m.%Y"
         self.correction_for_notes: int = 1
+        self.search: str = ""
         self.learn_per_day: int = 0
         self.show_table_for_finished_decks: bool = True
+        self.compute_stats_in_background: bool = False
+        self.show_render_timings: bool = False
+        self.forecast_from_review_history: bool = False
+        self.show_subdeck_breakdown: bool = False
+        self.show_stats_history: bool = False
+        self.count_notes: bool = False
+        self.show_interval_distribution: bool = False
+        self.interval_buckets: Tuple[int, ...] = DEFAULT_INTERVAL_BUCKETS
+        self.version: int = 0
 
-        self.config: Dict[str, Any] = mw.addonManager.getConfig(__name__)
+        self.config: Dict[str, Any] = {}
+        self._config_mtime: Optional[float] = None
+        self._is_outdated: bool = True
+        # The note correction factor and the deck name it was found for by
+        # deck id
+        self._correction_factors: Dict[int, Tuple[str, int]] = {}
+        self._note_correction_trie: DeckNameTrie = DeckNameTrie({})
+        self._search_trie: DeckNameTrie = DeckNameTrie({})
 
     # Load the date format from the config
     def _refresh_date_format(self) -> None:
         if "Date Format" in self.config:
-            active_date_format: str = self.config["Date Format"].strip().lower()
+            active_date_format: str = self.config["Date Format"].strip()
+            # Only the shorthands are case insensitive, "%Y" and "%y" differ
+            shorthand: str = active_date_format.lower()
 
-            if active_date_format == "us":
+            if shorthand == "us":
                 self.date_format = "%m/%d/%Y"
-            elif active_date_format == "asia":
+            elif shorthand == "asia":
                 self.date_format = "%Y/%m/%d"
-            elif active_date_format == "eu":
+            elif shorthand == "eu":
                 self.date_format = "%d.%m.%Y"
             else:
                 self.date_format = active_date_format
         else:
             self.date_format = "%d.%m.%Y"
 
+        self._validate_date_format()
+
+    # Fall back to the default date format if the user's format can't be
+    # used. Only runs when the config is loaded, so the user is only warned
+    # once and not on every render.
+    def _validate_date_format(self) -> None:
+        try:
+            date.today().strftime(self.date_format)
+        except Exception as e:
+            print(e)
+            self.date_format = "%d.%m.%Y"
+            showInfo(
+                'Unsupported date format. Defaulting to Day.Month.Year instead. Use one of the shorthands: "us", "asia" or "eu", or specify the date like "\%d.\%m.\%Y", "\%m/\%d/\%Y" etc.\n For more information check the table at: https://docs.python.org/2/library/datetime.html#strftime-and-strptime-behavior',
+                type="warning",
+                title="More Overview Stats 2.1 Warning",
+            )
+
     # Load the stat colors from the config
     def _refresh_stat_colors(self) -> None:
         if "Stat Colors" not in self.config:
@@ -96,31 +232,40 @@ class AddonConfig:
             if stat in self.stat_colors:
                 self.stat_colors[stat] = color
 
-    # Load the note correction factors from the config
-    def _refresh_note_correction_factors(self) -> None:
-        if "Note Correction Factors" not in self.config:
+    # Load the note correction factor of the deck from the config
+    def _refresh_note_correction_factors(self, deck: Dict[str, Any]) -> None:
+        # Notes are counted exactly, so there is nothing to correct
+        if self.count_notes:
+            self.correction_for_notes = 1
             return None
 
-        current_deck_name: str = mw.col.decks.current()["name"]
-        last_match_length: int = 0
+        current_deck_name: str = deck["name"]
+        cached: Optional[Tuple[str, int]] = self._correction_factors.get(deck["id"])
 
-        for fragment, factor in self.config["Note Correction Factors"].items():
-            if (
-                current_deck_name.startswith(fragment)
-                and len(fragment) > last_match_length
-            ):
-                self.correction_for_notes = int(factor)
-                last_match_length = len(fragment)
+        # Decks can be renamed without changing the config
+        if cached is None or cached[0] != current_deck_name:
+            cached = (
+                current_deck_name,
+                find_note_correction_factor(
+                    self._note_correction_trie, current_deck_name
+                ),
+            )
+            self._correction_factors[deck["id"]] = cached
 
-        # Prevent division by zero and negative results
-        if self.correction_for_notes <= 0:
-            self.correction_for_notes = 1
+        self.correction_for_notes = cached[1]
+
+    # Load the search of the deck from the config
+    def _refresh_search(self, deck: Dict[str, Any]) -> None:
+        search: Any = self._search_trie.longest_match(deck["name"], default="")
+        self.search = str(search).strip()
 
     # Load the learn per day count from the deck's settings
-    def _refresh_learn_per_day(self) -> None:
+    def _refresh_learn_per_day(self, deck: Dict[str, Any]) -> None:
+        current_deck_id: int = deck["id"]
+        backend_calls.count("decks.config_dict_for_deck_id")
+
         # Try new method first (Added in Anki 2.1.45)
         try:
-            current_deck_id = mw.col.decks.current()["id"]
             self.learn_per_day = mw.col.decks.config_dict_for_deck_id(current_deck_id)[
                 "new"
             ]["perDay"]
@@ -142,3 +287,59 @@ class AddonConfig:
         flag_is_true: bool = self.config.get(flag_entry, True)
 
         self.show_table_for_finished_decks = config_has_flag and flag_is_true
+
+    # Load the "Compute stats in background" flag from the config
+    def _refresh_compute_stats_in_background(self) -> None:
+        self.compute_stats_in_background = bool(
+            self.config.get("Compute stats in background", False)
+        )
+
+    # Load the "Show render timings" flag from the config
+    def _refresh_show_render_timings(self) -> None:
+        self.show_render_timings = bool(self.config.get("Show render timings", False))
+        phase_timings.enabled = self.show_render_timings
+
+    # Load the "Forecast from review history" flag from the config
+    def _refresh_forecast_from_review_history(self) -> None:
+        self.forecast_from_review_history = bool(
+            self.config.get("Forecast from review history", False)
+        )
+
+    # Load the "Show subdeck breakdown" flag from the config
+    def _refresh_show_subdeck_breakdown(self) -> None:
+        self.show_subdeck_breakdown = bool(
+            self.config.get("Show subdeck breakdown", False)
+        )
+
+    # Load the "Show stats history" flag from the config
+    def _refresh_show_stats_history(self) -> None:
+        self.show_stats_history = bool(self.config.get("Show stats history", False))
+
+    # Load the "Count notes instead of cards" flag from the config
+    def _refresh_count_notes(self) -> None:
+        self.count_notes = bool(self.config.get("Count notes instead of cards", False))
+
+    # Load the "Show interval distribution" flag from the config
+    def _refresh_show_interval_distribution(self) -> None:
+        self.show_interval_distribution = bool(
+            self.config.get("Show interval distribution", False)
+        )
+
+    # Load the interval buckets from the config
+    def _refresh_interval_buckets(self) -> None:
+        try:
+            # Sort the bounds and ignore duplicates and bounds below one day
+            self.interval_buckets = tuple(
+                sorted(
+                    {
+                        int(bound)
+                        for bound in self.config.get(
+                            "Interval buckets", DEFAULT_INTERVAL_BUCKETS
+                        )
+                        if int(bound) >= 1
+                    }
+                )
+            )
+        except (TypeError, ValueError) as e:
+            print(e)
+            self.interval_buckets = DEFAULT_INTERVAL_BUCKETS
@@ -1,12 +1,22 @@
 import math
 import time
+from array import array
 from datetime import date, timedelta
-from typing import Dict, List
+from typing import Any, Dict, FrozenSet, List, Mapping, Optional, Sequence, Tuple
 
 from aqt import mw
-from aqt.utils import showInfo
 
+from .cache import SearchCache, StatsCache
 from .config import AddonConfig
+from .deck_trie import DECK_SEPARATOR
+from .distribution import Distribution, query_distribution
+from .forecast import HORIZON_DAYS, Forecast, ForecastEngine
+from .history import HISTORY_KEYS, TREND_DAYS, StatsHistory, counting_unit
+from .instrumentation import backend_calls, phase_timings
+from .query import QueryPlanner, roll_up_deck_tree
+from .snapshot import RenderSnapshot
+from .stats import STAT_INDEX, SUSPENDED, TOTAL, UNSEEN, DeckStats
+from .templates import LABELS
 
 
 class DeckData:
@@ -16,49 +26,316 @@ class DeckData:
     ----------
     config : AddonConfig
         Object used to load the addon's user configuration.
+    stats_cache : StatsCache
+        Object used to cache the card counts between refreshes.
+    search_cache : SearchCache
+        Object used to cache the card counts of searches between refreshes.
+    query_planner : QueryPlanner
+        Object used to query the card counts of the current deck.
+    forecast_engine : ForecastEngine
+        Object used to forecast the done date from the review history.
+    stats_history : StatsHistory
+        Object used to record the stats of every deck once per day.
 
     Attributes
     ----------
-    labels : Dict[str, str]
+    labels : Mapping[str, str]
         The labels for all entries in the overview table.
-    stats : Dict[str, int]
-        The counts of the respective card states returned by Anki's db.
-    dates : Dict[str, str]
-        The approximate number of days left and the date the deck will be finished on.
-    percentages : Dict[str, float]
-        The relative counts of the respective card states returned by Anki's db.
-    percentages_without_suspended : Dict[str, float]
-        The percentages when excluding suspended cards from all counts.
+    stats : DeckStats
+        The counts and percentages of the respective card states returned by
+        Anki's db, the approximate number of days left and the date the deck
+        will be finished on. Updated in place on every refresh.
+    snapshot : Optional[RenderSnapshot]
+        The scheduler state captured by the latest refresh.
+    forecast : Optional[Forecast]
+        The done date forecast from the review history. None if disabled or
+        there is no review history.
+    history : List[Tuple[int, List[int]]]
+        The day and the recorded counts of the card states in `HISTORY_KEYS`
+        of the last `TREND_DAYS` days. Empty if disabled.
+    distribution : Optional[Distribution]
+        The interval and ease distribution of the deck's review cards. None
+        if disabled, a search is shown or it's still being computed.
+    is_loading : bool
+        Whether the card counts are still being computed in the background.
+        The other attributes hold the last known counts or zeros until then.
     """
 
-    def __init__(self, config: AddonConfig) -> None:
+    def __init__(
+        self,
+        config: AddonConfig,
+        stats_cache: StatsCache,
+        search_cache: SearchCache,
+        query_planner: QueryPlanner,
+        forecast_engine: ForecastEngine,
+        stats_history: StatsHistory,
+    ) -> None:
         self._config = config
-
-        self.labels: Dict[str, str] = self._get_labels()
-        self.stats: Dict[str, int] = {}
-        self.dates: Dict[str, str] = {}
-        self.percentages: Dict[str, float] = {}
-        self.percentages_without_suspended: Dict[str, float] = {}
-
-    def refresh(self) -> None:
+        self._stats_cache = stats_cache
+        self._search_cache = search_cache
+        self._query_planner = query_planner
+        self._forecast_engine = forecast_engine
+        self._stats_history = stats_history
+
+        self.labels: Mapping[str, str] = LABELS
+        self.stats: DeckStats = DeckStats()
+        self.snapshot: Optional[RenderSnapshot] = None
+        self.forecast: Optional[Forecast] = None
+        self.history: List[Tuple[int, List[int]]] = []
+        self.distribution: Optional[Distribution] = None
+        self.is_loading: bool = False
+
+        # The formatted done dates by days until done, valid for the day and
+        # config version in `_done_dates_key`
+        self._done_dates: Dict[int, str] = {}
+        self._done_dates_key: Tuple[int, int] = (0, 0)
+
+    def refresh(
+        self, deck: Optional[Dict[str, Any]] = None, mod: Optional[int] = None
+    ) -> None:
         """Refreshes this object with the current deck's data.
 
         Has to be called before assembling the table to guarantee using the
         correct data. Fetches the active deck's data and updates this
         object's public attributes.
+
+        If stats are computed in the background or were restored from disk
+        and the cached card counts are outdated, the last known counts are
+        used instead and `is_loading` is set. The current counts then have to
+        be fetched with `query_card_counts` and applied with
+        `apply_card_counts`.
+
+        Parameters
+        ----------
+        deck : Optional[Dict[str, Any]]
+            The currently active deck as returned by `get_refresh_state`.
+            Read from Anki if None.
+        mod : Optional[int]
+            The collection's modification time as returned by
+            `get_refresh_state`. Read from Anki if None.
+        """
+
+        if deck is None:
+            deck = self._get_current_deck()
+        if mod is None:
+            mod = self._get_collection_mod()
+        with phase_timings.phase("config"):
+            self._config.refresh(deck)
+        with phase_timings.phase("scheduler"):
+            scheduled_counts: List[int] = self._get_scheduled_counts()
+            deck_limit: str = self._get_deck_limit()
+        self.snapshot = RenderSnapshot(
+            deck=deck,
+            scheduled_counts=scheduled_counts,
+            deck_limit=deck_limit,
+            mod=mod,
+            config=self._config,
+        )
+
+        card_counts: Optional[List[int]] = self._get_cached_card_counts()
+        self.is_loading = False
+
+        # Outdated counts restored from disk are always refreshed in the
+        # background to show the first overview after startup right away
+        in_background: bool = (
+            self._config.compute_stats_in_background
+            or self._stats_cache.is_restored(self.snapshot.deck_id)
+        )
+
+        if card_counts is None and in_background:
+            card_counts = self._get_last_card_counts()
+            self.is_loading = True
+            if card_counts is None:
+                card_counts = [0] * 7
+        elif card_counts is None:
+            with phase_timings.phase("query"):
+                card_counts = self.query_card_counts(self.snapshot)
+
+        with phase_timings.phase("stats"):
+            self._refresh_card_counts(card_counts)
+
+    def query_card_counts(
+        self, snapshot: RenderSnapshot, streaming: bool = False
+    ) -> List[int]:
+        """Query Anki's db for the card state counts of a deck.
+
+        Counts the cards found by the snapshot's search instead if it has
+        one. Only reads the deck and settings captured by the snapshot and
+        doesn't modify this object's public attributes, so it can be run on
+        a background thread. The results are stored in the stats cache,
+        including the deck's interval and ease distribution if enabled.
+
+        Parameters
+        ----------
+        snapshot : RenderSnapshot
+            The snapshot of the render the counts are requested for.
+        streaming : bool
+            Whether to aggregate the cards in chunks, so other users of the
+            collection don't have to wait for the whole deck to be counted.
+            Slower than a single query, so only used in the background.
+
+        Returns
+        -------
+        List[int]
+            The total, mature, young, unseen, buried, suspended and due counts.
+        """
+
+        mod: int = snapshot.mod
+        now: int = round(time.time())
+
+        if snapshot.search:
+            return self._query_search(snapshot, mod, now)
+
+        if streaming:
+            values, next_learning_due = self._stream_db(snapshot, now)
+        else:
+            values, next_learning_due = self._query_db(snapshot, now)
+        if snapshot.interval_buckets is not None:
+            self._stats_cache.put_distribution(
+                snapshot.deck_id, mod, self._query_distribution(snapshot)
+            )
+        self._stats_cache.put(
+            snapshot.deck_id,
+            mod,
+            self._parse_deck_limit(snapshot.deck_limit),
+            values,
+            next_learning_due,
+            snapshot.count_notes,
+        )
+
+        return values
+
+    def apply_card_counts(self, card_counts: List[int]) -> None:
+        """Update this object with card counts computed in the background.
+
+        Parameters
+        ----------
+        card_counts : List[int]
+            The counts returned by `query_card_counts`.
+        """
+
+        self.is_loading = False
+        self._refresh_card_counts(card_counts)
+
+    def get_refresh_state(self) -> Tuple[Dict[str, Any], int]:
+        """Read the state identifying what a refresh would show.
+
+        The deck and modification time are meant to be passed on to
+        `refresh`, so a render reads each of them only once, even if it
+        first checks whether it has to refresh at all.
+
+        Returns
+        -------
+        Tuple[Dict[str, Any], int]
+            The currently active deck and the collection's modification time.
+        """
+
+        return self._get_current_deck(), self._get_collection_mod()
+
+    def get_all_deck_stats(self) -> Dict[int, List[int]]:
+        """Return the card state counts of every deck in the collection.
+
+        Aggregates all cards in a single grouped query and adds the counts of
+        every subdeck to its parent decks in memory, or counts the notes of
+        every deck and its subdecks in a single query, e.g. for showing the
+        stats of all decks in the deck browser. The results are also stored
+        in the stats cache, so opening any deck's overview afterwards doesn't
+        query the db again.
+
+        Returns
+        -------
+        Dict[int, List[int]]
+            The total, mature, young, unseen, buried, suspended and due counts
+            of every deck including its subdecks, keyed by deck id.
+        """
+
+        mod: int = self._get_collection_mod()
+        now: int = round(time.time())
+
+        totals, deck_ids = self._query_deck_tree(self._get_deck_names(), now)
+
+        deck_stats: Dict[int, List[int]] = {}
+        for did, values in totals.items():
+            self._stats_cache.put(
+                did,
+                mod,
+                deck_ids[did],
+                values[:7],
+                values[7],
+                self._config.count_notes,
+            )
+            deck_stats[did] = values[:7]
+
+        return deck_stats
+
+    def get_subdeck_stats(self) -> List[Tuple[str, List[int]]]:
+        """Return the card state counts of every subdeck of the current deck.
+
+        Aggregates the cards of the current deck and all of its subdecks in a
+        single grouped query and adds the counts of every subdeck to its
+        parent decks in memory.
+
+        Returns
+        -------
+        List[Tuple[str, List[int]]]
+            The full name and the total, mature, young, unseen, buried,
+            suspended and due counts of every subdeck including its own
+            subdecks, in the order of the deck tree. The current deck itself
+            isn't included.
+        """
+
+        now: int = round(time.time())
+
+        deck_limit: str = self.snapshot.deck_limit
+        deck_ids: FrozenSet[int] = self._parse_deck_limit(deck_limit)
+        deck_names: Dict[int, str] = {
+            did: name for did, name in self._get_deck_names().items() if did in deck_ids
+        }
+
+        totals, _ = self._query_deck_tree(deck_names, now, deck_limit)
+
+        # Sort by the name components to keep subdecks below their parents
+        return sorted(
+            (
+                (deck_names[did], values[:7])
+                for did, values in totals.items()
+                if did != self.snapshot.deck_id
+            ),
+            key=lambda subdeck: subdeck[0].split(DECK_SEPARATOR),
+        )
+
+    def explain_query_plan(self) -> List[str]:
+        """Return SQLite's query plans of the current deck's count queries.
+
+        Meant to be called from Anki's debug console to confirm the queries
+        don't scan the whole cards table on a given collection.
+
+        Returns
+        -------
+        List[str]
+            The details of every step of every query plan, prefixed with the
+            query's name, and a warning for every query scanning the whole
+            cards table.
         """
 
-        self._config.refresh()
-        self._refresh_stats()
-        self._refresh_percentages()
-        self._refresh_percentages_without_suspended()
+        deck_limit: str = self._get_deck_limit()
+        plans: Dict[str, List[str]] = self._query_planner.explain(
+            mw.col.db, deck_limit
+        )
+
+        lines: List[str] = [
+            f"{name}: {step}" for name, plan in plans.items() for step in plan
+        ]
+        for name in self._query_planner.find_full_table_scans(mw.col.db, deck_limit):
+            lines.append(f"Warning: {name} scans the cards table completely")
+
+        return lines
 
     def is_finished(self) -> bool:
         """Whether the currently active deck is done for today.
 
-        Has to be called before assembling the table to guarantee using the
-        correct data. Fetches the active deck's data and updates this
-        object's public attributes.
+        Reads the scheduler counts captured by the latest refresh, so
+        `refresh` has to be called first.
 
         Returns
         -------
@@ -66,7 +343,7 @@ class DeckData:
             True if deck is done, False otherwise.
         """
 
-        return not sum(self._get_scheduled_counts())
+        return self.snapshot.is_finished()
 
     def is_empty_deck(self) -> bool:
         """Whether the currently active deck is empty.
@@ -77,151 +354,355 @@ class DeckData:
             True if deck is empty, False otherwise.
         """
 
-        return not self.stats["total"]
+        return self.stats.is_empty()
 
-    # Return the table entry labels
-    def _get_labels(self) -> Dict[str, str]:
-        labels: Dict[str, str] = {}
-
-        labels["mature"] = "Mature"
-        labels["young"] = "Young"
-        labels["unseen"] = "Unseen"
-        labels["buried"] = "Buried"
-        labels["suspended"] = "Suspended"
+    # Refresh all stats derived from the card counts
+    def _refresh_card_counts(self, card_counts: List[int]) -> None:
+        self.stats.update(
+            card_counts,
+            self.snapshot.scheduled_counts,
+            self.snapshot.correction_for_notes,
+        )
 
-        labels["total"] = "Total"
-        labels["learned"] = "Learned"
-        labels["unlearned"] = "Unlearned"
+        self._refresh_forecast()
+        self._refresh_dates()
+        self._refresh_history()
+        self._refresh_distribution()
 
-        labels["new"] = "New"
-        labels["learning"] = "Learning"
-        labels["review"] = "Review"
-        labels["due"] = "Due"
+    # Refresh the number of days left and the date the deck will be finished on
+    def _refresh_dates(self) -> None:
 
-        labels["doneDate"] = "Done in"
+        try:
+            days_until_done: Optional[int]
+            if self.forecast is not None:
+                days_until_done = self.forecast.days_median
+            elif self._config.learn_per_day == 0:
+                days_until_done = 0
+            else:
+                days_until_done = math.ceil(
+                    self.stats.counts[UNSEEN] / self._config.learn_per_day
+                )
+        except Exception as e:
+            print(e)
+            days_until_done = 0
 
-        for key in labels:
-            labels[key] = "{:s}:".format(labels[key])
+        self.stats.done_date = self._format_forecast_date(days_until_done)
+        self.stats.days_left = self._format_forecast_days(days_until_done)
 
-        return labels
+        if self.forecast is not None:
+            if self.forecast.days_low is None:
+                self.stats.forecast_days = self._format_forecast_days(None)
+            else:
+                self.stats.forecast_days = "{}&ndash;{}".format(
+                    self.forecast.days_low,
+                    self._format_forecast_days(self.forecast.days_high),
+                )
+            self.stats.forecast_date = self._format_forecast_date(
+                self.forecast.days_high
+            )
+            self.stats.workload = "{:.0f} / day".format(
+                self.forecast.reviews_per_day
+            )
 
-    # Refresh counts of all card states
-    def _refresh_stats(self) -> None:
-        total, mature, young, unseen, buried, suspended, due = self._query_db()
-        new, learning, review = self._get_scheduled_counts()
+    # Refresh the done date forecast from the review history if enabled
+    def _refresh_forecast(self) -> None:
+        if not self._config.forecast_from_review_history:
+            self.forecast = None
+            return None
 
-        self.stats["mature"] = mature // self._config.correction_for_notes
-        self.stats["young"] = young // self._config.correction_for_notes
-        self.stats["unseen"] = unseen // self._config.correction_for_notes
-        self.stats["buried"] = buried // self._config.correction_for_notes
-        self.stats["suspended"] = suspended // self._config.correction_for_notes
+        counts: array = self.stats.counts
+        learned: int = counts[TOTAL] - counts[UNSEEN]
+        suspend_rate: float = counts[SUSPENDED] / learned if learned else 0.0
 
-        self.stats["total"] = total // self._config.correction_for_notes
-        self.stats["learned"] = self.stats["mature"] + self.stats["young"]
-        self.stats["unlearned"] = self.stats["total"] - self.stats["learned"]
+        try:
+            self.forecast = self._forecast_engine.forecast(
+                mw.col.db,
+                self.snapshot.deck_limit,
+                self._get_day_cutoff(),
+                counts[UNSEEN],
+                learned,
+                suspend_rate,
+                self._config.learn_per_day,
+            )
+        except Exception as e:
+            print(e)
+            self.forecast = None
 
-        self.stats["new"] = new
-        self.stats["learning"] = learning
-        self.stats["review"] = review
-        self.stats["due"] = due + self.stats["review"]
+    # Record the deck's stats once per day and read its recent history if
+    # enabled
+    def _refresh_history(self) -> None:
+        if not self._config.show_stats_history:
+            self.history = []
+            return None
 
         try:
-            days_until_done: int
-            if self._config.learn_per_day == 0:
-                days_until_done = 0
-            else:
-                days_until_done = math.ceil(
-                    self.stats["unseen"] / self._config.learn_per_day
+            snapshot: RenderSnapshot = self.snapshot
+            today: int = self._get_today()
+            # Card and note counts are recorded in separate series
+            unit: str = counting_unit(
+                snapshot.count_notes, snapshot.correction_for_notes
+            )
+
+            # Placeholder counts and the counts of searches are never recorded
+            if not self.is_loading and not snapshot.search:
+                counts: array = self.stats.counts
+                self._stats_history.record(
+                    snapshot.deck_id,
+                    today,
+                    [counts[STAT_INDEX[key]] for key in HISTORY_KEYS],
+                    unit,
                 )
+
+            self.history = self._stats_history.get_series(
+                snapshot.deck_id, today - TREND_DAYS + 1, unit
+            )
         except Exception as e:
             print(e)
-            days_until_done: int = 0
+            self.history = []
+
+    # Refresh the interval and ease distribution of the deck's review cards
+    # if enabled. While the counts are computed in the background, only a
+    # cached distribution is shown.
+    def _refresh_distribution(self) -> None:
+        snapshot: RenderSnapshot = self.snapshot
+        if snapshot.interval_buckets is None or snapshot.search:
+            self.distribution = None
+            return None
+
+        deck_id: int = snapshot.deck_id
+        mod: int = snapshot.mod
+
+        self.distribution = self._stats_cache.get_distribution(
+            deck_id, mod, snapshot.interval_buckets
+        )
+        if self.distribution is not None or self.is_loading:
+            return None
 
         try:
-            self.dates["doneDate"] = (
-                date.today() + timedelta(days=days_until_done)
-            ).strftime(self._config.date_format)
+            self.distribution = self._query_distribution(snapshot)
+            self._stats_cache.put_distribution(deck_id, mod, self.distribution)
         except Exception as e:
             print(e)
-            showInfo(
-                'Unsupported date format. Defaulting to Day.Month.Year instead. Use one of the shorthands: "us", "asia" or "eu", or specify the date like "\%d.\%m.\%Y", "\%m/\%d/\%Y" etc.\n For more information check the table at: https://docs.python.org/2/library/datetime.html#strftime-and-strptime-behavior',
-                type="warning",
-                title="More Overview Stats 2.1 Warning",
+            self.distribution = None
+
+    # Return the date the deck will be finished on in the user's format.
+    # The dates are memoized for the current day and config version.
+    def _format_done_date(self, days_until_done: int) -> str:
+        today: date = date.today()
+
+        key: Tuple[int, int] = (today.toordinal(), self._config.version)
+        if key != self._done_dates_key:
+            self._done_dates.clear()
+            self._done_dates_key = key
+
+        done_date: Optional[str] = self._done_dates.get(days_until_done)
+        if done_date is None:
+            try:
+                done_date = (today + timedelta(days=days_until_done)).strftime(
+                    self._config.date_format
+                )
+            except OverflowError:
+                # The deck won't be finished before the year 9999
+                done_date = "&ndash;"
+            self._done_dates[days_until_done] = done_date
+
+        return done_date
+
+    # Format a forecast date, which is None if it's beyond the forecast's
+    # horizon
+    def _format_forecast_date(self, days_until_done: Optional[int]) -> str:
+        if days_until_done is None:
+            return "&ndash;"
+
+        return self._format_done_date(days_until_done)
+
+    # Format a number of forecast days, which is None if it's beyond the
+    # forecast's horizon
+    def _format_forecast_days(self, days: Optional[int]) -> str:
+        if days is None:
+            return "&gt;{} years".format(HORIZON_DAYS // 365)
+
+        return self._format_days(days)
+
+    # Return a number of days like "1 day" or "3 days"
+    def _format_days(self, days: int) -> str:
+        if days == 1:
+            return "{} day".format(days)
+
+        return "{} days".format(days)
+
+    # Get the time the current day ends at
+    def _get_day_cutoff(self) -> int:
+        backend_calls.count("sched.day_cutoff")
+
+        # Try new property first
+        try:
+            return mw.col.sched.day_cutoff
+        except AttributeError:
+            # Use old deprecated property if the newer one doesn't exist
+            return mw.col.sched.dayCutoff
+
+    # Get the number of days since the collection was created
+    def _get_today(self) -> int:
+        backend_calls.count("sched.today")
+        return mw.col.sched.today
+
+    # Return the current deck's cached card states if they are up to date
+    def _get_cached_card_counts(self) -> Optional[List[int]]:
+        snapshot: RenderSnapshot = self.snapshot
+        if snapshot.search:
+            return self._search_cache.get(
+                snapshot.search,
+                snapshot.mod,
+                round(time.time()),
+                snapshot.count_notes,
             )
-            self.dates["doneDate"] = (
-                date.today() + timedelta(days=days_until_done)
-            ).strftime("%d.%m.%Y")
 
-        if days_until_done == 1:
-            self.dates["daysLeft"] = "{} day".format(days_until_done)
-        else:
-            self.dates["daysLeft"] = "{} days".format(days_until_done)
-
-    # Query Anki's db for the current deck's card states
-    def _query_db(self) -> List[int]:
-        values: List[int] = mw.col.db.first(
-            f"""
-                select
-                -- total
-                count(id),
-                -- mature
-                sum(case when queue = 2 and ivl >= 21
-                then 1 else 0 end),
-                -- young / learning
-                sum(case when queue in (1, 3) or (queue = 2 and ivl < 21)
-                then 1 else 0 end),
-                -- unseen
-                sum(case when queue = 0
-                then 1 else 0 end),
-                -- buried
-                sum(case when queue in (-2, -3)
-                then 1 else 0 end),
-                -- suspended
-                sum(case when queue = -1
-                then 1 else 0 end),
-                -- due
-                sum(case when queue = 1 and due <= ?
-                then 1 else 0 end)
-                from cards where did in {mw.col.sched._deckLimit():s}
-            """,
+        return self._stats_cache.get(
+            snapshot.deck_id,
+            snapshot.mod,
             round(time.time()),
+            snapshot.count_notes,
         )
 
-        # Empty filtered decks can return None => set all values 0
-        if None in values:
-            values = [0] * len(values)
+    # Return the current deck's last known card states, even if outdated
+    def _get_last_card_counts(self) -> Optional[List[int]]:
+        snapshot: RenderSnapshot = self.snapshot
+        if snapshot.search:
+            return self._search_cache.get_last(snapshot.search, snapshot.count_notes)
+
+        return self._stats_cache.get_last(snapshot.deck_id, snapshot.count_notes)
+
+    # Query the card states of the cards found by the snapshot's search. The
+    # search is resolved to card ids once and the counts are cached per search.
+    def _query_search(self, snapshot: RenderSnapshot, mod: int, now: int) -> List[int]:
+        try:
+            card_ids: Sequence[int] = self._find_cards(snapshot.search)
+        except Exception as e:
+            # Invalid searches count no cards
+            print(e)
+            card_ids = []
+
+        values, next_learning_due = self._query_planner.query_counts_by_ids(
+            mw.col.db, card_ids, now, snapshot.count_notes
+        )
+        self._search_cache.put(
+            snapshot.search, mod, values, next_learning_due, snapshot.count_notes
+        )
 
         return values
 
-    # Get card state counts from Anki's scheduler (new, learning, review)
-    def _get_scheduled_counts(self) -> List[int]:
-        return list(mw.col.sched.counts())
+    # Query Anki's db for the card states of the snapshot's deck
+    def _query_db(
+        self, snapshot: RenderSnapshot, now: int
+    ) -> Tuple[List[int], Optional[int]]:
+        if snapshot.count_notes:
+            return self._query_planner.query_note_counts(
+                mw.col.db, snapshot.deck_limit, now
+            )
 
-    # Refresh percentages of all card states
-    def _refresh_percentages(self) -> None:
-        total: int = self.stats["total"]
+        return self._query_planner.query_card_counts(
+            mw.col.db, snapshot.deck_limit, now
+        )
 
-        # Avoid division by zero for empty decks
-        if total == 0:
-            self.percentages = {key: 0.0 for key in self.stats}
-        else:
-            self.percentages = {
-                key: (value / total) for key, value in self.stats.items()
-            }
+    # Query Anki's db for the interval and ease distribution of the snapshot's
+    # deck
+    def _query_distribution(self, snapshot: RenderSnapshot) -> Distribution:
+        return query_distribution(
+            mw.col.db, snapshot.deck_limit, snapshot.interval_buckets
+        )
 
-        self.percentages["total"] = 1.0
+    # Query Anki's db for the card states of the snapshot's deck in chunks,
+    # releasing the collection between chunks
+    def _stream_db(
+        self, snapshot: RenderSnapshot, now: int
+    ) -> Tuple[List[int], Optional[int]]:
+        counts: Tuple[List[int], Optional[int]] = ([0] * 7, None)
+
+        # Only the counts of the last chunk include all cards
+        for counts in self._query_planner.stream_counts(
+            mw.col.db, snapshot.deck_limit, now, snapshot.count_notes
+        ):
+            pass
+
+        return counts
+
+    # Query Anki's db for the counts of every deck including its subdecks.
+    # Card counts are added up from the counts of every deck, but notes with
+    # cards in several subdecks must only be counted once in their parents,
+    # so note counts are queried for every deck's whole subtree instead. Only
+    # the decks in the deck limit are counted if given.
+    def _query_deck_tree(
+        self, deck_names: Dict[int, str], now: int, deck_limit: Optional[str] = None
+    ) -> Tuple[Dict[int, List[Optional[int]]], Dict[int, FrozenSet[int]]]:
+        if not self._config.count_notes:
+            return roll_up_deck_tree(
+                deck_names,
+                self._query_planner.query_card_counts_by_deck(
+                    mw.col.db, now, deck_limit
+                ),
+            )
 
-    # Refresh percentages of all card states ignoring suspended cards
-    def _refresh_percentages_without_suspended(self) -> None:
-        total_without_suspended: int = self.stats["total"] - self.stats["suspended"]
+        # Only the tree is needed, the counts are replaced below
+        totals, deck_ids = roll_up_deck_tree(deck_names, {})
+        note_counts: Dict[int, List[Optional[int]]] = (
+            self._query_planner.query_note_counts_by_tree(mw.col.db, now, deck_ids)
+        )
 
-        # Avoid division by zero for empty decks
-        if total_without_suspended == 0:
-            self.percentages_without_suspended = {key: 0.0 for key in self.stats}
-        else:
-            self.percentages_without_suspended = {
-                key: (value / total_without_suspended)
-                for key, value in self.stats.items()
+        return (
+            {did: note_counts.get(did, values) for did, values in totals.items()},
+            deck_ids,
+        )
+
+    # Get the ids of the cards found by a search
+    def _find_cards(self, search: str) -> Sequence[int]:
+        backend_calls.count("col.find_cards")
+
+        # Try new method first
+        try:
+            return mw.col.find_cards(search)
+        except AttributeError:
+            # Use old deprecated method if the newer one doesn't exist
+            return mw.col.findCards(search)
+
+    # Get the names of all decks by their id
+    def _get_deck_names(self) -> Dict[int, str]:
+        backend_calls.count("decks.all_names_and_ids")
+
+        # Try new method first (Added in Anki 2.1.45)
+        try:
+            return {
+                deck.id: deck.name for deck in mw.col.decks.all_names_and_ids()
             }
+        except Exception:
+            # Use old deprecated method if the newer one doesn't exist
+            return {deck["id"]: deck["name"] for deck in mw.col.decks.all()}
+
+    # Return the collection's modification time used to invalidate the cache
+    def _get_collection_mod(self) -> int:
+        backend_calls.count("col.mod")
+        return mw.col.mod
+
+    # Parse the deck ids of a deck limit string like "(1, 2, 3)"
+    def _parse_deck_limit(self, deck_limit: str) -> FrozenSet[int]:
+        return frozenset(
+            int(deck_id)
+            for deck_id in deck_limit.strip("() ").split(",")
+            if deck_id.strip()
+        )
+
+    # Get the ids of the current deck and all of its subdecks, formatted like
+    # "(1, 2, 3)"
+    def _get_deck_limit(self) -> str:
+        backend_calls.count("sched._deckLimit")
+        return mw.col.sched._deckLimit()
+
+    # Get card state counts from Anki's scheduler (new, learning, review)
+    def _get_scheduled_counts(self) -> List[int]:
+        backend_calls.count("sched.counts")
+        return list(mw.col.sched.counts())
 
-        self.percentages_without_suspended["total"] = 1.0
+    # Get the currently active deck
+    def _get_current_deck(self) -> Dict[str, Any]:
+        backend_calls.count("decks.current")
+        return mw.col.decks.current()
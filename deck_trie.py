@@ -0,0 +1,120 @@
+from typing import Any, Dict, List, Mapping, Optional
+
+# Separates the names of parent decks and subdecks
+DECK_SEPARATOR: str = "::"
+
+
+class _Node:
+    __slots__ = ("children", "values")
+
+    def __init__(self) -> None:
+        # The nodes of the complete deck name components below this node
+        self.children: Dict[str, "_Node"] = {}
+        # The values of all fragments ending in the next component, keyed by
+        # the (possibly partial) component
+        self.values: Dict[str, Any] = {}
+
+
+class DeckNameTrie:
+    """The DeckNameTrie object maps deck name fragments to values.
+
+    Fragments are split into their "::" separated components, so finding the
+    longest fragment a deck name starts with only costs as much as the
+    length of the deck name, no matter how many fragments there are. The last
+    component of a fragment may be incomplete, e.g. "Languages::Span" matches
+    the deck "Languages::Spanish".
+
+    Parameters
+    ----------
+    fragments : Mapping[str, Any]
+        The values by deck name fragment.
+    """
+
+    def __init__(self, fragments: Mapping[str, Any]) -> None:
+        self._root: _Node = _Node()
+
+        for fragment, value in fragments.items():
+            self._insert(fragment, value)
+
+    def longest_match(self, deck_name: str, default: Any = None) -> Any:
+        """Return the value of the longest fragment the deck name starts with.
+
+        Parameters
+        ----------
+        deck_name : str
+            The full name of the deck.
+        default : Any
+            Returned if no fragment matches the deck name.
+
+        Returns
+        -------
+        Any
+            The value of the longest matching fragment or `default`.
+        """
+
+        match: Any = default
+        node: Optional[_Node] = self._root
+
+        components: List[str] = deck_name.split(DECK_SEPARATOR)
+
+        for depth, component in enumerate(components):
+            # Fragments ending deeper in the tree are always longer, so the
+            # longest match of the deepest matching node wins
+            candidates: List[str] = [
+                component[:length] for length in range(len(component), -1, -1)
+            ]
+            # Fragments may end in the middle of the separator of a subdeck
+            if depth < len(components) - 1:
+                candidates.insert(0, component + DECK_SEPARATOR[0])
+
+            for candidate in candidates:
+                if candidate in node.values:
+                    match = node.values[candidate]
+                    break
+
+            node = node.children.get(component)
+            if node is None:
+                break
+
+        return match
+
+    # Add a fragment to the trie
+    def _insert(self, fragment: str, value: Any) -> None:
+        # Empty fragments never count as a match
+        if not fragment:
+            return None
+
+        *parents, last_component = fragment.split(DECK_SEPARATOR)
+
+        node: _Node = self._root
+        for component in parents:
+            node = node.children.setdefault(component, _Node())
+
+        node.values[last_component] = value
+
+
+def find_note_correction_factor(trie: DeckNameTrie, deck_name: str) -> int:
+    """Return the note correction factor of a deck.
+
+    Parameters
+    ----------
+    trie : DeckNameTrie
+        The note correction factors by deck name fragment, as read from the
+        config. The factors may be numbers or strings like "2".
+    deck_name : str
+        The full name of the deck.
+
+    Returns
+    -------
+    int
+        The factor of the longest fragment the deck name starts with, or 1
+        if no fragment matches.
+    """
+
+    correction_for_notes: int = int(trie.longest_match(deck_name, default=1))
+
+    # Prevent division by zero and negative results
+    if correction_for_notes <= 0:
+        correction_for_notes = 1
+
+    return correction_for_notes
@@ -0,0 +1,178 @@
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import Any, List, NamedTuple, Optional, Sequence, Tuple
+
+from .instrumentation import backend_calls
+from .numpy_loader import load_numpy
+
+# The quantiles of the ease factors shown in the table
+EASE_QUANTILES: Tuple[float, ...] = (0.25, 0.5, 0.75)
+
+
+class Distribution(NamedTuple):
+    """The distribution of the intervals and ease factors of review cards.
+
+    Attributes
+    ----------
+    bucket_bounds : Tuple[int, ...]
+        The upper bounds in days of all but the last interval bucket.
+    interval_counts : List[int]
+        The number of review cards in every interval bucket. Has one more
+        entry than `bucket_bounds` for the intervals longer than the last
+        bound.
+    ease_quartiles : Optional[Tuple[int, ...]]
+        The ease factors in permille at the quantiles in `EASE_QUANTILES`.
+        None if there are no review cards.
+    """
+
+    bucket_bounds: Tuple[int, ...]
+    interval_counts: List[int]
+    ease_quartiles: Optional[Tuple[int, ...]]
+
+
+def query_distribution(
+    db: Any, deck_limit: str, bucket_bounds: Sequence[int]
+) -> Distribution:
+    """Query the interval and ease distribution of the given decks.
+
+    The review cards are counted per distinct interval and per distinct ease
+    factor in a single query, so only a few thousand rows are fetched no
+    matter how many cards the decks contain. The rows arrive ordered and are
+    unpacked into typed arrays that the buckets and quartiles are computed
+    from with vectorized operations.
+
+    Parameters
+    ----------
+    db : Any
+        The collection's db.
+    deck_limit : str
+        The ids of the decks, formatted like "(1, 2, 3)".
+    bucket_bounds : Sequence[int]
+        The ascending upper bounds in days of all but the last interval
+        bucket.
+
+    Returns
+    -------
+    Distribution
+        The interval bucket counts and ease quartiles of the review cards.
+    """
+
+    backend_calls.count("db.all")
+    rows: List[List[int]] = db.all(
+        f"""
+            select 0, ivl, count() from cards
+            where did in {deck_limit:s} and queue = 2
+            group by ivl
+            union all
+            select 1, factor, count() from cards
+            where did in {deck_limit:s} and queue = 2
+            group by factor
+            order by 1, 2
+        """
+    )
+
+    kinds, values, weights = tuple(zip(*rows)) or ((), (), ())
+    # The interval rows come first, so the ease rows start at the first 1
+    split: int = bisect_left(kinds, 1)
+    intervals: array = array("q", values[:split])
+    interval_weights: array = array("q", weights[:split])
+    factors: array = array("q", values[split:])
+    factor_weights: array = array("q", weights[split:])
+
+    bounds: Tuple[int, ...] = tuple(bucket_bounds)
+
+    return Distribution(
+        bucket_bounds=bounds,
+        interval_counts=count_buckets(intervals, interval_weights, bounds),
+        ease_quartiles=weighted_quantiles(factors, factor_weights, EASE_QUANTILES),
+    )
+
+
+def count_buckets(
+    values: Sequence[int], weights: Sequence[int], bounds: Sequence[int]
+) -> List[int]:
+    """Add up the weights of sorted values per bucket.
+
+    Parameters
+    ----------
+    values : Sequence[int]
+        The distinct values in ascending order.
+    weights : Sequence[int]
+        The number of occurrences of every value.
+    bounds : Sequence[int]
+        The ascending inclusive upper bounds of all but the last bucket.
+
+    Returns
+    -------
+    List[int]
+        The summed weights of every bucket, the last one holding all values
+        above the last bound.
+    """
+
+    # Fall back to bisecting the sorted cumulative counts without NumPy
+    numpy = load_numpy()
+    if numpy is not None:
+        # The bucket of every value is the first bound it doesn't exceed
+        buckets = numpy.searchsorted(
+            numpy.asarray(bounds, dtype=numpy.int64),
+            numpy.asarray(values, dtype=numpy.int64),
+            side="left",
+        )
+        return numpy.bincount(
+            buckets,
+            weights=numpy.asarray(weights, dtype=numpy.int64),
+            minlength=len(bounds) + 1,
+        ).astype(numpy.int64).tolist()
+
+    # The cumulative weights up to every bound
+    totals: List[int] = list(accumulate(weights, initial=0))
+    cumulative: List[int] = [totals[bisect_right(values, bound)] for bound in bounds]
+    cumulative.append(totals[-1])
+
+    return [high - low for low, high in zip([0] + cumulative, cumulative)]
+
+
+def weighted_quantiles(
+    values: Sequence[int], weights: Sequence[int], quantiles: Sequence[float]
+) -> Optional[Tuple[int, ...]]:
+    """Return the quantiles of sorted values using the nearest rank.
+
+    Parameters
+    ----------
+    values : Sequence[int]
+        The distinct values in ascending order.
+    weights : Sequence[int]
+        The number of occurrences of every value.
+    quantiles : Sequence[float]
+        The quantiles to return, between 0 and 1.
+
+    Returns
+    -------
+    Optional[Tuple[int, ...]]
+        The value at every quantile or None if there are no values.
+    """
+
+    numpy = load_numpy()
+    if numpy is not None:
+        cumulative = numpy.cumsum(numpy.asarray(weights, dtype=numpy.int64))
+        if not len(cumulative) or cumulative[-1] == 0:
+            return None
+
+        ranks = numpy.maximum(
+            numpy.ceil(numpy.asarray(quantiles) * cumulative[-1]), 1
+        )
+        indexes = numpy.searchsorted(cumulative, ranks, side="left")
+        return tuple(numpy.asarray(values, dtype=numpy.int64)[indexes].tolist())
+
+    cumulative_weights: List[int] = list(accumulate(weights))
+    if not cumulative_weights or cumulative_weights[-1] == 0:
+        return None
+
+    total: int = cumulative_weights[-1]
+
+    return tuple(
+        values[bisect_left(cumulative_weights, max(math.ceil(quantile * total), 1))]
+        for quantile in quantiles
+    )
@@ -0,0 +1,338 @@
+import math
+import random
+from bisect import bisect_left
+from itertools import accumulate
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from .instrumentation import backend_calls
+from .numpy_loader import load_numpy
+
+# The number of past days the user's pace is sampled from
+HISTORY_DAYS: int = 60
+# The number of simulated futures
+SIMULATIONS: int = 1000
+# The number of futures simulated without NumPy
+SEQUENTIAL_SIMULATIONS: int = 200
+# Futures taking longer than this many days count as never finished
+HORIZON_DAYS: int = 3650
+# The number of days the workload is projected for
+WORKLOAD_DAYS: int = 30
+
+# The number of days simulated at once
+_BLOCK_DAYS: int = 365
+_SEED: int = 738807903
+# The number of standard deviations above the mean pace a future is assumed
+# to never exceed
+_SIGMAS: float = 6.0
+
+
+class Forecast(NamedTuple):
+    """The projected completion of a deck's unseen cards.
+
+    Attributes
+    ----------
+    days_low : Optional[int]
+        The 10th percentile of the days until the deck is finished.
+    days_median : Optional[int]
+        The median number of days until the deck is finished.
+    days_high : Optional[int]
+        The 90th percentile of the days until the deck is finished.
+    reviews_per_day : float
+        The projected mean number of reviews per day over the next
+        `WORKLOAD_DAYS` days.
+
+    The percentiles are None if they aren't reached within `HORIZON_DAYS`.
+    """
+
+    days_low: Optional[int]
+    days_median: Optional[int]
+    days_high: Optional[int]
+    reviews_per_day: float
+
+
+class _History:
+    __slots__ = ("last_revlog_id", "new_cards", "reviews")
+
+    def __init__(self) -> None:
+        self.last_revlog_id: int = 0
+        # The number of cards seen for the first time by day
+        self.new_cards: Dict[int, int] = {}
+        # The number of reviews by day
+        self.reviews: Dict[int, int] = {}
+
+
+class ForecastEngine:
+    """The ForecastEngine object projects when a deck will be finished.
+
+    Reads the user's past pace from the review log and simulates many
+    possible futures to estimate the completion date with confidence bands.
+    The review log is aggregated per day and cached per deck, so every
+    refresh only reads the reviews added since the previous one.
+
+    All methods take Anki's db object (or any object with the same `all`
+    method), so the engine doesn't depend on a running Anki instance.
+    """
+
+    def __init__(self) -> None:
+        self._histories: Dict[str, _History] = {}
+        self._forecasts: Dict[Tuple[Any, ...], Optional[Forecast]] = {}
+
+    def clear(self) -> None:
+        """Remove all cached history, e.g. after switching profiles."""
+
+        self._histories.clear()
+        self._forecasts.clear()
+
+    def forecast(
+        self,
+        db: Any,
+        deck_limit: str,
+        day_cutoff: int,
+        unseen: int,
+        learned: int,
+        suspend_rate: float,
+        learn_per_day: int,
+    ) -> Optional[Forecast]:
+        """Project when the unseen cards of the given decks will be learned.
+
+        Parameters
+        ----------
+        db : Any
+            The collection's db.
+        deck_limit : str
+            The ids of the decks, formatted like "(1, 2, 3)".
+        day_cutoff : int
+            The time the current day ends at in seconds since epoch.
+        unseen : int
+            The number of unseen cards.
+        learned : int
+            The number of cards that were already seen.
+        suspend_rate : float
+            The share of learned cards that end up suspended.
+        learn_per_day : int
+            The deck's new cards per day limit. 0 for no limit.
+
+        Returns
+        -------
+        Optional[Forecast]
+            The forecast or None if there is no review history to base it on.
+        """
+
+        history: _History = self._refresh_history(db, deck_limit, day_cutoff)
+        today: int = _day_number(day_cutoff - 1, day_cutoff)
+
+        key: Tuple[Any, ...] = (
+            deck_limit,
+            history.last_revlog_id,
+            today,
+            unseen,
+            learned,
+            round(suspend_rate, 3),
+            learn_per_day,
+        )
+        if key not in self._forecasts:
+            # Only keep the forecasts of the latest state
+            self._forecasts.clear()
+            self._forecasts[key] = self._simulate(
+                history, today, unseen, learned, suspend_rate, learn_per_day
+            )
+
+        return self._forecasts[key]
+
+    # Add the reviews logged since the previous refresh to the deck's history
+    def _refresh_history(self, db: Any, deck_limit: str, day_cutoff: int) -> _History:
+        history: _History = self._histories.setdefault(deck_limit, _History())
+
+        backend_calls.count("db.all")
+        rows: List[List[int]] = db.all(
+            f"""
+                select
+                -- day
+                cast((id / 1000 - ?) / 86400 as int),
+                max(id),
+                -- first review of a new card
+                sum(case when type = 0 and lastIvl = 0 then 1 else 0 end),
+                count()
+                from revlog
+                where id > ?
+                and cid in (select id from cards where did in {deck_limit:s})
+                group by 1
+            """,
+            day_cutoff % 86400,
+            history.last_revlog_id,
+        )
+
+        for day, last_id, new_cards, reviews in rows:
+            history.last_revlog_id = max(history.last_revlog_id, last_id)
+            history.new_cards[day] = history.new_cards.get(day, 0) + new_cards
+            history.reviews[day] = history.reviews.get(day, 0) + reviews
+
+        return history
+
+    # Simulate the remaining days until the deck is finished
+    def _simulate(
+        self,
+        history: _History,
+        today: int,
+        unseen: int,
+        learned: int,
+        suspend_rate: float,
+        learn_per_day: int,
+    ) -> Optional[Forecast]:
+        past_days: range = range(today - HISTORY_DAYS, today)
+        new_cards: List[int] = [history.new_cards.get(day, 0) for day in past_days]
+        reviews: List[int] = [history.reviews.get(day, 0) for day in past_days]
+
+        if not any(new_cards):
+            return None
+
+        paces: List[int] = new_cards
+        if learn_per_day > 0:
+            paces = [min(pace, learn_per_day) for pace in paces]
+
+        # Cards that will be suspended never have to be learned
+        remaining: int = round(unseen * (1 - min(max(suspend_rate, 0.0), 1.0)))
+        reviews_per_day: float = _project_workload(
+            paces, new_cards, reviews, remaining, learned
+        )
+
+        if remaining <= 0:
+            return Forecast(0, 0, 0, reviews_per_day)
+
+        # Skip simulating futures that can't finish within the horizon
+        if not _PaceBounds(paces).can_learn(remaining, HORIZON_DAYS):
+            return Forecast(None, None, None, reviews_per_day)
+
+        # Fall back to the slower pure Python simulation without NumPy
+        if load_numpy() is not None:
+            days: Sequence[int] = _simulate_vectorized(paces, remaining)
+        else:
+            days = _simulate_sequential(paces, remaining)
+
+        days = sorted(days)
+
+        return Forecast(
+            days_low=_within_horizon(days[len(days) // 10]),
+            days_median=_within_horizon(days[len(days) // 2]),
+            days_high=_within_horizon(days[len(days) * 9 // 10]),
+            reviews_per_day=reviews_per_day,
+        )
+
+
+# Return the number of the Anki day a timestamp falls on
+def _day_number(timestamp: int, day_cutoff: int) -> int:
+    return (timestamp - day_cutoff % 86400) // 86400
+
+
+# Return None for the days of futures that didn't finish within the horizon
+def _within_horizon(days: int) -> Optional[int]:
+    return days if days < HORIZON_DAYS else None
+
+
+# Project the mean number of daily reviews over the next `WORKLOAD_DAYS` days
+# learning the remaining cards at the mean pace. The reviews of cards seen
+# before grow with the number of cards learned, and the first reviews of new
+# cards stop once the deck is finished.
+def _project_workload(
+    paces: Sequence[int],
+    new_cards: Sequence[int],
+    reviews: Sequence[int],
+    remaining: int,
+    learned: int,
+) -> float:
+    mean_pace: float = sum(paces) / len(paces)
+    # The past reviews except the first reviews of new cards
+    mean_reviews: float = (sum(reviews) - sum(new_cards)) / len(reviews)
+    reviews_per_card: float = mean_reviews / learned if learned else 0.0
+
+    total: float = 0.0
+    newly_learned: float = 0.0
+    for _ in range(WORKLOAD_DAYS):
+        learned_today: float = min(mean_pace, remaining - newly_learned)
+        newly_learned += learned_today
+        total += mean_reviews + reviews_per_card * newly_learned + learned_today
+
+    return total / WORKLOAD_DAYS
+
+
+# Simulate all futures at once, a block of days at a time
+def _simulate_vectorized(paces: List[int], remaining: int) -> List[int]:
+    numpy = load_numpy()
+    rng = numpy.random.default_rng(_SEED)
+    samples = numpy.asarray(paces, dtype=numpy.int64)
+
+    learned = numpy.zeros(SIMULATIONS, dtype=numpy.int64)
+    days = numpy.full(SIMULATIONS, HORIZON_DAYS, dtype=numpy.int64)
+    unfinished = numpy.ones(SIMULATIONS, dtype=bool)
+
+    for first_day in range(0, HORIZON_DAYS, _BLOCK_DAYS):
+        block = rng.choice(samples, size=(SIMULATIONS, _BLOCK_DAYS))
+        totals = learned[:, None] + numpy.cumsum(block, axis=1)
+        finished = totals >= remaining
+
+        done_now = unfinished & finished.any(axis=1)
+        days[done_now] = first_day + finished[done_now].argmax(axis=1) + 1
+        unfinished &= ~done_now
+        learned = totals[:, -1]
+
+        if not unfinished.any():
+            break
+
+    return days.tolist()
+
+
+# Simulate one future after another, a block of days at a time. Only used
+# without NumPy, so fewer futures are simulated and every future stops as
+# soon as it can't finish within the horizon anymore.
+def _simulate_sequential(paces: List[int], remaining: int) -> List[int]:
+    rng = random.Random(_SEED)
+    bounds: _PaceBounds = _PaceBounds(paces)
+    days: List[int] = []
+
+    for _ in range(SEQUENTIAL_SIMULATIONS):
+        learned: int = 0
+        day: int = 0
+
+        while bounds.can_learn(remaining - learned, HORIZON_DAYS - day):
+            block: List[int] = rng.choices(paces, k=_BLOCK_DAYS)
+            block_total: int = sum(block)
+            if learned + block_total >= remaining:
+                totals: List[int] = list(accumulate(block, initial=learned))[1:]
+                day += bisect_left(totals, remaining) + 1
+                break
+            learned += block_total
+            day += _BLOCK_DAYS
+        else:
+            day = HORIZON_DAYS
+
+        days.append(min(day, HORIZON_DAYS))
+
+    return days
+
+
+class _PaceBounds:
+    """The most cards a future can plausibly learn in a number of days.
+
+    Bounded by the fastest past day and by the mean pace plus `_SIGMAS`
+    standard deviations of the sum of the sampled days, which a future
+    exceeds with a negligible probability.
+    """
+
+    __slots__ = ("_fastest", "_mean", "_deviation")
+
+    def __init__(self, paces: Sequence[int]) -> None:
+        self._fastest: int = max(paces)
+        self._mean: float = sum(paces) / len(paces)
+        self._deviation: float = math.sqrt(
+            sum((pace - self._mean) ** 2 for pace in paces) / len(paces)
+        )
+
+    # Whether a number of cards can be learned within a number of days
+    def can_learn(self, cards: int, days: int) -> bool:
+        if days <= 0:
+            return False
+
+        return cards <= min(
+            self._fastest * days,
+            self._mean * days + _SIGMAS * self._deviation * math.sqrt(days),
+        )
@@ -0,0 +1,299 @@
+import os
+import sqlite3
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# The card states recorded for every deck and day, in the order they are
+# stored in
+HISTORY_KEYS: Tuple[str, ...] = (
+    "mature",
+    "young",
+    "unseen",
+    "buried",
+    "suspended",
+    "total",
+)
+
+# The number of past days shown in the table's trend
+TREND_DAYS: int = 90
+
+# The unit of the counts recorded when whole cards are counted
+CARD_UNIT: str = "cards"
+# The unit of the counts recorded when notes are counted
+NOTE_UNIT: str = "notes"
+
+
+def counting_unit(count_notes: bool, correction_for_notes: int) -> str:
+    """Return the unit of the recorded counts for the given config.
+
+    Counts recorded in different units aren't comparable, so every unit is
+    recorded in a separate series.
+
+    Parameters
+    ----------
+    count_notes : bool
+        Whether notes are counted instead of cards.
+    correction_for_notes : int
+        The number the card counts are divided by.
+
+    Returns
+    -------
+    str
+        The unit, e.g. "cards", "notes" or "cards/3" for card counts divided
+        by a note correction factor of 3.
+    """
+
+    if count_notes:
+        return NOTE_UNIT
+    if correction_for_notes != 1:
+        return f"{CARD_UNIT:s}/{correction_for_notes:d}"
+
+    return CARD_UNIT
+
+
+class StatsHistory:
+    """The StatsHistory object records the stats of every deck once per day.
+
+    The history is append-only and stored in a small SQLite file with one row
+    per profile, deck, counting unit and day. Every row only stores the difference to the
+    deck's previous row as zigzag encoded varints, which takes a few bytes
+    for a typical day, so years of history across hundreds of decks stay
+    small. A deck's history is read with a single range scan over the
+    primary key the first time it is needed and kept in memory afterwards.
+    """
+
+    def __init__(self) -> None:
+        # The decoded history of every deck and unit read so far, ordered by
+        # day. Only holds rows that were stored on disk.
+        self._series: Dict[Tuple[int, str], List[Tuple[int, List[int]]]] = {}
+        self._path: Optional[str] = None
+        self._profile: Optional[str] = None
+
+    def load(self, path: str, profile: str) -> None:
+        """Use the history recorded for a profile.
+
+        Parameters
+        ----------
+        path : str
+            The path of the SQLite file storing the history.
+        profile : str
+            The name of the profile the history belongs to.
+        """
+
+        self._series.clear()
+        self._path = path
+        self._profile = profile
+
+    def record(
+        self, deck_id: int, day: int, values: Sequence[int], unit: str = CARD_UNIT
+    ) -> None:
+        """Record a deck's stats unless they were already recorded that day.
+
+        The history file is only opened if the day isn't already recorded in
+        memory, and the stats are only added to the history in memory once
+        they were stored on disk. Every row is encoded against the deck's
+        last row on disk, which is read again if another process recorded
+        rows since.
+
+        Parameters
+        ----------
+        deck_id : int
+            The id of the deck.
+        day : int
+            The number of the day the stats belong to.
+        values : Sequence[int]
+            The counts of the card states in `HISTORY_KEYS`.
+        unit : str
+            The unit of the counts as returned by `counting_unit`.
+            Default: "cards"
+        """
+
+        key: Tuple[int, str] = (deck_id, unit)
+
+        # Rows are never written twice, so a day recorded by this process
+        # doesn't have to be checked on disk again
+        cached: Optional[List[Tuple[int, List[int]]]] = self._series.get(key)
+        if cached and cached[-1][0] >= day:
+            return None
+
+        if self._path is None:
+            series: List[Tuple[int, List[int]]] = self._get_series(deck_id, unit)
+            if not series or series[-1][0] < day:
+                series.append((day, list(values)))
+            return None
+
+        try:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            with sqlite3.connect(self._path) as connection:
+                _create_table(connection)
+                # Keep other processes from recording between the check and
+                # the insert
+                connection.execute("begin immediate")
+
+                last_day: Optional[int] = connection.execute(
+                    """
+                    select max(day) from history
+                    where profile = ? and deck_id = ? and unit = ?
+                    """,
+                    (self._profile, deck_id, unit),
+                ).fetchone()[0]
+
+                if cached is not None and _last_day(cached) == last_day:
+                    series = cached
+                else:
+                    series = _read_rows(connection, self._profile, deck_id, unit)
+
+                if series and series[-1][0] >= day:
+                    self._series[key] = series
+                    return None
+
+                previous: Sequence[int] = (
+                    series[-1][1] if series else [0] * len(values)
+                )
+                connection.execute(
+                    "insert into history values (?, ?, ?, ?, ?)",
+                    (
+                        self._profile,
+                        deck_id,
+                        unit,
+                        day,
+                        _encode_deltas(values, previous),
+                    ),
+                )
+        except sqlite3.Error as e:
+            print(e)
+            return None
+
+        # The row was committed when leaving the connection's context
+        series.append((day, list(values)))
+        self._series[key] = series
+
+    def get_series(
+        self, deck_id: int, first_day: int, unit: str = CARD_UNIT
+    ) -> List[Tuple[int, List[int]]]:
+        """Return a deck's recorded stats starting at a given day.
+
+        Parameters
+        ----------
+        deck_id : int
+            The id of the deck.
+        first_day : int
+            The number of the first day to return.
+        unit : str
+            The unit of the counts as returned by `counting_unit`.
+            Default: "cards"
+
+        Returns
+        -------
+        List[Tuple[int, List[int]]]
+            The day and the counts of the card states in `HISTORY_KEYS` of
+            every recorded day, ordered by day.
+        """
+
+        return [
+            (day, values)
+            for day, values in self._get_series(deck_id, unit)
+            if day >= first_day
+        ]
+
+    # Return a deck's decoded history, reading it from disk on first use
+    def _get_series(self, deck_id: int, unit: str) -> List[Tuple[int, List[int]]]:
+        series: Optional[List[Tuple[int, List[int]]]] = self._series.get(
+            (deck_id, unit)
+        )
+        if series is None:
+            series = self._read_series(deck_id, unit)
+            self._series[(deck_id, unit)] = series
+
+        return series
+
+    # Read and decode a deck's history from disk
+    def _read_series(self, deck_id: int, unit: str) -> List[Tuple[int, List[int]]]:
+        if self._path is None or not os.path.exists(self._path):
+            return []
+
+        try:
+            with sqlite3.connect(self._path) as connection:
+                _create_table(connection)
+                return _read_rows(connection, self._profile, deck_id, unit)
+        except sqlite3.Error as e:
+            print(e)
+            return []
+
+
+# Return the last day of a deck's history or None if it's empty
+def _last_day(series: List[Tuple[int, List[int]]]) -> Optional[int]:
+    return series[-1][0] if series else None
+
+
+# Read and decode a deck's history with a single range scan
+def _read_rows(
+    connection: sqlite3.Connection, profile: Optional[str], deck_id: int, unit: str
+) -> List[Tuple[int, List[int]]]:
+    rows = connection.execute(
+        """
+        select day, deltas from history
+        where profile = ? and deck_id = ? and unit = ?
+        order by day
+        """,
+        (profile, deck_id, unit),
+    ).fetchall()
+
+    series: List[Tuple[int, List[int]]] = []
+    values: List[int] = [0] * len(HISTORY_KEYS)
+
+    for day, deltas in rows:
+        values = [value + delta for value, delta in zip(values, _decode_deltas(deltas))]
+        series.append((day, values))
+
+    return series
+
+
+# Create the history table if it doesn't exist yet
+def _create_table(connection: sqlite3.Connection) -> None:
+    connection.execute(
+        """
+        create table if not exists history (
+            profile text not null,
+            deck_id integer not null,
+            unit text not null,
+            day integer not null,
+            deltas blob not null,
+            primary key (profile, deck_id, unit, day)
+        ) without rowid
+        """
+    )
+
+
+# Encode the differences between two rows as zigzag encoded varints
+def _encode_deltas(values: Sequence[int], previous: Sequence[int]) -> bytes:
+    encoded: bytearray = bytearray()
+
+    for value, previous_value in zip(values, previous):
+        delta: int = value - previous_value
+        # Map negative deltas to odd numbers to keep small deltas short
+        zigzag: int = delta * 2 if delta >= 0 else -delta * 2 - 1
+
+        while zigzag >= 0x80:
+            encoded.append(zigzag & 0x7F | 0x80)
+            zigzag >>= 7
+        encoded.append(zigzag)
+
+    return bytes(encoded)
+
+
+# Decode the differences encoded by `_encode_deltas`
+def _decode_deltas(encoded: bytes) -> List[int]:
+    deltas: List[int] = []
+    zigzag: int = 0
+    shift: int = 0
+
+    for byte in encoded:
+        zigzag |= (byte & 0x7F) << shift
+        shift += 7
+
+        if not byte & 0x80:
+            deltas.append(zigzag // 2 if zigzag % 2 == 0 else -(zigzag + 1) // 2)
+            zigzag = 0
+            shift = 0
+
+    return deltas
@@ -0,0 +1,208 @@
+import time
+from collections import deque
+from contextlib import nullcontext
+from typing import ContextManager, Deque, Dict, List, Optional, Tuple
+
+# The number of samples kept per phase
+_SAMPLES_PER_PHASE: int = 100
+
+# The upper bounds of the histogram buckets in milliseconds
+_BUCKET_BOUNDS: Tuple[float, ...] = (1.0, 5.0, 20.0, 100.0, 500.0)
+
+# Returned for every phase while timing is disabled, so disabled timings
+# don't allocate anything
+_DISABLED_PHASE: ContextManager[None] = nullcontext()
+
+
+class BackendCallCounter:
+    """The BackendCallCounter object counts calls into Anki's backend.
+
+    The counter is reset at the start of every render, so the counts always
+    describe the latest render. Can be inspected from Anki's debug console to
+    spot renders making more backend calls than necessary.
+
+    Attributes
+    ----------
+    calls : Dict[str, int]
+        The number of calls per backend method during the current render.
+    last_render_total : int
+        The total number of backend calls made by the previous render.
+    """
+
+    def __init__(self) -> None:
+        self.calls: Dict[str, int] = {}
+        self.last_render_total: int = 0
+
+    def __str__(self) -> str:
+        calls: str = ", ".join(f"{name}: {count}" for name, count in self.calls.items())
+        return f"{self.total} backend calls ({calls})"
+
+    @property
+    def total(self) -> int:
+        """The total number of backend calls made by the current render."""
+
+        return sum(self.calls.values())
+
+    def count(self, name: str) -> None:
+        """Count a single call of the backend method `name`."""
+
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def reset(self) -> None:
+        """Start counting the calls of a new render."""
+
+        self.last_render_total = self.total
+        self.calls = {}
+
+
+# Counts the backend calls of the current render
+backend_calls = BackendCallCounter()
+
+
+class RefreshCounter:
+    """The RefreshCounter object counts the refreshes saved by coalescing.
+
+    Can be inspected from Anki's debug console or shown below the overview
+    table together with the render timings.
+
+    Attributes
+    ----------
+    requested : int
+        The number of refreshes requested since Anki was started.
+    saved : int
+        The number of requested refreshes that reused a refresh of the same
+        deck made shortly before.
+    shared : int
+        The number of background computations that joined a computation of
+        the same deck that was still running.
+    """
+
+    def __init__(self) -> None:
+        self.requested: int = 0
+        self.saved: int = 0
+        self.shared: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.saved} of {self.requested} refreshes saved, "
+            f"{self.shared} computations shared"
+        )
+
+
+# Counts the refreshes saved by coalescing
+refresh_counts = RefreshCounter()
+
+
+class _Phase:
+    __slots__ = ("_timings", "_name", "_start")
+
+    def __init__(self, timings: "PhaseTimings", name: str) -> None:
+        self._timings: PhaseTimings = timings
+        self._name: str = name
+        self._start: float = 0.0
+
+    def __enter__(self) -> None:
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self._timings.add_sample(self._name, time.perf_counter() - self._start)
+
+
+class PhaseTimings:
+    """The PhaseTimings object measures how long each phase of a render takes.
+
+    Keeps the latest samples of every phase to build rolling histograms. Can
+    be inspected from Anki's debug console or shown below the overview table.
+    While disabled, measuring a phase doesn't do any work.
+
+    Attributes
+    ----------
+    enabled : bool
+        Whether phases are measured. Default: False
+    samples : Dict[str, Deque[float]]
+        The latest durations of every phase in milliseconds, in the order the
+        phases were first measured.
+    """
+
+    def __init__(self) -> None:
+        self.enabled: bool = False
+        self.samples: Dict[str, Deque[float]] = {}
+
+    def __str__(self) -> str:
+        lines: List[str] = []
+        for name, samples in self.samples.items():
+            buckets: str = ", ".join(
+                f"{bucket}: {count}" for bucket, count in self.histogram(name)
+            )
+            lines.append(f"{name}: last {samples[-1]:.2f} ms ({buckets})")
+
+        return "\n".join(lines)
+
+    def phase(self, name: str) -> ContextManager[None]:
+        """Return a context manager measuring the phase `name`.
+
+        Parameters
+        ----------
+        name : str
+            The name of the phase, e.g. "query".
+
+        Returns
+        -------
+        ContextManager[None]
+            Measures the duration of its block if timing is enabled.
+        """
+
+        if not self.enabled:
+            return _DISABLED_PHASE
+
+        return _Phase(self, name)
+
+    def add_sample(self, name: str, seconds: float) -> None:
+        """Record a duration of the phase `name`."""
+
+        samples: Optional[Deque[float]] = self.samples.get(name)
+        if samples is None:
+            samples = deque(maxlen=_SAMPLES_PER_PHASE)
+            self.samples[name] = samples
+
+        samples.append(seconds * 1000)
+
+    def last(self) -> Dict[str, float]:
+        """Return the latest duration of every phase in milliseconds."""
+
+        return {name: samples[-1] for name, samples in self.samples.items()}
+
+    def histogram(self, name: str) -> List[Tuple[str, int]]:
+        """Return the number of recent durations of a phase per bucket.
+
+        Parameters
+        ----------
+        name : str
+            The name of the phase.
+
+        Returns
+        -------
+        List[Tuple[str, int]]
+            The label and the number of samples of every bucket.
+        """
+
+        counts: List[int] = [0] * (len(_BUCKET_BOUNDS) + 1)
+        for duration in self.samples.get(name, ()):
+            bucket: int = 0
+            while bucket < len(_BUCKET_BOUNDS) and duration >= _BUCKET_BOUNDS[bucket]:
+                bucket += 1
+            counts[bucket] += 1
+
+        labels: List[str] = [f"<{bound:g} ms" for bound in _BUCKET_BOUNDS]
+        labels.append(f">={_BUCKET_BOUNDS[-1]:g} ms")
+
+        return list(zip(labels, counts))
+
+    def clear(self) -> None:
+        """Remove all recorded durations."""
+
+        self.samples.clear()
+
+
+# Measures the phases of every render
+phase_timings = PhaseTimings()
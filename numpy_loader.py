@@ -0,0 +1,34 @@
+from types import ModuleType
+from typing import Optional
+
+# NumPy once imported by `load_numpy`, None if it isn't installed
+_numpy: Optional[ModuleType] = None
+_is_loaded: bool = False
+
+
+def load_numpy() -> Optional[ModuleType]:
+    """Import NumPy on first use.
+
+    Importing NumPy takes longer than a whole render, so it is only imported
+    once a computation needs it instead of with the add-on's modules. NumPy
+    isn't bundled with Anki, so callers have to fall back to pure Python if
+    it isn't installed.
+
+    Returns
+    -------
+    Optional[ModuleType]
+        The numpy module or None if it isn't installed.
+    """
+
+    global _numpy, _is_loaded
+
+    if not _is_loaded:
+        try:
+            import numpy
+
+            _numpy = numpy
+        except ImportError:
+            _numpy = None
+        _is_loaded = True
+
+    return _numpy
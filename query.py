@@ -0,0 +1,677 @@
+import re
+from typing import (
+    Any,
+    Dict,
+    FrozenSet,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from .deck_trie import DECK_SEPARATOR
+from .instrumentation import backend_calls
+
+# The aggregate columns of the card state queries: total, mature, young,
+# unseen, buried, suspended, due and the next learning card to become due.
+# Both time parameters have to be bound to the current time.
+CARD_COUNT_COLUMNS: str = """
+        -- total
+        count(id),
+        -- mature
+        sum(case when queue = 2 and ivl >= 21
+        then 1 else 0 end),
+        -- young / learning
+        sum(case when queue in (1, 3) or (queue = 2 and ivl < 21)
+        then 1 else 0 end),
+        -- unseen
+        sum(case when queue = 0
+        then 1 else 0 end),
+        -- buried
+        sum(case when queue in (-2, -3)
+        then 1 else 0 end),
+        -- suspended
+        sum(case when queue = -1
+        then 1 else 0 end),
+        -- due
+        sum(case when queue = 1 and due <= ?
+        then 1 else 0 end),
+        -- next learning card to become due
+        min(case when queue = 1 and due > ?
+        then due end)
+"""
+
+# The columns of the note state queries, aggregated per note. Every note is
+# counted in the least advanced state of its cards, e.g. a note with a mature
+# and an unseen card counts as unseen. Both time parameters have to be bound
+# to the current time.
+_NOTE_STATE_COLUMNS: str = """
+        -- 5 unseen, 4 young / learning, 3 mature, 2 buried, 1 suspended
+        max(case when queue = 0 then 5
+        when queue in (1, 3) or (queue = 2 and ivl < 21) then 4
+        when queue = 2 then 3
+        when queue in (-2, -3) then 2
+        when queue = -1 then 1
+        else 0 end) as state,
+        -- due
+        max(case when queue = 1 and due <= ?
+        then 1 else 0 end) as is_due,
+        -- next learning card to become due
+        min(case when queue = 1 and due > ?
+        then due end) as next_due
+"""
+
+# The aggregate columns over the note states, in the order of
+# `CARD_COUNT_COLUMNS`
+_NOTE_COUNT_COLUMNS: str = """
+        count(),
+        sum(state = 3),
+        sum(state = 4),
+        sum(state = 5),
+        sum(state = 2),
+        sum(state = 1),
+        sum(is_due),
+        min(next_due)
+"""
+
+# The number of card ids aggregated per query when counting the cards of a
+# search. Keeps every statement short no matter how many cards match.
+CARD_ID_CHUNK_SIZE: int = 10000
+
+# The number of cards or notes aggregated per query when streaming the counts
+STREAM_CHUNK_SIZE: int = 50000
+
+# Matches query plan steps reading every row of the cards table
+_FULL_TABLE_SCAN: re.Pattern = re.compile(r"^SCAN (TABLE )?cards\b(?!.*\bUSING\b)")
+
+
+class QueryPlanner:
+    """The QueryPlanner object builds and runs the card and note count queries.
+
+    Every query shape is fixed, the planner doesn't choose between different
+    queries for the same counts. SQLite's query plans of all shapes can be
+    checked on a given collection with `explain`.
+
+    All methods take Anki's db object (or any object with the same `all`,
+    `first` and `scalar` methods), so the planner doesn't depend on a
+    running Anki instance.
+    """
+
+    def query_card_counts(
+        self, db: Any, deck_limit: str, now: int
+    ) -> Tuple[List[int], Optional[int]]:
+        """Query the card state counts of the given decks.
+
+        Parameters
+        ----------
+        db : Any
+            The collection's db.
+        deck_limit : str
+            The ids of the decks to count, formatted like "(1, 2, 3)".
+        now : int
+            The current time in seconds since epoch.
+
+        Returns
+        -------
+        Tuple[List[int], Optional[int]]
+            The total, mature, young, unseen, buried, suspended and due counts
+            and the due time of the next learning card that isn't due yet.
+        """
+
+        return self._query_aggregate(db, deck_limit, now)
+
+    def query_note_counts(
+        self, db: Any, deck_limit: str, now: int
+    ) -> Tuple[List[int], Optional[int]]:
+        """Query the note state counts of the given decks.
+
+        Counts the distinct notes of the decks' cards in a single pass
+        grouped by note id. Every note is counted in the least advanced state
+        of its cards, so the counts add up like card counts.
+
+        Parameters
+        ----------
+        db : Any
+            The collection's db.
+        deck_limit : str
+            The ids of the decks to count, formatted like "(1, 2, 3)".
+        now : int
+            The current time in seconds since epoch.
+
+        Returns
+        -------
+        Tuple[List[int], Optional[int]]
+            The total, mature, young, unseen, buried, suspended and due counts
+            of notes and the due time of the next learning card that isn't due
+            yet.
+        """
+
+        backend_calls.count("db.first")
+        row: List[Optional[int]] = db.first(_note_count_sql(deck_limit), now, now)
+
+        values: List[Optional[int]] = list(row[:7])
+        next_learning_due: Optional[int] = row[7]
+
+        # Decks without cards return None => set all values 0
+        if None in values:
+            values = [0] * len(values)
+
+        return values, next_learning_due
+
+    def query_counts_by_ids(
+        self, db: Any, card_ids: Sequence[int], now: int, count_notes: bool = False
+    ) -> Tuple[List[int], Optional[int]]:
+        """Query the card or note state counts of the given cards.
+
+        The cards are aggregated in chunks of `CARD_ID_CHUNK_SIZE` ids and the
+        counts of all chunks are added up, e.g. for counting the cards found
+        by an arbitrary search.
+
+        Parameters
+        ----------
+        db : Any
+            The collection's db.
+        card_ids : Sequence[int]
+            The ids of the cards to count.
+        now : int
+            The current time in seconds since epoch.
+        count_notes : bool
+            Whether to count notes like `query_note_counts` instead of cards.
+            Only the given cards of every note are considered.
+
+        Returns
+        -------
+        Tuple[List[int], Optional[int]]
+            The total, mature, young, unseen, buried, suspended and due counts
+            and the due time of the next learning card that isn't due yet.
+        """
+
+        chunks: List[str] = [
+            _id_list(card_ids[start : start + CARD_ID_CHUNK_SIZE])
+            for start in range(0, len(card_ids), CARD_ID_CHUNK_SIZE)
+        ]
+
+        if count_notes:
+            return self._query_note_counts_by_ids(db, chunks, now)
+
+        values: List[int] = [0] * 7
+        next_learning_due: Optional[int] = None
+
+        for chunk in chunks:
+            backend_calls.count("db.first")
+            row: List[Optional[int]] = db.first(_id_chunk_sql(chunk), now, now)
+
+            values = [value + (count or 0) for value, count in zip(values, row[:7])]
+            next_learning_due = _earliest(next_learning_due, row[7])
+
+        return values, next_learning_due
+
+    def stream_counts(
+        self,
+        db: Any,
+        deck_limit: str,
+        now: int,
+        count_notes: bool = False,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+    ) -> Iterator[Tuple[List[int], Optional[int]]]:
+        """Query the card or note state counts of the given decks in chunks.
+
+        Decks with at most `chunk_size` cards are counted with a single
+        query using the deck index. Larger decks are counted by walking the
+        collection's cards in the order of their ids, or its notes in the
+        order of their ids, reading `chunk_size` of them per query and
+        aggregating those in the decks. Every chunk is folded into running
+        counts that are yielded before the next chunk is queried, so the
+        collection is never held for longer than reading a single chunk and
+        memory use doesn't grow with the size of the decks.
+
+        Parameters
+        ----------
+        db : Any
+            The collection's db.
+        deck_limit : str
+            The ids of the decks to count, formatted like "(1, 2, 3)".
+        now : int
+            The current time in seconds since epoch.
+        count_notes : bool
+            Whether to count notes like `query_note_counts` instead of cards.
+        chunk_size : int
+            The number of cards or notes aggregated per query.
+
+        Yields
+        ------
+        Tuple[List[int], Optional[int]]
+            The running total, mature, young, unseen, buried, suspended and
+            due counts and the due time of the next learning card that isn't
+            due yet, once per chunk. The last yielded counts are the counts
+            of the whole decks.
+        """
+
+        backend_calls.count("db.scalar")
+        card_count: int = db.scalar(_deck_card_count_sql(deck_limit))
+
+        if card_count <= chunk_size:
+            if count_notes:
+                yield self.query_note_counts(db, deck_limit, now)
+            else:
+                yield self.query_card_counts(db, deck_limit, now)
+            return None
+
+        sql: str = (
+            _note_chunk_sql(deck_limit) if count_notes else _card_chunk_sql(deck_limit)
+        )
+        values: List[int] = [0] * 7
+        next_learning_due: Optional[int] = None
+        # The id of the last card or note of the previous chunk
+        last_id: int = -1
+
+        while True:
+            backend_calls.count("db.first")
+            row: List[Optional[int]] = db.first(sql, last_id, chunk_size, now, now)
+
+            # The whole collection has been read
+            if row[8] is None:
+                break
+
+            values = [value + (count or 0) for value, count in zip(values, row[:7])]
+            next_learning_due = _earliest(next_learning_due, row[7])
+            last_id = row[8]
+
+            yield values, next_learning_due
+
+    def explain(self, db: Any, deck_limit: str) -> Dict[str, List[str]]:
+        """Return SQLite's query plans of every count query shape.
+
+        Covers the queries counting the cards and notes of the given decks,
+        of their subdecks, of the cards found by a search and of every
+        streamed chunk. The queries counting every deck of the collection
+        always read the whole cards table and aren't included.
+
+        Parameters
+        ----------
+        db : Any
+            The collection's db.
+        deck_limit : str
+            The ids of the decks to count, formatted like "(1, 2, 3)".
+
+        Returns
+        -------
+        Dict[str, List[str]]
+            The details of every step of the query plan by query name.
+        """
+
+        plans: Dict[str, List[str]] = {}
+
+        for name, sql in _explained_queries(deck_limit):
+            backend_calls.count("db.all")
+            # Every parameter is a number, so any number results in the same
+            # plan
+            rows: List[List[Any]] = db.all(
+                f"explain query plan {sql:s}", *[0] * sql.count("?")
+            )
+            plans[name] = [row[-1] for row in rows]
+
+        return plans
+
+    def find_full_table_scans(self, db: Any, deck_limit: str) -> List[str]:
+        """Return the count queries that read every row of the cards table.
+
+        Parameters
+        ----------
+        db : Any
+            The collection's db.
+        deck_limit : str
+            The ids of the decks to count, formatted like "(1, 2, 3)".
+
+        Returns
+        -------
+        List[str]
+            The names of the queries returned by `explain` with a full table
+            scan in their query plan.
+        """
+
+        return [
+            name
+            for name, plan in self.explain(db, deck_limit).items()
+            if any(_FULL_TABLE_SCAN.match(step) for step in plan)
+        ]
+
+    def query_card_counts_by_deck(
+        self, db: Any, now: int, deck_limit: Optional[str] = None
+    ) -> Dict[int, List[Optional[int]]]:
+        """Query the card state counts of every deck in a single pass.
+
+        Parameters
+        ----------
+        db : Any
+            The collection's db.
+        now : int
+            The current time in seconds since epoch.
+        deck_limit : Optional[str]
+            The ids of the decks to count, formatted like "(1, 2, 3)". All
+            decks are counted if None.
+
+        Returns
+        -------
+        Dict[int, List[Optional[int]]]
+            The total, mature, young, unseen, buried, suspended and due counts
+            and the due time of the next learning card that isn't due yet of
+            every deck containing cards, keyed by deck id. Cards of subdecks
+            aren't included, see `roll_up_deck_tree`.
+        """
+
+        backend_calls.count("db.all")
+        rows: List[List[Optional[int]]] = db.all(
+            _card_counts_by_deck_sql(deck_limit), now, now
+        )
+
+        return {row[0]: list(row[1:]) for row in rows}
+
+    def query_note_counts_by_tree(
+        self, db: Any, now: int, deck_ids: Mapping[int, FrozenSet[int]]
+    ) -> Dict[int, List[Optional[int]]]:
+        """Query the note state counts of every deck including its subdecks.
+
+        Unlike card counts, note counts can't be added up from the counts of
+        the subdecks, since a note with cards in two subdecks would be
+        counted twice in their parent. Every deck is joined with all of its
+        subdecks instead, so the notes are counted once per deck in a single
+        query.
+
+        Parameters
+        ----------
+        db : Any
+            The collection's db.
+        now : int
+            The current time in seconds since epoch.
+        deck_ids : Mapping[int, FrozenSet[int]]
+            The ids of every counted deck and its subdecks, as returned by
+            `roll_up_deck_tree`.
+
+        Returns
+        -------
+        Dict[int, List[Optional[int]]]
+            The total, mature, young, unseen, buried, suspended and due counts
+            of notes and the due time of the next learning card that isn't
+            due yet of every deck containing cards, keyed by deck id.
+        """
+
+        if not any(deck_ids.values()):
+            return {}
+
+        backend_calls.count("db.all")
+        rows: List[List[Optional[int]]] = db.all(
+            _note_counts_by_tree_sql(deck_ids), now, now
+        )
+
+        return {row[0]: list(row[1:]) for row in rows}
+
+    # Aggregate all card states in a single pass
+    def _query_aggregate(
+        self, db: Any, deck_limit: str, now: int
+    ) -> Tuple[List[int], Optional[int]]:
+        backend_calls.count("db.first")
+        row: List[Optional[int]] = db.first(_aggregate_sql(deck_limit), now, now)
+
+        values: List[Optional[int]] = list(row[:7])
+        next_learning_due: Optional[int] = row[7]
+
+        # Empty filtered decks can return None => set all values 0
+        if None in values:
+            values = [0] * len(values)
+
+        return values, next_learning_due
+
+    # Count the notes of the given chunks of card ids. A note's cards can be
+    # spread over several chunks, so the states of every note are merged
+    # before they are counted.
+    def _query_note_counts_by_ids(
+        self, db: Any, chunks: List[str], now: int
+    ) -> Tuple[List[int], Optional[int]]:
+        # The state, whether a card is due and the next learning due time by
+        # note id
+        notes: Dict[int, List[Optional[int]]] = {}
+
+        for chunk in chunks:
+            backend_calls.count("db.all")
+            rows: List[List[Optional[int]]] = db.all(
+                _note_id_chunk_sql(chunk), now, now
+            )
+
+            for nid, state, is_due, next_due in rows:
+                note: Optional[List[Optional[int]]] = notes.get(nid)
+                if note is None:
+                    notes[nid] = [state, is_due, next_due]
+                else:
+                    note[0] = max(note[0], state)
+                    note[1] = max(note[1], is_due)
+                    note[2] = _earliest(note[2], next_due)
+
+        # The note states in the order of the returned counts
+        state_counts: Dict[int, int] = {state: 0 for state in (3, 4, 5, 2, 1)}
+        due: int = 0
+        next_learning_due: Optional[int] = None
+
+        for state, is_due, next_due in notes.values():
+            if state in state_counts:
+                state_counts[state] += 1
+            due += is_due
+            next_learning_due = _earliest(next_learning_due, next_due)
+
+        return [len(notes), *state_counts.values(), due], next_learning_due
+
+
+def roll_up_deck_tree(
+    deck_names: Dict[int, str],
+    deck_rows: Dict[int, List[Optional[int]]],
+) -> Tuple[Dict[int, List[Optional[int]]], Dict[int, FrozenSet[int]]]:
+    """Add the counts of every deck to all of its parent decks.
+
+    Parameters
+    ----------
+    deck_names : Dict[int, str]
+        The full name of every deck by its id.
+    deck_rows : Dict[int, List[Optional[int]]]
+        The counts of the cards in every deck, as returned by
+        `QueryPlanner.query_card_counts_by_deck`.
+
+    Returns
+    -------
+    Tuple[Dict[int, List[Optional[int]]], Dict[int, FrozenSet[int]]]
+        The counts of every deck including its subdecks and the ids of every
+        deck and its subdecks, both keyed by deck id.
+    """
+
+    deck_ids: Dict[str, int] = {name: did for did, name in deck_names.items()}
+    totals: Dict[int, List[Optional[int]]] = {
+        did: [0] * 7 + [None] for did in deck_names
+    }
+    children: Dict[int, Set[int]] = {did: {did} for did in deck_names}
+
+    for did, name in deck_names.items():
+        parts: List[str] = name.split(DECK_SEPARATOR)
+
+        ancestor_ids: List[int] = []
+        for depth in range(1, len(parts) + 1):
+            ancestor_id: Optional[int] = deck_ids.get(
+                DECK_SEPARATOR.join(parts[:depth])
+            )
+            if ancestor_id is not None:
+                ancestor_ids.append(ancestor_id)
+                children[ancestor_id].add(did)
+
+        row: Optional[List[Optional[int]]] = deck_rows.get(did)
+        if row is None:
+            continue
+
+        for ancestor_id in ancestor_ids:
+            total: List[Optional[int]] = totals[ancestor_id]
+            for index in range(7):
+                total[index] += row[index]
+            if row[7] is not None and (total[7] is None or row[7] < total[7]):
+                total[7] = row[7]
+
+    return totals, {did: frozenset(ids) for did, ids in children.items()}
+
+
+# Return the sql aggregating all card states in a single pass
+def _aggregate_sql(deck_limit: str) -> str:
+    return f"""
+        select
+        {CARD_COUNT_COLUMNS:s}
+        from cards where did in {deck_limit:s}
+    """
+
+
+# Return the sql counting the states of the cards with the given ids
+def _id_chunk_sql(chunk: str) -> str:
+    return f"""
+        select
+        {CARD_COUNT_COLUMNS:s}
+        from cards where id in {chunk:s}
+    """
+
+
+# Return the sql aggregating the states of the cards with the given ids per
+# note
+def _note_id_chunk_sql(chunk: str) -> str:
+    return f"""
+        select nid,
+        {_NOTE_STATE_COLUMNS:s}
+        from cards where id in {chunk:s}
+        group by nid
+    """
+
+
+# Return the sql counting the card states of every deck, or of the given
+# decks if there is a deck limit
+def _card_counts_by_deck_sql(deck_limit: Optional[str]) -> str:
+    where: str = f"where did in {deck_limit:s}" if deck_limit is not None else ""
+
+    return f"""
+        select did,
+        {CARD_COUNT_COLUMNS:s}
+        from cards {where:s} group by did
+    """
+
+
+# Return the sql counting the note states of every deck joined with all of
+# its subdecks
+def _note_counts_by_tree_sql(deck_ids: Mapping[int, FrozenSet[int]]) -> str:
+    tree: str = ", ".join(
+        f"({root:d}, {did:d})" for root, ids in deck_ids.items() for did in ids
+    )
+
+    return f"""
+        with tree(root, did) as (values {tree:s})
+        select root,
+        {_NOTE_COUNT_COLUMNS:s}
+        from (
+            select tree.root as root,
+            {_NOTE_STATE_COLUMNS:s}
+            from cards join tree on cards.did = tree.did
+            group by tree.root, cards.nid
+        ) group by root
+    """
+
+
+# Return the name and sql of every count query shape explained by
+# `QueryPlanner.explain` for the given decks
+def _explained_queries(deck_limit: str) -> List[Tuple[str, str]]:
+    deck_ids: List[int] = [
+        int(deck_id)
+        for deck_id in deck_limit.strip("() ").split(",")
+        if deck_id.strip()
+    ]
+    # The first deck with all given decks as its subdecks
+    tree: Dict[int, FrozenSet[int]] = {deck_ids[0]: frozenset(deck_ids)}
+    # Any card id results in the same plan
+    card_ids: str = _id_list([0])
+
+    return [
+        ("card counts", _aggregate_sql(deck_limit)),
+        ("note counts", _note_count_sql(deck_limit)),
+        ("card counts by deck", _card_counts_by_deck_sql(deck_limit)),
+        ("note counts by deck tree", _note_counts_by_tree_sql(tree)),
+        ("card counts by id", _id_chunk_sql(card_ids)),
+        ("note counts by id", _note_id_chunk_sql(card_ids)),
+        ("streamed card total", _deck_card_count_sql(deck_limit)),
+        ("streamed card chunk", _card_chunk_sql(deck_limit)),
+        ("streamed note chunk", _note_chunk_sql(deck_limit)),
+    ]
+
+
+# Format card ids like "(1, 2, 3)"
+def _id_list(card_ids: Sequence[int]) -> str:
+    return "({:s})".format(", ".join(str(card_id) for card_id in card_ids))
+
+
+# Return the earlier of two optional due times
+def _earliest(due: Optional[int], other_due: Optional[int]) -> Optional[int]:
+    if due is None:
+        return other_due
+    if other_due is None:
+        return due
+
+    return min(due, other_due)
+
+
+# Return the sql counting the notes in every state in a single pass
+def _note_count_sql(deck_limit: str) -> str:
+    return f"""
+        select
+        {_NOTE_COUNT_COLUMNS:s}
+        from (
+            select
+            {_NOTE_STATE_COLUMNS:s}
+            from cards where did in {deck_limit:s}
+            group by nid
+        )
+    """
+
+
+# Return the sql counting the cards of the given decks using the deck index
+def _deck_card_count_sql(deck_limit: str) -> str:
+    return f"select count() from cards where did in {deck_limit:s}"
+
+
+# Return the sql counting the states of the cards in the given decks among
+# the next chunk of cards after a card id, and the id of the chunk's last
+# card. The chunk is read in the order of the card ids, so every query reads
+# at most a chunk of cards no matter how few of them are in the decks.
+def _card_chunk_sql(deck_limit: str) -> str:
+    return f"""
+        with chunk as (
+            select id, did, queue, ivl, due from cards
+            where id > ? order by id limit ?
+        )
+        select
+        {CARD_COUNT_COLUMNS:s},
+        (select max(id) from chunk)
+        from chunk where did in {deck_limit:s}
+    """
+
+
+# Return the sql counting the states of the notes in the given decks among
+# the next chunk of notes after a note id, and the id of the chunk's last
+# note. The deck filter doesn't use an index, so only the cards of the
+# chunk's notes are read through the note index.
+def _note_chunk_sql(deck_limit: str) -> str:
+    return f"""
+        with chunk(nid) as (
+            select distinct nid from cards
+            where nid > ? order by nid limit ?
+        )
+        select
+        {_NOTE_COUNT_COLUMNS:s},
+        (select max(nid) from chunk)
+        from (
+            select nid,
+            {_NOTE_STATE_COLUMNS:s}
+            from cards where nid in (select nid from chunk) and +did in {deck_limit:s}
+            group by nid
+        )
+    """
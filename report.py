@@ -0,0 +1,486 @@
+"""
+Report the stats of every deck in collections without running Anki.
+
+Opens collection files read-only, counts the cards of all decks of every
+collection in a single pass and writes the stats of every deck including its
+subdecks as one combined HTML, JSON or CSV report. Multiple collections are
+counted in parallel by a pool of worker processes. Only needs Python's
+standard library, so it can run from cron jobs on machines without Anki's
+GUI. The "Note Correction Factors" and "Stat Colors" are read from the
+add-on's config.
+
+Usage: python -m <add-on folder>.report COLLECTION [COLLECTION ...]
+       [--format {html,json,csv}] [--output PATH] [--config PATH]
+       [--workers N] [--throughput]
+"""
+
+import argparse
+import csv
+import html
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+)
+from urllib.parse import quote
+
+from .deck_trie import (
+    DECK_SEPARATOR,
+    DeckNameTrie,
+    find_note_correction_factor,
+)
+from .query import QueryPlanner, roll_up_deck_tree
+from .stats import STAT_KEYS, DeckStats
+from .templates import (
+    DECK_ROWS,
+    LABELS,
+    compile_section,
+    compile_style,
+    render_cell_values,
+    render_section,
+)
+
+REPORT_FORMATS: Tuple[str, ...] = ("html", "json", "csv")
+
+# The card states written for every deck. The scheduler's counts can't be
+# computed without Anki.
+REPORT_KEYS: Tuple[str, ...] = STAT_KEYS[: STAT_KEYS.index("unlearned") + 1]
+
+# Newer collections store the components of deck names separated by this
+# character
+_STORED_DECK_SEPARATOR: str = "\x1f"
+
+# The maximum number of bytes of a collection file read through a memory map
+MMAP_SIZE: int = 1 << 30
+
+_DEFAULT_CONFIG_PATH: str = os.path.join(os.path.dirname(__file__), "config.json")
+
+
+class ReadOnlyDB:
+    """The ReadOnlyDB object reads a collection file without modifying it.
+
+    Provides the `all`, `first` and `scalar` methods of Anki's db object, so
+    it can be passed to the `QueryPlanner`. The file is memory-mapped, so
+    reading it doesn't copy its pages into SQLite's page cache.
+
+    Parameters
+    ----------
+    path : str
+        The path of the collection file.
+    mmap_size : int
+        The maximum number of bytes of the file to memory-map.
+    """
+
+    def __init__(self, path: str, mmap_size: int = MMAP_SIZE) -> None:
+        self._connection: sqlite3.Connection = sqlite3.connect(
+            f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True
+        )
+        self._connection.execute(f"pragma mmap_size = {int(mmap_size):d}")
+        self._connection.execute("pragma query_only = 1")
+
+    def all(self, sql: str, *args: Any) -> List[List[Any]]:
+        """Return all rows of a query."""
+
+        return [list(row) for row in self._connection.execute(sql, args)]
+
+    def first(self, sql: str, *args: Any) -> Optional[List[Any]]:
+        """Return the first row of a query or None if there is none."""
+
+        row: Optional[Tuple[Any, ...]] = self._connection.execute(sql, args).fetchone()
+
+        return list(row) if row is not None else None
+
+    def scalar(self, sql: str, *args: Any) -> Any:
+        """Return the first column of the first row of a query."""
+
+        row: Optional[List[Any]] = self.first(sql, *args)
+
+        return row[0] if row is not None else None
+
+    def close(self) -> None:
+        """Close the collection file."""
+
+        self._connection.close()
+
+
+class DeckCounts(NamedTuple):
+    """The card counts of a deck including its subdecks.
+
+    Attributes
+    ----------
+    deck_id : int
+        The id of the deck.
+    name : str
+        The full name of the deck.
+    card_counts : List[int]
+        The total, mature, young, unseen, buried, suspended and due counts.
+    correction_for_notes : int
+        The number of cards per note the counts are divided by.
+    """
+
+    deck_id: int
+    name: str
+    card_counts: List[int]
+    correction_for_notes: int
+
+
+class CollectionReport(NamedTuple):
+    """The card counts of every deck of a collection file.
+
+    Attributes
+    ----------
+    path : str
+        The path of the collection file.
+    decks : List[DeckCounts]
+        The counts of every deck in the order of the deck tree.
+    cards : int
+        The number of cards in the collection.
+    seconds : float
+        The time it took to count the cards.
+    """
+
+    path: str
+    decks: List[DeckCounts]
+    cards: int
+    seconds: float
+
+
+def report_collection(
+    path: str, note_correction_factors: Dict[str, int], now: int
+) -> CollectionReport:
+    """Count the cards of every deck in a collection file.
+
+    All decks are counted in a single grouped query. Only returns plain data,
+    so it can run in a worker process.
+
+    Parameters
+    ----------
+    path : str
+        The path of the collection file.
+    note_correction_factors : Dict[str, int]
+        The number of cards per note by deck name fragment.
+    now : int
+        The current time in seconds since epoch.
+
+    Returns
+    -------
+    CollectionReport
+        The counts of every deck including its subdecks.
+    """
+
+    start: float = time.perf_counter()
+    db: ReadOnlyDB = ReadOnlyDB(path)
+
+    try:
+        deck_names: Dict[int, str] = _read_deck_names(db)
+        totals, _ = roll_up_deck_tree(
+            deck_names, QueryPlanner().query_card_counts_by_deck(db, now)
+        )
+    finally:
+        db.close()
+
+    trie: DeckNameTrie = DeckNameTrie(note_correction_factors)
+    decks: List[DeckCounts] = []
+
+    for did, name in sorted(
+        deck_names.items(), key=lambda deck: deck[1].split(DECK_SEPARATOR)
+    ):
+        decks.append(
+            DeckCounts(
+                did,
+                name,
+                totals[did][:7],
+                find_note_correction_factor(trie, name),
+            )
+        )
+
+    # Every card is counted by exactly one top level deck
+    cards: int = sum(
+        deck.card_counts[0] for deck in decks if DECK_SEPARATOR not in deck.name
+    )
+
+    return CollectionReport(path, decks, cards, time.perf_counter() - start)
+
+
+def report_collections(
+    paths: Sequence[str],
+    note_correction_factors: Dict[str, int],
+    now: int,
+    workers: int,
+) -> List[CollectionReport]:
+    """Count the cards of every deck in many collection files.
+
+    Every collection is counted by `report_collection` in its own worker
+    process, so the collections are counted in parallel on all cores.
+
+    Parameters
+    ----------
+    paths : Sequence[str]
+        The paths of the collection files.
+    note_correction_factors : Dict[str, int]
+        The number of cards per note by deck name fragment.
+    now : int
+        The current time in seconds since epoch.
+    workers : int
+        The maximum number of worker processes.
+
+    Returns
+    -------
+    List[CollectionReport]
+        The reports of all collections in the given order.
+    """
+
+    workers = max(1, min(workers, len(paths)))
+
+    # Starting worker processes doesn't pay off for a single collection
+    if workers == 1:
+        return [
+            report_collection(path, note_correction_factors, now) for path in paths
+        ]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(
+            executor.map(
+                report_collection,
+                paths,
+                repeat(note_correction_factors),
+                repeat(now),
+            )
+        )
+
+
+def iter_deck_stats(
+    reports: Sequence[CollectionReport],
+) -> Iterator[Tuple[str, DeckCounts, DeckStats]]:
+    """Yield the stats of every deck of the given collections.
+
+    Parameters
+    ----------
+    reports : Sequence[CollectionReport]
+        The reports of the collections.
+
+    Yields
+    ------
+    Tuple[str, DeckCounts, DeckStats]
+        The path of the collection file, the deck's counts and its stats. The
+        same `DeckStats` object is updated in place for every deck, so it has
+        to be read before the next deck is requested.
+    """
+
+    stats: DeckStats = DeckStats()
+
+    for report in reports:
+        for deck in report.decks:
+            stats.update(deck.card_counts, (0, 0, 0), deck.correction_for_notes)
+            yield report.path, deck, stats
+
+
+def write_json(reports: Sequence[CollectionReport], output: TextIO) -> None:
+    """Write the stats of every deck as a JSON list."""
+
+    json.dump(
+        [
+            {
+                "collection": path,
+                "id": deck.deck_id,
+                "name": deck.name,
+                "counts": {key: stats[key] for key in REPORT_KEYS},
+            }
+            for path, deck, stats in iter_deck_stats(reports)
+        ],
+        output,
+        indent=2,
+    )
+    output.write("\n")
+
+
+def write_csv(reports: Sequence[CollectionReport], output: TextIO) -> None:
+    """Write the stats of every deck as CSV with one row per deck."""
+
+    writer = csv.writer(output)
+    writer.writerow(("collection", "id", "name") + REPORT_KEYS)
+
+    for path, deck, stats in iter_deck_stats(reports):
+        writer.writerow(
+            [path, deck.deck_id, deck.name] + [stats[key] for key in REPORT_KEYS]
+        )
+
+
+def write_html(
+    reports: Sequence[CollectionReport],
+    output: TextIO,
+    stat_colors: Dict[str, str],
+) -> None:
+    """Write the stats of every deck as HTML formatted like the overview table."""
+
+    section = compile_section(DECK_ROWS, LABELS)
+
+    output.write(
+        f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>More Overview Stats</title>{compile_style(stat_colors)}
+</head>
+<body>
+"""
+    )
+
+    path: Optional[str] = None
+    for deck_path, deck, stats in iter_deck_stats(reports):
+        if deck_path != path:
+            path = deck_path
+            output.write(f"\n        <h2>{html.escape(path)}</h2>\n")
+
+        output.write(
+            f"""
+        <h3>{html.escape(deck.name)}</h3>
+        <table cellspacing="2">{render_section(section, render_cell_values(section, stats))}
+        </table>
+"""
+        )
+
+    output.write("</body>\n</html>\n")
+
+
+def format_throughput(
+    reports: Sequence[CollectionReport], seconds: float, workers: int
+) -> str:
+    """Summarize how fast the collections were counted.
+
+    Parameters
+    ----------
+    reports : Sequence[CollectionReport]
+        The reports of the collections.
+    seconds : float
+        The wall clock time it took to count all collections.
+    workers : int
+        The maximum number of worker processes.
+
+    Returns
+    -------
+    str
+        The number of collections and cards counted per second and how many
+        collections were counted at the same time on average.
+    """
+
+    cards: int = sum(report.cards for report in reports)
+    busy_seconds: float = sum(report.seconds for report in reports)
+    seconds = max(seconds, 1e-9)
+
+    return (
+        f"{len(reports)} collections, {cards} cards in {seconds:.2f} s "
+        f"with up to {workers} workers: "
+        f"{len(reports) / seconds:.1f} collections/s, "
+        f"{cards / seconds:.0f} cards/s, "
+        f"{busy_seconds / seconds:.2f} collections counted at a time on average"
+    )
+
+
+# Return the full name of every deck by its id
+def _read_deck_names(db: Any) -> Dict[int, str]:
+    has_decks_table: bool = bool(
+        db.scalar("select count() from sqlite_master where name = 'decks'")
+    )
+
+    if has_decks_table:
+        return {
+            did: name.replace(_STORED_DECK_SEPARATOR, DECK_SEPARATOR)
+            for did, name in db.all("select id, name from decks")
+        }
+
+    # Older collections store all decks as JSON in the col table
+    decks: Dict[str, Dict[str, Any]] = json.loads(db.scalar("select decks from col"))
+
+    return {int(did): deck["name"] for did, deck in decks.items()}
+
+
+# Read the add-on's config
+def _read_config(path: str) -> Dict[str, Any]:
+    with open(_DEFAULT_CONFIG_PATH, encoding="utf-8") as file:
+        config: Dict[str, Any] = json.load(file)
+
+    if path != _DEFAULT_CONFIG_PATH:
+        with open(path, encoding="utf-8") as file:
+            user_config: Dict[str, Any] = json.load(file)
+
+        # Anki saves the user's config in the add-on's meta.json
+        user_config = user_config.get("config", user_config)
+
+        # Missing colors fall back to the default colors
+        config["Stat Colors"].update(user_config.pop("Stat Colors", {}))
+        config.update(user_config)
+
+    return config
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "collections", nargs="+", help="the collection files, e.g. collection.anki2"
+    )
+    parser.add_argument("--format", choices=REPORT_FORMATS, default="html")
+    parser.add_argument("--output", help="the file to write to instead of stdout")
+    parser.add_argument(
+        "--config",
+        default=_DEFAULT_CONFIG_PATH,
+        help="the add-on config to read, e.g. the config saved in meta.json",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="the maximum number of collections counted in parallel",
+    )
+    parser.add_argument(
+        "--throughput",
+        action="store_true",
+        help="print how fast the collections were counted to stderr",
+    )
+    args = parser.parse_args()
+
+    config: Dict[str, Any] = _read_config(args.config)
+
+    start: float = time.perf_counter()
+    reports: List[CollectionReport] = report_collections(
+        args.collections,
+        config.get("Note Correction Factors", {}),
+        round(time.time()),
+        args.workers,
+    )
+    seconds: float = time.perf_counter() - start
+
+    output: TextIO = sys.stdout
+    if args.output is not None:
+        output = open(args.output, "w", encoding="utf-8", newline="")
+
+    try:
+        if args.format == "json":
+            write_json(reports, output)
+        elif args.format == "csv":
+            write_csv(reports, output)
+        else:
+            write_html(reports, output, config["Stat Colors"])
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    if args.throughput:
+        print(format_throughput(reports, seconds, args.workers), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from .instrumentation import refresh_counts
+
+# The number of seconds a refresh is reused for requests of the same deck
+REFRESH_WINDOW: float = 0.5
+
+# Runs a task on a background thread and passes its future to a callback on
+# the main thread, like `mw.taskman.run_in_background`
+BackgroundRunner = Callable[[Callable[[], Any], Callable[[Future], None]], None]
+
+
+class RefreshScheduler:
+    """The RefreshScheduler object coalesces bursts of refreshes of a deck.
+
+    Anki redraws the overview several times in quick succession, e.g. after
+    syncing, undoing or selecting a deck. Refreshes requested for the same
+    key within `window` seconds of the previous refresh reuse its results
+    instead of refreshing again. The window starts when a refresh finishes
+    and isn't extended by the requests it absorbs, so a steady stream of
+    requests still refreshes once per window.
+
+    Background computations requested for a key whose computation is still
+    running don't start another one, all callers share the running one.
+    The saved refreshes and shared computations are counted in
+    `refresh_counts`.
+
+    Parameters
+    ----------
+    run_in_background : BackgroundRunner
+        Runs a task on a background thread and passes its future to a
+        callback on the main thread, like `mw.taskman.run_in_background`.
+    window : float
+        The number of seconds a refresh is reused for. Default: 0.5
+    """
+
+    def __init__(
+        self,
+        run_in_background: BackgroundRunner,
+        window: float = REFRESH_WINDOW,
+    ) -> None:
+        self._run_in_background = run_in_background
+        self._window: float = window
+
+        # The key of the previous refresh and when it finished
+        self._last_key: Optional[Hashable] = None
+        self._last_time: float = 0.0
+        # The callbacks waiting for the running computation of every key
+        self._in_flight: Dict[Hashable, List[Callable[[Future], None]]] = {}
+
+    def refresh(self, key: Hashable, run: Callable[[], None]) -> bool:
+        """Run a refresh unless the same key was refreshed just before.
+
+        Parameters
+        ----------
+        key : Hashable
+            Identifies the state the refresh reads, e.g. the deck id and the
+            collection modification time.
+        run : Callable[[], None]
+            Refreshes the deck's data.
+
+        Returns
+        -------
+        bool
+            True if the refresh was run, False if the previous one was reused.
+        """
+
+        refresh_counts.requested += 1
+
+        if key == self._last_key and time.monotonic() - self._last_time < self._window:
+            refresh_counts.saved += 1
+            return False
+
+        run()
+        self._last_key = key
+        self._last_time = time.monotonic()
+
+        return True
+
+    def run_in_background(
+        self,
+        key: Hashable,
+        task: Callable[[], Any],
+        on_done: Callable[[Future], None],
+    ) -> None:
+        """Run a task on a background thread unless it's already running.
+
+        Parameters
+        ----------
+        key : Hashable
+            Identifies the computation, e.g. the deck id and the collection
+            modification time.
+        task : Callable[[], Any]
+            The computation run on a background thread.
+        on_done : Callable[[Future], None]
+            Called on the main thread with the future of the computation,
+            which may have been started by an earlier caller.
+        """
+
+        waiting: Optional[List[Callable[[Future], None]]] = self._in_flight.get(key)
+        if waiting is not None:
+            refresh_counts.shared += 1
+            waiting.append(on_done)
+            return None
+
+        self._in_flight[key] = [on_done]
+
+        def on_finished(future: Future) -> None:
+            for callback in self._in_flight.pop(key, []):
+                callback(future)
+
+        self._run_in_background(task, on_finished)
+
+    def clear(self) -> None:
+        """Refresh again on the next request, e.g. after the config changed."""
+
+        self._last_key = None
@@ -0,0 +1,80 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import AddonConfig
+
+
+class RenderSnapshot:
+    """The RenderSnapshot object holds the state used by a single render.
+
+    Captures the scheduler's counts, the current deck, the collection's
+    modification time and the config once per refresh, so all table sections read the same values without calling into
+    Anki's backend again. The captured values never change afterwards, so
+    counts computed from a snapshot on a background thread always belong to
+    the snapshot's deck, even if another deck was opened in the meantime.
+
+    Parameters
+    ----------
+    deck : Dict[str, Any]
+        The currently active deck as returned by `mw.col.decks.current()`.
+    scheduled_counts : List[int]
+        The new, learning and review counts of Anki's scheduler.
+    deck_limit : str
+        The ids of the deck and all of its subdecks, formatted like
+        "(1, 2, 3)".
+    mod : int
+        The collection's modification time, which the cached stats read and
+        written by the render are keyed by.
+    config : AddonConfig
+        The refreshed addon configuration.
+
+    Attributes
+    ----------
+    deck_id : int
+        The id of the currently active deck.
+    deck_name : str
+        The full name of the currently active deck.
+    search : str
+        The search whose cards are counted instead of the deck's cards. Empty
+        if the config doesn't set one for the deck.
+    count_notes : bool
+        Whether notes are counted instead of cards.
+    correction_for_notes : int
+        The number the deck's card counts are divided by.
+    interval_buckets : Optional[Tuple[int, ...]]
+        The upper bounds of the interval buckets. None if the interval
+        distribution isn't shown.
+    """
+
+    def __init__(
+        self,
+        deck: Dict[str, Any],
+        scheduled_counts: List[int],
+        deck_limit: str,
+        mod: int,
+        config: AddonConfig,
+    ) -> None:
+        self.deck: Dict[str, Any] = deck
+        self.deck_id: int = deck["id"]
+        self.deck_name: str = deck["name"]
+        self.scheduled_counts: List[int] = scheduled_counts
+        self.deck_limit: str = deck_limit
+        self.mod: int = mod
+        self.config: AddonConfig = config
+
+        self.search: str = config.search
+        self.count_notes: bool = config.count_notes
+        self.correction_for_notes: int = config.correction_for_notes
+        self.interval_buckets: Optional[Tuple[int, ...]] = (
+            config.interval_buckets if config.show_interval_distribution else None
+        )
+
+    def is_finished(self) -> bool:
+        """Whether the captured deck is done for today.
+
+        Returns
+        -------
+        bool
+            True if deck is done, False otherwise.
+        """
+
+        return not sum(self.scheduled_counts)
@@ -0,0 +1,161 @@
+from array import array
+from typing import Dict, Sequence, Tuple
+
+# The card states shown in the overview table, in the order of their slots
+STAT_KEYS: Tuple[str, ...] = (
+    "mature",
+    "young",
+    "unseen",
+    "buried",
+    "suspended",
+    "total",
+    "learned",
+    "unlearned",
+    "new",
+    "learning",
+    "review",
+    "due",
+)
+
+# The slot of every card state
+STAT_INDEX: Dict[str, int] = {key: index for index, key in enumerate(STAT_KEYS)}
+
+(
+    MATURE,
+    YOUNG,
+    UNSEEN,
+    BURIED,
+    SUSPENDED,
+    TOTAL,
+    LEARNED,
+    UNLEARNED,
+    NEW,
+    LEARNING,
+    REVIEW,
+    DUE,
+) = range(len(STAT_KEYS))
+
+
+class DeckStats:
+    """The DeckStats object holds the stats of a deck shown in the table.
+
+    Every card state has a fixed slot in typed arrays that are overwritten in
+    place on every update, so refreshing the stats doesn't allocate and
+    reading them doesn't hash any keys. The slots are indexed by the
+    constants of this module, e.g. `stats.counts[MATURE]`, or by the keys in
+    `STAT_KEYS`, e.g. `stats["mature"]`. Consumers showing the stats of many
+    decks can reuse a single record for all of them.
+
+    Attributes
+    ----------
+    counts : array
+        The counts of the respective card states.
+    percentages : array
+        The relative counts of the respective card states.
+    percentages_without_suspended : array
+        The percentages when excluding suspended cards from all counts.
+    days_left : str
+        The approximate number of days left.
+    done_date : str
+        The date the deck will be finished on.
+    forecast_days : str
+        The range of days left forecast from the review history.
+    forecast_date : str
+        The latest date the deck is forecast to be finished on.
+    workload : str
+        The forecast number of reviews per day.
+    """
+
+    __slots__ = (
+        "counts",
+        "percentages",
+        "percentages_without_suspended",
+        "days_left",
+        "done_date",
+        "forecast_days",
+        "forecast_date",
+        "workload",
+    )
+
+    def __init__(self) -> None:
+        self.counts: array = array("q", [0] * len(STAT_KEYS))
+        self.percentages: array = array("d", [0.0] * len(STAT_KEYS))
+        self.percentages_without_suspended: array = array("d", [0.0] * len(STAT_KEYS))
+
+        self.days_left: str = ""
+        self.done_date: str = ""
+        self.forecast_days: str = ""
+        self.forecast_date: str = ""
+        self.workload: str = ""
+
+    # Return the count of the card state with the given key
+    def __getitem__(self, key: str) -> int:
+        return self.counts[STAT_INDEX[key]]
+
+    def update(
+        self,
+        card_counts: Sequence[int],
+        scheduled_counts: Sequence[int],
+        correction_for_notes: int,
+    ) -> None:
+        """Overwrite the counts and percentages with a deck's current state.
+
+        Parameters
+        ----------
+        card_counts : Sequence[int]
+            The total, mature, young, unseen, buried, suspended and due counts
+            of the deck's cards.
+        scheduled_counts : Sequence[int]
+            The new, learning and review counts of Anki's scheduler.
+        correction_for_notes : int
+            The number of cards per note the card counts are divided by.
+        """
+
+        total, mature, young, unseen, buried, suspended, due = card_counts
+        new, learning, review = scheduled_counts
+        counts: array = self.counts
+
+        counts[MATURE] = mature // correction_for_notes
+        counts[YOUNG] = young // correction_for_notes
+        counts[UNSEEN] = unseen // correction_for_notes
+        counts[BURIED] = buried // correction_for_notes
+        counts[SUSPENDED] = suspended // correction_for_notes
+
+        counts[TOTAL] = total // correction_for_notes
+        counts[LEARNED] = counts[MATURE] + counts[YOUNG]
+        counts[UNLEARNED] = counts[TOTAL] - counts[LEARNED]
+
+        counts[NEW] = new
+        counts[LEARNING] = learning
+        counts[REVIEW] = review
+        counts[DUE] = due + counts[REVIEW]
+
+        self._refresh_percentages(self.percentages, counts[TOTAL])
+        self._refresh_percentages(
+            self.percentages_without_suspended, counts[TOTAL] - counts[SUSPENDED]
+        )
+
+    def is_empty(self) -> bool:
+        """Whether the deck doesn't contain any cards.
+
+        Returns
+        -------
+        bool
+            True if deck is empty, False otherwise.
+        """
+
+        return not self.counts[TOTAL]
+
+    # Overwrite the given percentages relative to the given total
+    def _refresh_percentages(self, percentages: array, total: int) -> None:
+        counts: array = self.counts
+
+        # Avoid division by zero for empty decks
+        if total == 0:
+            for index in range(len(counts)):
+                percentages[index] = 0.0
+        else:
+            for index in range(len(counts)):
+                percentages[index] = counts[index] / total
+
+        percentages[TOTAL] = 1.0
@@ -1,7 +1,33 @@
+import html
+from typing import Dict, List, Optional
+
 from aqt import mw
 
 from .config import AddonConfig
 from .data import DeckData
+from .history import TREND_DAYS
+from .instrumentation import phase_timings, refresh_counts
+from .stats import DeckStats
+from .templates import (
+    DECK_ROWS,
+    STUDY_ROWS,
+    UPDATE_SCRIPT,
+    SectionTemplate,
+    compile_distribution_rows,
+    compile_done_date_row,
+    compile_forecast_rows,
+    compile_search_row,
+    compile_section,
+    compile_style,
+    compile_subdeck_section,
+    compile_trend_row,
+    render_cell_values,
+    render_ease_quartiles,
+    render_interval_buckets,
+    render_section,
+    render_sparkline,
+    render_subdeck_rows,
+)
 
 
 class Table:
@@ -13,12 +39,38 @@ class Table:
         Object used to load the addon's user configuration.
     deck_data : DeckData
         Object used to load the currently active deck's data.
+
+    Attributes
+    ----------
+    rendered_values : Dict[str, str]
+        The cell values of the most recently assembled table.
     """
 
     def __init__(self, config: AddonConfig, deck_data: DeckData) -> None:
         self._config: AddonConfig = config
         self._deck_data: DeckData = deck_data
 
+        # The labels never change, so the rows only have to be compiled once
+        # The rows are rendered from the formatted cell values, so every
+        # number is only formatted once per render
+        self._study_section: SectionTemplate = compile_section(
+            STUDY_ROWS, deck_data.labels
+        )
+        self._deck_section: SectionTemplate = compile_section(
+            DECK_ROWS, deck_data.labels
+        )
+        self._done_date_row: str = compile_done_date_row(deck_data.labels)
+        self._forecast_rows: str = compile_forecast_rows(deck_data.labels)
+        self._subdeck_section: str = compile_subdeck_section(deck_data.labels)
+        self._trend_row: str = compile_trend_row(deck_data.labels)
+        self._search_row: str = compile_search_row(deck_data.labels)
+        self._distribution_rows: str = compile_distribution_rows(deck_data.labels)
+
+        self._style: str = ""
+        self._style_version: Optional[int] = None
+
+        self.rendered_values: Dict[str, str] = {}
+
     def get_html(self) -> str:
         """Assemble the complete overview table in HTML code.
 
@@ -33,161 +85,121 @@ class Table:
             HTML code of the assembled overview table.
         """
 
+        self.rendered_values = self.get_cell_values()
+
         return f"""
+        <div id="more-overview-stats">
+        <script>{UPDATE_SCRIPT}</script>
         {self._get_style()}
         {self._get_start()}
         {self._get_study_stats()}
         {self._get_deck_stats()}
         {self._get_end()}
+        </div>
         """
 
-    # Return the table's style css
-    def _get_style(self) -> str:
-        return (
-            """
-            <style type="text/css">
-            <!--
-            hr {
-                height: 1px;
-                border: none;
-                border-top: 1px solid #aaa;
-            }
-
-            td {
-                vertical-align: top;
-            }
-
-            td.col1 {
-                text-align: left;
-            }
-
-            td.col2 {
-                text-align: right;
-                padding-left: 1.2em;
-                padding-right: 1.2em;
-            }
-
-            td.col3 {
-                text-align: left;
-                padding-left: 1.2em;
-                padding-right: 1.2em;
-            }
-
-            td.col4 {
-                text-align: right;
-            }
-
-            td.new {
-                font-weight: bold;
-                color: """
-            + self._config.stat_colors["New"]
-            + """;
-            }
-
-            td.learning {
-                font-weight: bold;
-                color: """
-            + self._config.stat_colors["Learning"]
-            + """;
-            }
-
-            td.review {
-                font-weight: bold;
-                color: """
-            + self._config.stat_colors["Review"]
-            + """;
-            }
-
-            td.percent {
-                font-weight: normal;
-                color: """
-            + self._config.stat_colors["Percent"]
-            + """;
-            }
-
-            td.mature {
-                font-weight: normal;
-                color: """
-            + self._config.stat_colors["Mature"]
-            + """;
-            }
-
-            td.young {
-                font-weight: normal;
-                color: """
-            + self._config.stat_colors["Young"]
-            + """;
-            }
-
-            td.learned {
-                font-weight: normal;
-                color: """
-            + self._config.stat_colors["Learned"]
-            + """;
-            }
-
-            td.unseen {
-                font-weight: normal;
-                color: """
-            + self._config.stat_colors["Unseen"]
-            + """;
-            }
-
-            td.suspended {
-                font-weight: normal;
-                color: """
-            + self._config.stat_colors["Suspended"]
-            + """;
-            }
-
-            td.buried {
-                font-weight: normal;
-                color: """
-            + self._config.stat_colors["Buried"]
-            + """;
-            }
-
-            td.doneDate {
-                font-weight: bold;
-                color: """
-            + self._config.stat_colors["Done on Date"]
-            + """;
-            }
-
-            td.daysLeft {
-                font-weight: bold;
-                color: """
-            + self._config.stat_colors["Days until done"]
-            + """;
-            }
-
-            td.total {
-                font-weight: bold;
-                color: """
-            + self._config.stat_colors["Total"]
-            + """;
-            }
-            -->
-            </style>"""
+    def get_subdeck_html(self) -> str:
+        """Assemble the card counts of the current deck's subdecks in HTML code.
+
+        Queries the counts of all subdecks at once, so this is only called
+        once the user expands the subdeck breakdown of the table.
+
+        Returns
+        -------
+        str
+            HTML code of the subdeck table.
+        """
+
+        return render_subdeck_rows(
+            self._deck_data.snapshot.deck_name,
+            self._deck_data.get_subdeck_stats(),
+            self._deck_data.labels,
+            self._config.correction_for_notes,
         )
 
+    def get_cell_values(self) -> Dict[str, str]:
+        """Format the current stats of every value cell of the table.
+
+        Only reads the stats, so comparing the values to `rendered_values`
+        shows which cells of the shown table changed without assembling the
+        whole table.
+
+        Returns
+        -------
+        Dict[str, str]
+            The HTML content of every value cell by its data-cell name.
+        """
+
+        values: Dict[str, str] = {}
+
+        if self._deck_data.is_finished():
+            values["deckName"] = self._deck_data.snapshot.deck_name
+        else:
+            values.update(self._get_section_values(self._study_section))
+
+        stats: DeckStats = self._deck_data.stats
+
+        if self._config.search:
+            values["search"] = html.escape(self._config.search)
+
+        values.update(self._get_section_values(self._deck_section))
+
+        if self._deck_data.distribution is not None:
+            values["intervals"] = render_interval_buckets(self._deck_data.distribution)
+            values["ease"] = render_ease_quartiles(self._deck_data.distribution)
+
+        values["daysLeft"] = stats.days_left
+        values["doneDate"] = stats.done_date
+
+        if self._deck_data.forecast is not None:
+            values["forecastDays"] = stats.forecast_days
+            values["forecastDate"] = stats.forecast_date
+            values["workload"] = stats.workload
+
+        if self._config.show_stats_history:
+            values["trend"] = self._get_sparkline()
+
+        if self._config.show_render_timings:
+            values["renderTimings"] = self._format_render_timings()
+
+        return values
+
+    # Return the cell values of the given section
+    def _get_section_values(self, section: SectionTemplate) -> Dict[str, str]:
+        return render_cell_values(section, self._deck_data.stats)
+
+    # Return the table's style css, compiled once per config version
+    def _get_style(self) -> str:
+        if self._style_version != self._config.version:
+            self._style = compile_style(self._config.stat_colors)
+            self._style_version = self._config.version
+
+        return self._style
+
     # Return start of the table's HTML
     def _get_start(self) -> str:
+        # Hide the placeholder values while the stats are computed
+        table_class: str = "loading" if self._is_placeholder() else ""
+
         return f"""
         {self._get_deck_name()}
-        <table cellspacing="2">
+        <table cellspacing="2" class="{table_class}">
         """
 
+    # Whether the table only shows placeholders instead of the deck's stats
+    def _is_placeholder(self) -> bool:
+        return self._deck_data.is_loading and self._deck_data.stats.is_empty()
+
     # Return HTML of the deck name for unfinished decks
     def _get_deck_name(self) -> str:
         if not self._deck_data.is_finished():
             return ""
 
-        deck_name: str = mw.col.decks.current()["name"]
+        deck_name: str = self._deck_data.snapshot.deck_name
 
         return f"""
         <center>
-        <h3>{deck_name}</h3>
+        <h3 data-cell="deckName">{deck_name}</h3>
         """
 
     # Return HTML of the study stats for unfinished decks
@@ -195,109 +207,83 @@ class Table:
         if self._deck_data.is_finished():
             return ""
 
-        return """
-        <tr>
-            <td class="col1">{labels[new]:s}</td>
-            <td class="col2 new">{deck_stats[new]:d}</td>
-            <td class="col3 percent">{deck_percentages[new]:.0%}</td>
-            <td class="col4 percent">{deck_percentages_without_suspended[new]:.0%}</td>
-        </tr>
-        <tr>
-            <td class="col1">{labels[learning]:s}</td>
-            <td class="col2 learning">{deck_stats[learning]:d}</td>
-            <td class="col3 percent">{deck_percentages[learning]:.0%}</td>
-            <td class="col4 percent">{deck_percentages_without_suspended[learning]:.0%}</td>
-        </tr>
-        <tr>
-            <td class="col1">{labels[review]:s}</td>
-            <td class="col2 review">{deck_stats[review]:d}</td>
-            <td class="col3 percent">{deck_percentages[review]:.0%}</td>
-            <td class="col4 percent">{deck_percentages_without_suspended[review]:.0%}</td>
-        </tr>
-        <tr>
-            <td colspan="4"><hr /></td>
-        </tr>
-        """.format(
-            labels=self._deck_data.labels,
-            deck_stats=self._deck_data.stats,
-            deck_percentages=self._deck_data.percentages,
-            deck_percentages_without_suspended=self._deck_data.percentages_without_suspended,
-        )
+        return render_section(self._study_section, self.rendered_values)
 
     # Return HTML of the deck stats for unfinished decks
     def _get_deck_stats(self) -> str:
-        return """
-        <tr>
-            <td class="col1">{labels[mature]:s}</td>
-            <td class="col2 mature">{deck_stats[mature]:d}</td>
-            <td class="col3 percent">{deck_percentages[mature]:.0%}</td>
-            <td class="col4 percent">{deck_percentages_without_suspended[mature]:.0%}</td>
-        </tr>
-        <tr>
-            <td class="col1">{labels[young]:s}</td>
-            <td class="col2 young">{deck_stats[young]:d}</td>
-            <td class="col3 percent">{deck_percentages[young]:.0%}</td>
-            <td class="col4 percent">{deck_percentages_without_suspended[young]:.0%}</td>
-        </tr>
-        <tr>
-            <td colspan="4"><hr /></td>
-        </tr>
-        <tr>
-            <td class="col1">{labels[learned]:s}</td>
-            <td class="col2 learned">{deck_stats[learned]:d}</td>
-            <td class="col3 percent">{deck_percentages[learned]:.0%}</td>
-            <td class="col4 percent">{deck_percentages_without_suspended[learned]:.0%}</td>
-        </tr>
-        <tr>
-            <td class="col1">{labels[unseen]:s}</td>
-            <td class="col2 unseen">{deck_stats[unseen]:d}</td>
-            <td class="col3 percent">{deck_percentages[unseen]:.0%}</td>
-            <td class="col4 percent">{deck_percentages_without_suspended[unseen]:.0%}</td>
-        </tr>
-        <tr>
-            <td class="col1">{labels[buried]:s}</td>
-            <td class="col2 buried">{deck_stats[buried]:d}</td>
-            <td class="col3 percent">{deck_percentages[buried]:.0%}</td>
-            <td class="col4 percent">{deck_percentages_without_suspended[buried]:.0%}</td>
-        </tr>
-        <tr>
-            <td class="col1">{labels[suspended]:s}</td>
-            <td class="col2 suspended">{deck_stats[suspended]:d}</td>
-            <td class="col3 percent">{deck_percentages[suspended]:.0%}</td>
-            <td class="col4 percent">ignored</td>
-        </tr>
-        <tr>
-            <td colspan="4"><hr /></td>
-        </tr>
-        <tr>
-            <td class="col1">{labels[total]:s}</td>
-            <td class="col2 total">{deck_stats[total]:d}</td>
-            <td class="col3 percent">{deck_percentages[total]:.0%}</td>
-            <td class="col4 percent">{deck_percentages_without_suspended[total]:.0%}</td>
-        </tr>
-            <td colspan="4"><hr /></td>
-        <tr>
-            <td class="col1">{labels[doneDate]:s}</td>
-            <td class="col2 daysLeft">{deck_dates[daysLeft]:s}</td>
-            <td class="col3">on:</td>
-            <td class="col4 doneDate">{deck_dates[doneDate]:s}</td>
-        </tr>
-        """.format(
-            labels=self._deck_data.labels,
-            deck_stats=self._deck_data.stats,
-            deck_dates=self._deck_data.dates,
-            deck_percentages=self._deck_data.percentages,
-            deck_percentages_without_suspended=self._deck_data.percentages_without_suspended,
+        stats: DeckStats = self._deck_data.stats
+
+        deck_rows: str = render_section(self._deck_section, self.rendered_values)
+        done_date_row: str = self._done_date_row.format(
+            stats.days_left, stats.done_date
+        )
+
+        return (
+            self._get_search()
+            + deck_rows
+            + self._get_distribution()
+            + done_date_row
+            + self._get_forecast()
+            + self._get_trend()
+        )
+
+    # Return HTML of the search the stats are counted for if set
+    def _get_search(self) -> str:
+        if not self._config.search:
+            return ""
+
+        return self._search_row.format(html.escape(self._config.search))
+
+    # Return HTML of the interval and ease distribution if available
+    def _get_distribution(self) -> str:
+        if self._deck_data.distribution is None:
+            return ""
+
+        return self._distribution_rows.format(
+            self.rendered_values["intervals"], self.rendered_values["ease"]
+        )
+
+    # Return HTML of the done date forecast if available
+    def _get_forecast(self) -> str:
+        if self._deck_data.forecast is None:
+            return ""
+
+        stats: DeckStats = self._deck_data.stats
+
+        return self._forecast_rows.format(
+            stats.forecast_days, stats.forecast_date, stats.workload
+        )
+
+    # Return HTML of the trend of the deck's stats if enabled
+    def _get_trend(self) -> str:
+        if not self._config.show_stats_history:
+            return ""
+
+        return self._trend_row.format(self.rendered_values["trend"])
+
+    # Return the sparkline of the deck's recorded stats
+    def _get_sparkline(self) -> str:
+        return render_sparkline(
+            self._deck_data.history, TREND_DAYS, self._config.stat_colors
         )
 
     # Return end of the table's HTML
     def _get_end(self):
         return f"""
+            {self._get_subdeck_section()}
             {self._get_study_button()}
+            {self._get_render_timings()}
         </table>
         </br>
         """
 
+    # Return HTML of the expandable subdeck breakdown if enabled
+    def _get_subdeck_section(self) -> str:
+        if not self._config.show_subdeck_breakdown:
+            return ""
+
+        return self._subdeck_section
+
     # Return HTML of the study button for unfinished decks
     def _get_study_button(self) -> str:
         if self._deck_data.is_finished():
@@ -308,3 +294,26 @@ class Table:
             <td colspan="4" style="text-align: center; padding-top: 0.6em;">{mw.button("study", "Study Now", id="study", extra="autofocus")}</td>
         </tr>
         """
+
+    # Return HTML of the latest phase durations if enabled
+    def _get_render_timings(self) -> str:
+        if not self._config.show_render_timings:
+            return ""
+
+        return f"""
+        <tr>
+            <td colspan="4" class="percent" style="text-align: center; font-size: small;" data-cell="renderTimings">{self.rendered_values["renderTimings"]}</td>
+        </tr>
+        """
+
+    # Return the latest phase durations and the number of saved refreshes
+    def _format_render_timings(self) -> str:
+        timings: List[str] = [
+            f"{name} {duration:.1f} ms"
+            for name, duration in phase_timings.last().items()
+        ]
+        timings.append(
+            f"{refresh_counts.saved} of {refresh_counts.requested} refreshes saved"
+        )
+
+        return " &middot; ".join(timings)
@@ -0,0 +1,679 @@
+import html
+from array import array
+from types import MappingProxyType
+from typing import Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+from .deck_trie import DECK_SEPARATOR
+from .distribution import Distribution
+from .stats import STAT_INDEX, DeckStats
+
+# The labels for all entries in the overview table
+LABELS: Mapping[str, str] = MappingProxyType(
+    {
+        key: "{:s}:".format(label)
+        for key, label in (
+            ("mature", "Mature"),
+            ("young", "Young"),
+            ("unseen", "Unseen"),
+            ("buried", "Buried"),
+            ("suspended", "Suspended"),
+            ("total", "Total"),
+            ("learned", "Learned"),
+            ("unlearned", "Unlearned"),
+            ("new", "New"),
+            ("learning", "Learning"),
+            ("review", "Review"),
+            ("due", "Due"),
+            ("doneDate", "Done in"),
+            ("forecast", "Forecast"),
+            ("workload", "Workload"),
+            ("subdecks", "Subdecks"),
+            ("trend", "Trend"),
+            ("search", "Search"),
+            ("intervals", "Intervals"),
+            ("ease", "Ease"),
+        )
+    }
+)
+
+# The static part of the table's style css
+_BASE_STYLE: str = """
+            hr {
+                height: 1px;
+                border: none;
+                border-top: 1px solid #aaa;
+            }
+
+            td {
+                vertical-align: top;
+            }
+
+            td.col1 {
+                text-align: left;
+            }
+
+            td.col2 {
+                text-align: right;
+                padding-left: 1.2em;
+                padding-right: 1.2em;
+            }
+
+            td.col3 {
+                text-align: left;
+                padding-left: 1.2em;
+                padding-right: 1.2em;
+            }
+
+            td.col4 {
+                text-align: right;
+            }
+
+            table.loading td.col2,
+            table.loading td.col4 {
+                visibility: hidden;
+            }
+"""
+
+# The css class, font weight and stat color of every colored table cell
+_COLORED_CELLS: Tuple[Tuple[str, str, str], ...] = (
+    ("new", "bold", "New"),
+    ("learning", "bold", "Learning"),
+    ("review", "bold", "Review"),
+    ("percent", "normal", "Percent"),
+    ("mature", "normal", "Mature"),
+    ("young", "normal", "Young"),
+    ("learned", "normal", "Learned"),
+    ("unseen", "normal", "Unseen"),
+    ("suspended", "normal", "Suspended"),
+    ("buried", "normal", "Buried"),
+    ("doneDate", "bold", "Done on Date"),
+    ("daysLeft", "bold", "Days until done"),
+    ("total", "bold", "Total"),
+)
+
+# The stat keys of the rows shown for unfinished decks. None marks a separator.
+STUDY_ROWS: Tuple[Optional[str], ...] = ("new", "learning", "review", None)
+
+# The stat keys of the rows shown for all decks. None marks a separator.
+DECK_ROWS: Tuple[Optional[str], ...] = (
+    "mature",
+    "young",
+    None,
+    "learned",
+    "unseen",
+    "buried",
+    "suspended",
+    None,
+    "total",
+)
+
+# The format specs of the counts, percentages and percentages without
+# suspended cards
+_CELL_FORMATS: Tuple[str, ...] = ("d", ".0%", ".0%")
+
+# Separates the cell values formatted at once, can't occur in any of them
+_CELL_SEPARATOR: str = "\x1f"
+
+_SEPARATOR_ROW: str = """
+        <tr>
+            <td colspan="4"><hr /></td>
+        </tr>"""
+
+# Stat rows only contain slots for the count and both percentages, which are
+# filled with markers the compiled section is split at
+_STAT_ROW: str = """
+        <tr>
+            <td class="col1">{label}</td>
+            <td class="col2 {key}" data-cell="{key}">{count}</td>
+            <td class="col3 percent" data-cell="{key}.percent">{percent}</td>
+            <td class="col4 percent" data-cell="{key}.percentWithoutSuspended">{percent_without_suspended}</td>
+        </tr>"""
+
+# Suspended cards are ignored in the percentages without suspended cards
+_SUSPENDED_ROW: str = """
+        <tr>
+            <td class="col1">{label}</td>
+            <td class="col2 {key}" data-cell="{key}">{count}</td>
+            <td class="col3 percent" data-cell="{key}.percent">{percent}</td>
+            <td class="col4 percent">ignored</td>
+        </tr>"""
+
+_DONE_DATE_ROW: str = """
+            <td colspan="4"><hr /></td>
+        <tr>
+            <td class="col1">{label}</td>
+            <td class="col2 daysLeft" data-cell="daysLeft">{{0:s}}</td>
+            <td class="col3">on:</td>
+            <td class="col4 doneDate" data-cell="doneDate">{{1:s}}</td>
+        </tr>"""
+
+_FORECAST_ROWS: str = """
+        <tr>
+            <td class="col1">{forecast_label}</td>
+            <td class="col2 daysLeft" data-cell="forecastDays">{{0:s}}</td>
+            <td class="col3">by:</td>
+            <td class="col4 doneDate" data-cell="forecastDate">{{1:s}}</td>
+        </tr>
+        <tr>
+            <td class="col1">{workload_label}</td>
+            <td class="col2 daysLeft" data-cell="workload">{{2:s}}</td>
+            <td class="col3"></td>
+            <td class="col4"></td>
+        </tr>"""
+
+_TREND_ROW: str = """
+        <tr>
+            <td class="col1">{label}</td>
+            <td colspan="3" data-cell="trend">{{0:s}}</td>
+        </tr>"""
+
+_SEARCH_ROW: str = """
+        <tr>
+            <td class="col1">{label}</td>
+            <td colspan="3" class="percent" data-cell="search">{{0:s}}</td>
+        </tr>"""
+
+_DISTRIBUTION_ROWS: str = """
+        <tr>
+            <td class="col1">{intervals_label}</td>
+            <td colspan="3" class="percent" data-cell="intervals">{{0:s}}</td>
+        </tr>
+        <tr>
+            <td class="col1">{ease_label}</td>
+            <td colspan="3" class="percent" data-cell="ease">{{1:s}}</td>
+        </tr>"""
+
+# The names of the ease quantiles shown in the table
+_EASE_QUANTILE_NAMES: Tuple[str, ...] = ("Q1", "median", "Q3")
+
+# The card states drawn in the trend, their index in the recorded history and
+# their stat color
+_TREND_LINES: Tuple[Tuple[str, int, str], ...] = (
+    ("mature", 0, "Mature"),
+    ("young", 1, "Young"),
+    ("unseen", 2, "Unseen"),
+)
+
+# The card states shown for every subdeck and the index of their counts in
+# the card counts returned by Anki's db
+SUBDECK_COLUMNS: Tuple[Tuple[str, int], ...] = (
+    ("mature", 1),
+    ("young", 2),
+    ("unseen", 3),
+    ("buried", 4),
+    ("suspended", 5),
+)
+
+# The pycmd message sent when the subdeck breakdown is expanded for the first
+# time
+SUBDECK_MESSAGE: str = "moreOverviewStats:subdecks"
+
+# The subdeck rows are only rendered once the section is expanded
+_SUBDECK_SECTION: str = """
+        <tr>
+            <td colspan="4">
+                <details id="more-overview-stats-subdecks"
+                    ontoggle="if (this.open && !this.dataset.loaded) {{ this.dataset.loaded = 1; pycmd('{message}'); }}">
+                    <summary class="percent">{label}</summary>
+                    <div class="subdecks"></div>
+                </details>
+            </td>
+        </tr>"""
+
+_SUBDECK_ROW: str = """
+        <tr>
+            <td class="col1" style="padding-left: {indent}em;">{name}</td>{cells}
+        </tr>"""
+
+# Defines the function updating the cells of an injected table in place. Every
+# value cell is marked with a data-cell attribute, so a diff of the changed
+# cells' contents is enough to update the table.
+UPDATE_SCRIPT: str = """
+    window.moreOverviewStats = {
+        update: function (cells) {
+            const table = document.getElementById("more-overview-stats");
+            if (table == null) {
+                return false;
+            }
+            for (const [name, html] of Object.entries(cells)) {
+                for (const cell of table.querySelectorAll(`[data-cell="${name}"]`)) {
+                    cell.innerHTML = html;
+                }
+            }
+            for (const loading of table.querySelectorAll("table.loading")) {
+                loading.classList.remove("loading");
+            }
+            return true;
+        },
+    };
+"""
+
+
+class SectionTemplate(NamedTuple):
+    """Consecutive table rows compiled into a single template.
+
+    Attributes
+    ----------
+    parts : Tuple[str, ...]
+        The rows' HTML code split at every value cell, so the values only
+        have to be joined with the parts instead of parsing a template on
+        every render. Has one more part than there are value cells.
+    cells : Tuple[str, ...]
+        The data-cell names of the value cells in the order of their slots.
+    cell_format : str
+        Formats the numbers of all value cells at once. The formatted values
+        are separated by `_CELL_SEPARATOR`.
+    stat_slots : Tuple[Tuple[int, int], ...]
+        The array of `DeckStats` and the slot in it every value cell shows.
+        The arrays are numbered in the order counts, percentages and
+        percentages without suspended cards.
+    """
+
+    parts: Tuple[str, ...]
+    cells: Tuple[str, ...]
+    cell_format: str
+    stat_slots: Tuple[Tuple[int, int], ...]
+
+
+def compile_style(stat_colors: Dict[str, str]) -> str:
+    """Assemble the table's style css.
+
+    Parameters
+    ----------
+    stat_colors : Dict[str, str]
+        The colors for all entries in the overview table.
+
+    Returns
+    -------
+    str
+        The complete style element of the overview table.
+    """
+
+    colored_cells: str = "".join(
+        f"""
+            td.{css_class} {{
+                font-weight: {font_weight};
+                color: {stat_colors[color_key]};
+            }}
+"""
+        for css_class, font_weight, color_key in _COLORED_CELLS
+    )
+
+    return f"""
+            <style type="text/css">
+            <!--{_BASE_STYLE}{colored_cells}            -->
+            </style>"""
+
+
+def compile_section(
+    keys: Sequence[Optional[str]], labels: Mapping[str, str]
+) -> SectionTemplate:
+    """Precompile the rows showing the given stats into a single template.
+
+    All cell values of the section are formatted with a single `str.format`
+    call, see `render_cell_values`, and joined with the section's static
+    parts, see `render_section`.
+
+    Parameters
+    ----------
+    keys : Sequence[Optional[str]]
+        The stat keys of the rows. None adds a separator row.
+    labels : Mapping[str, str]
+        The labels for all entries in the overview table.
+
+    Returns
+    -------
+    SectionTemplate
+        The template of all rows in the given order.
+    """
+
+    html: List[str] = []
+    cells: List[str] = []
+    stat_slots: List[Tuple[int, int]] = []
+
+    for key in keys:
+        if key is None:
+            html.append(_SEPARATOR_ROW)
+            continue
+
+        # Mark the value cells, so the section can be split at them
+        row_html, row_cells = _compile_row(key, labels, _CELL_SEPARATOR)
+        html.append(row_html)
+        cells.extend(row_cells)
+        stat_slots.extend((array, STAT_INDEX[key]) for array in range(len(row_cells)))
+
+    return SectionTemplate(
+        parts=tuple("".join(html).split(_CELL_SEPARATOR)),
+        cells=tuple(cells),
+        cell_format=_CELL_SEPARATOR.join(
+            "{{{:d}:{:s}}}".format(slot, _CELL_FORMATS[array])
+            for slot, (array, _) in enumerate(stat_slots)
+        ),
+        stat_slots=tuple(stat_slots),
+    )
+
+
+# Return the HTML code of a stat's row with the given marker in every value
+# cell and the data-cell names of its value cells
+def _compile_row(
+    key: str, labels: Mapping[str, str], marker: str
+) -> Tuple[str, Tuple[str, ...]]:
+    if key == "suspended":
+        html: str = _SUSPENDED_ROW.format(
+            label=labels[key], key=key, count=marker, percent=marker
+        )
+        return html, (key, f"{key}.percent")
+
+    html = _STAT_ROW.format(
+        label=labels[key],
+        key=key,
+        count=marker,
+        percent=marker,
+        percent_without_suspended=marker,
+    )
+    return html, (key, f"{key}.percent", f"{key}.percentWithoutSuspended")
+
+
+def compile_done_date_row(labels: Mapping[str, str]) -> str:
+    """Precompile the row showing when the deck will be finished.
+
+    The returned row contains positional `str.format` slots for the days left
+    and the date the deck will be finished on.
+    """
+
+    return _DONE_DATE_ROW.format(label=labels["doneDate"])
+
+
+def compile_forecast_rows(labels: Mapping[str, str]) -> str:
+    """Precompile the rows showing the done date forecast.
+
+    The returned rows contain positional `str.format` slots for the forecast
+    range of days, the latest forecast date and the daily workload.
+    """
+
+    return _FORECAST_ROWS.format(
+        forecast_label=labels["forecast"], workload_label=labels["workload"]
+    )
+
+
+def compile_trend_row(labels: Mapping[str, str]) -> str:
+    """Precompile the row showing the trend of the deck's stats.
+
+    The returned row contains a positional `str.format` slot for the
+    sparkline returned by `render_sparkline`.
+    """
+
+    return _TREND_ROW.format(label=labels["trend"])
+
+
+def compile_search_row(labels: Mapping[str, str]) -> str:
+    """Precompile the row showing the search the stats are counted for.
+
+    The returned row contains a positional `str.format` slot for the
+    escaped search.
+    """
+
+    return _SEARCH_ROW.format(label=labels["search"])
+
+
+def compile_distribution_rows(labels: Mapping[str, str]) -> str:
+    """Precompile the rows showing the interval and ease distribution.
+
+    The returned rows contain positional `str.format` slots for the interval
+    buckets returned by `render_interval_buckets` and the ease quartiles
+    returned by `render_ease_quartiles`.
+    """
+
+    return _DISTRIBUTION_ROWS.format(
+        intervals_label=labels["intervals"], ease_label=labels["ease"]
+    )
+
+
+def render_interval_buckets(distribution: Distribution) -> str:
+    """Format the number of review cards in every interval bucket.
+
+    Parameters
+    ----------
+    distribution : Distribution
+        The interval and ease distribution of the deck's review cards.
+
+    Returns
+    -------
+    str
+        The buckets like "1&ndash;7d: 120 &middot; 8d+: 800".
+    """
+
+    buckets: List[str] = []
+    # Review cards have an interval of at least one day
+    lower: int = 1
+
+    for upper, count in zip(distribution.bucket_bounds, distribution.interval_counts):
+        buckets.append(f"{lower}&ndash;{upper}d: {count}")
+        lower = upper + 1
+
+    buckets.append(f"{lower}d+: {distribution.interval_counts[-1]}")
+
+    return " &middot; ".join(buckets)
+
+
+def render_ease_quartiles(distribution: Distribution) -> str:
+    """Format the quartiles of the ease factors of the review cards.
+
+    Parameters
+    ----------
+    distribution : Distribution
+        The interval and ease distribution of the deck's review cards.
+
+    Returns
+    -------
+    str
+        The quartiles like "Q1 230% &middot; median 250% &middot; Q3 270%" or
+        "&ndash;" if there are no review cards.
+    """
+
+    if distribution.ease_quartiles is None:
+        return "&ndash;"
+
+    return " &middot; ".join(
+        f"{name} {factor / 10:.0f}%"
+        for name, factor in zip(_EASE_QUANTILE_NAMES, distribution.ease_quartiles)
+    )
+
+
+def render_sparkline(
+    history: Sequence[Tuple[int, Sequence[int]]],
+    days: int,
+    stat_colors: Dict[str, str],
+) -> str:
+    """Draw the recorded mature, young and unseen counts as a sparkline.
+
+    Parameters
+    ----------
+    history : Sequence[Tuple[int, Sequence[int]]]
+        The day and the recorded counts of every recorded day, ordered by day.
+    days : int
+        The number of days covered by the sparkline, ending at the last
+        recorded day.
+    stat_colors : Dict[str, str]
+        The colors for all entries in the overview table.
+
+    Returns
+    -------
+    str
+        The sparkline as an inline SVG element or a dash if less than two
+        days were recorded.
+    """
+
+    if len(history) < 2:
+        return "&ndash;"
+
+    first_day: int = history[-1][0] - days + 1
+    maximum: int = max(
+        values[index] for _, values in history for _, index, _ in _TREND_LINES
+    )
+
+    polylines: str = "".join(
+        '<polyline points="{}" fill="none" stroke="{}" stroke-width="1.5" '
+        'vector-effect="non-scaling-stroke" />'.format(
+            " ".join(
+                f"{day - first_day},{100 - values[index] * 100 / (maximum or 1):.1f}"
+                for day, values in history
+            ),
+            stat_colors[color_key],
+        )
+        for _, index, color_key in _TREND_LINES
+    )
+
+    return (
+        f'<svg width="160" height="28" viewBox="0 0 {days - 1} 100" '
+        f'preserveAspectRatio="none">{polylines}</svg>'
+    )
+
+
+def compile_subdeck_section(labels: Mapping[str, str]) -> str:
+    """Precompile the expandable section showing the subdecks' card counts.
+
+    The section only contains a placeholder for the rows, which have to be
+    rendered with `render_subdeck_rows` once the section is expanded.
+    """
+
+    return _SUBDECK_SECTION.format(
+        label=labels["subdecks"].rstrip(":"), message=SUBDECK_MESSAGE
+    )
+
+
+def render_subdeck_rows(
+    deck_name: str,
+    subdeck_stats: Sequence[Tuple[str, Sequence[int]]],
+    labels: Mapping[str, str],
+    correction_for_notes: int,
+) -> str:
+    """Render the card counts of every subdeck as a table.
+
+    Parameters
+    ----------
+    deck_name : str
+        The full name of the deck the subdecks belong to.
+    subdeck_stats : Sequence[Tuple[str, Sequence[int]]]
+        The full name and card counts of every subdeck, in the order of the
+        deck tree.
+    labels : Mapping[str, str]
+        The labels for all entries in the overview table.
+    correction_for_notes : int
+        The number of cards per note the card counts are divided by.
+
+    Returns
+    -------
+    str
+        The HTML code of the subdeck table.
+    """
+
+    if not subdeck_stats:
+        return '<p class="percent">No subdecks.</p>'
+
+    header: str = "".join(
+        f'<td class="col2 {key}">{labels[key].rstrip(":")}</td>'
+        for key, _ in SUBDECK_COLUMNS
+    )
+    rows: List[str] = [f'<tr><td class="col1"></td>{header}</tr>']
+
+    for name, card_counts in subdeck_stats:
+        # Show the names relative to the deck, indented by their depth
+        relative_name: str = name[len(deck_name) + len(DECK_SEPARATOR) :]
+        *parents, short_name = relative_name.split(DECK_SEPARATOR)
+
+        cells: str = "".join(
+            f"""
+            <td class="col2 {key}">{card_counts[index] // correction_for_notes:d}</td>"""
+            for key, index in SUBDECK_COLUMNS
+        )
+        rows.append(
+            _SUBDECK_ROW.format(
+                indent=len(parents), name=html.escape(short_name), cells=cells
+            )
+        )
+
+    return f"""
+        <table cellspacing="2">{"".join(rows)}
+        </table>"""
+
+
+def render_cell_values(section: SectionTemplate, stats: DeckStats) -> Dict[str, str]:
+    """Format the current numbers of a precompiled section by cell.
+
+    The values are formatted the same way on every render, so they can be
+    compared to the values of a previously rendered table.
+
+    Parameters
+    ----------
+    section : SectionTemplate
+        The section returned by `compile_section`.
+    stats : DeckStats
+        The stats of the deck.
+
+    Returns
+    -------
+    Dict[str, str]
+        The HTML content of every value cell by its data-cell name.
+    """
+
+    arrays: Tuple[array, ...] = (
+        stats.counts,
+        stats.percentages,
+        stats.percentages_without_suspended,
+    )
+    formatted: str = section.cell_format.format(
+        *[arrays[stat_array][index] for stat_array, index in section.stat_slots]
+    )
+
+    return dict(zip(section.cells, formatted.split(_CELL_SEPARATOR)))
+
+
+def render_section(section: SectionTemplate, values: Mapping[str, str]) -> str:
+    """Substitute already formatted cell values into a precompiled section.
+
+    Parameters
+    ----------
+    section : SectionTemplate
+        The section returned by `compile_section`.
+    values : Mapping[str, str]
+        The HTML content of at least the section's value cells by their
+        data-cell name, e.g. as returned by `render_cell_values`.
+
+    Returns
+    -------
+    str
+        The section's HTML code.
+    """
+
+    html: List[str] = [section.parts[0]]
+    for cell, part in zip(section.cells, section.parts[1:]):
+        html.append(values[cell])
+        html.append(part)
+
+    return "".join(html)
+
+
+def diff_cell_values(
+    old: Dict[str, str], new: Dict[str, str]
+) -> Optional[Dict[str, str]]:
+    """Return the cells whose content changed between two renders.
+
+    Parameters
+    ----------
+    old : Dict[str, str]
+        The cell values of the table shown in the webview.
+    new : Dict[str, str]
+        The current cell values.
+
+    Returns
+    -------
+    Optional[Dict[str, str]]
+        The changed cell values or None if the tables don't have the same
+        cells, i.e. the whole table has to be replaced.
+    """
+
+    if old.keys() != new.keys():
+        return None
+
+    return {name: value for name, value in new.items() if old[name] != value}
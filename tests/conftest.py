@@ -0,0 +1,80 @@
+"""
+Make the add-on's modules importable as `more_overview_stats` in the tests.
+
+The add-on's entry point (`__init__.py`) is skipped, so only modules that
+don't depend on Anki can be imported. Queries run against the `db` fixture,
+an in-memory SQLite db standing in for the collection's db.
+"""
+
+import os
+import sqlite3
+import sys
+import types
+from typing import Any, List
+
+import pytest
+
+ADDON_DIR: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_NAME: str = "more_overview_stats"
+
+if PACKAGE_NAME not in sys.modules:
+    package = types.ModuleType(PACKAGE_NAME)
+    package.__path__ = [ADDON_DIR]
+    sys.modules[PACKAGE_NAME] = package
+
+
+class CollectionDb:
+    """Runs queries like Anki's `mw.col.db` on an in-memory SQLite db.
+
+    Only holds the cards and revlog columns read by the add-on, and Anki's
+    indexes used by its queries.
+    """
+
+    def __init__(self) -> None:
+        self._connection = sqlite3.connect(":memory:")
+        self._connection.executescript(
+            """
+            create table cards (
+                id integer primary key, nid integer, did integer,
+                queue integer, ivl integer, due integer
+            );
+            create index ix_cards_nid on cards (nid);
+            create index ix_cards_sched on cards (did, queue, due);
+            create table revlog (
+                id integer primary key, cid integer, type integer,
+                lastIvl integer
+            );
+            """
+        )
+
+    def add_card(self, nid: int, did: int, queue: int, ivl: int = 0) -> int:
+        """Add a card and return its id."""
+
+        return self._connection.execute(
+            "insert into cards (nid, did, queue, ivl, due) values (?, ?, ?, ?, 0)",
+            (nid, did, queue, ivl),
+        ).lastrowid
+
+    def add_review(self, revlog_id: int, card_id: int, review_type: int) -> None:
+        """Add a review of a card at the time encoded in the revlog id."""
+
+        self._connection.execute(
+            "insert into revlog values (?, ?, ?, 0)",
+            (revlog_id, card_id, review_type),
+        )
+
+    def all(self, sql: str, *args: Any) -> List[List[Any]]:
+        return [list(row) for row in self._connection.execute(sql, args)]
+
+    def first(self, sql: str, *args: Any) -> List[Any]:
+        return list(self._connection.execute(sql, args).fetchone())
+
+    def scalar(self, sql: str, *args: Any) -> Any:
+        return self._connection.execute(sql, args).fetchone()[0]
+
+
+@pytest.fixture
+def db() -> CollectionDb:
+    """An empty collection db."""
+
+    return CollectionDb()
@@ -0,0 +1,92 @@
+from typing import List
+
+from more_overview_stats.cache import CardState, StatsCache
+
+NOW: int = 1_700_000_000
+PARENT: int = 1
+CHILD: int = 2
+OTHER: int = 3
+
+NEW: CardState = CardState(did=CHILD, queue=0, ivl=0, due=5)
+LEARNING: CardState = CardState(did=CHILD, queue=1, ivl=0, due=NOW + 600)
+MATURE: CardState = CardState(did=CHILD, queue=2, ivl=30, due=100)
+BURIED_MATURE: CardState = CardState(did=CHILD, queue=-3, ivl=30, due=100)
+
+
+# Return a cache with the counts of a parent deck, its child and another deck
+def make_cache(values: List[int], mod: int = 10) -> StatsCache:
+    cache = StatsCache()
+    cache.put(PARENT, mod, frozenset({PARENT, CHILD}), values, None)
+    cache.put(CHILD, mod, frozenset({CHILD}), values, None)
+    cache.put(OTHER, mod, frozenset({OTHER}), [7, 7, 0, 0, 0, 0, 0], None)
+    return cache
+
+
+def test_answered_card_moves_between_states() -> None:
+    # total, mature, young, unseen, buried, suspended, due
+    cache = make_cache([2, 1, 0, 1, 0, 0, 0])
+
+    cache.remember_cards([NEW, MATURE], 10)
+    cache.apply_card_changes([LEARNING, MATURE], 11, NOW)
+
+    assert cache.get(PARENT, 11, NOW) == [2, 1, 1, 0, 0, 0, 0]
+    assert cache.get(CHILD, 11, NOW) == [2, 1, 1, 0, 0, 0, 0]
+
+
+def test_buried_siblings_are_counted() -> None:
+    cache = make_cache([2, 1, 0, 1, 0, 0, 0])
+
+    cache.remember_cards([NEW, MATURE], 10)
+    cache.apply_card_changes([LEARNING, BURIED_MATURE], 11, NOW)
+
+    assert cache.get(CHILD, 11, NOW) == [2, 0, 1, 0, 1, 0, 0]
+
+
+def test_sibling_in_another_deck_only_changes_its_decks() -> None:
+    cache = make_cache([1, 0, 0, 1, 0, 0, 0])
+    sibling: CardState = MATURE._replace(did=OTHER)
+    buried_sibling: CardState = BURIED_MATURE._replace(did=OTHER)
+
+    cache.remember_cards([NEW, sibling], 10)
+    cache.apply_card_changes([LEARNING, buried_sibling], 11, NOW)
+
+    assert cache.get(CHILD, 11, NOW) == [1, 0, 1, 0, 0, 0, 0]
+    assert cache.get(OTHER, 11, NOW) == [7, 6, 0, 0, 1, 0, 0]
+
+
+def test_learning_card_sets_next_due_time() -> None:
+    cache = make_cache([1, 0, 0, 1, 0, 0, 0])
+
+    cache.remember_cards([NEW], 10)
+    cache.apply_card_changes([LEARNING], 11, NOW)
+
+    assert cache.get(CHILD, 11, NOW + 599) is not None
+    assert cache.get(CHILD, 11, NOW + 600) is None
+
+
+def test_stale_entries_are_left_untouched() -> None:
+    cache = make_cache([1, 0, 0, 1, 0, 0, 0], mod=9)
+
+    cache.remember_cards([NEW], 10)
+    cache.apply_card_changes([LEARNING], 11, NOW)
+
+    assert cache.get(CHILD, 11, NOW) is None
+    assert cache.get_last(CHILD) == [1, 0, 0, 1, 0, 0, 0]
+
+
+def test_note_counts_are_left_untouched() -> None:
+    cache = StatsCache()
+    cache.put(CHILD, 10, frozenset({CHILD}), [1, 0, 0, 1, 0, 0, 0], None, True)
+
+    cache.remember_cards([NEW], 10)
+    cache.apply_card_changes([LEARNING], 11, NOW)
+
+    assert cache.get(CHILD, 11, NOW, counts_notes=True) is None
+
+
+def test_change_without_remembered_cards_is_ignored() -> None:
+    cache = make_cache([1, 0, 0, 1, 0, 0, 0])
+
+    cache.apply_card_changes([LEARNING], 11, NOW)
+
+    assert cache.get(CHILD, 10, NOW) == [1, 0, 0, 1, 0, 0, 0]
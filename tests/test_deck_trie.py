@@ -0,0 +1,84 @@
+from typing import Any, Dict, Optional
+
+import pytest
+
+from more_overview_stats.deck_trie import DeckNameTrie, find_note_correction_factor
+
+FRAGMENTS: Dict[str, str] = {
+    "": "empty",
+    "Lang": "partial component",
+    "Languages": "component",
+    "Languages:": "half separator",
+    "Languages::": "separator",
+    "Languages::Span": "partial subdeck",
+    "Languages::Spanish::Verbs": "subdeck",
+    "Geo::": "separator only",
+}
+
+
+# Return the value of the longest fragment the deck name starts with, like the
+# config did before the fragments were looked up in a trie
+def scan_fragments(fragments: Dict[str, Any], deck_name: str) -> Optional[Any]:
+    match: Optional[Any] = None
+    match_length: int = 0
+
+    for fragment, value in fragments.items():
+        if deck_name.startswith(fragment) and len(fragment) > match_length:
+            match = value
+            match_length = len(fragment)
+
+    return match
+
+
+@pytest.mark.parametrize(
+    "deck_name, expected",
+    [
+        # Fragments may end in the middle of a component
+        ("Lan", None),
+        ("Lang", "partial component"),
+        ("Languages", "component"),
+        ("Languagesss", "component"),
+        # Fragments ending inside or after the separator only match subdecks
+        ("Languages::Japanese", "separator"),
+        ("Languages::Spa", "separator"),
+        ("Languages::Spanish", "partial subdeck"),
+        ("Languages::Spanish::Nouns", "partial subdeck"),
+        ("Languages::Spanish::Verbs", "subdeck"),
+        ("Languages::Spanish::Verbs::Irregular", "subdeck"),
+        ("Geo", None),
+        ("Geo::Rivers", "separator only"),
+        ("Geography::Rivers", None),
+        # The empty fragment never matches
+        ("History", None),
+        ("", None),
+    ],
+)
+def test_longest_fragment_the_deck_name_starts_with(
+    deck_name: str, expected: Optional[str]
+) -> None:
+    trie = DeckNameTrie(FRAGMENTS)
+
+    assert trie.longest_match(deck_name) == expected
+    assert scan_fragments(FRAGMENTS, deck_name) == expected
+
+
+def test_fragment_ending_inside_the_separator_of_a_longer_name() -> None:
+    trie = DeckNameTrie({"Languages:": "half separator"})
+
+    assert trie.longest_match("Languages") is None
+    assert trie.longest_match("Languages::Spanish") == "half separator"
+    assert trie.longest_match("Languages:Spanish") == "half separator"
+
+
+def test_default_is_returned_without_a_match() -> None:
+    trie = DeckNameTrie({"Languages": 2})
+
+    assert trie.longest_match("Geography", default=1) == 1
+
+
+def test_note_correction_factors_are_converted_and_at_least_one() -> None:
+    trie = DeckNameTrie({"Languages": "2", "Languages::Spanish": 0})
+
+    assert find_note_correction_factor(trie, "Languages::French") == 2
+    assert find_note_correction_factor(trie, "Languages::Spanish") == 1
+    assert find_note_correction_factor(trie, "Geography") == 1
@@ -0,0 +1,62 @@
+from typing import List
+
+from more_overview_stats import forecast as forecast_module
+from more_overview_stats.forecast import (
+    HISTORY_DAYS,
+    HORIZON_DAYS,
+    WORKLOAD_DAYS,
+    ForecastEngine,
+)
+
+DAY_CUTOFF: int = 1_700_000_000
+DECK_LIMIT: str = "(1)"
+
+
+# Add the same number of reviews of a card in the deck on every past day
+def add_history(db, new_cards_per_day: int, reviews_per_day: int) -> None:
+    card_id: int = db.add_card(nid=1, did=1, queue=2)
+
+    revlog_id: int = (DAY_CUTOFF - HISTORY_DAYS * 86400) * 1000
+    for _ in range(HISTORY_DAYS):
+        for review in range(reviews_per_day):
+            is_new: bool = review < new_cards_per_day
+            db.add_review(revlog_id + review, card_id, 0 if is_new else 1)
+        revlog_id += 86400 * 1000
+
+
+def test_forecast_is_based_on_the_pace(db) -> None:
+    add_history(db, 10, 30)
+    forecast = ForecastEngine().forecast(db, DECK_LIMIT, DAY_CUTOFF, 300, 1000, 0.0, 0)
+
+    assert forecast is not None
+    assert 30 <= forecast.days_low <= forecast.days_median <= forecast.days_high
+    assert forecast.days_high <= 60
+
+
+def test_futures_beyond_the_horizon_have_no_days(db, monkeypatch) -> None:
+    def fail(*args: object) -> List[int]:
+        raise AssertionError("futures that can't finish aren't simulated")
+
+    monkeypatch.setattr(forecast_module, "_simulate_vectorized", fail)
+    monkeypatch.setattr(forecast_module, "_simulate_sequential", fail)
+
+    add_history(db, 1, 2)
+    forecast = ForecastEngine().forecast(
+        db, DECK_LIMIT, DAY_CUTOFF, 10 * HORIZON_DAYS, 1000, 0.0, 0
+    )
+
+    assert forecast is not None
+    assert forecast.days_low is None
+    assert forecast.days_median is None
+    assert forecast.days_high is None
+
+
+def test_workload_stops_growing_once_the_deck_is_finished() -> None:
+    # 10 new cards and 20 other reviews a day, with 10 cards left to learn
+    reviews_per_day: float = forecast_module._project_workload(
+        [10, 10], [10, 10], [30, 30], 10, 1000
+    )
+
+    # The 20 reviews of 1000 cards grow to 20.2 with the 10 learned cards, and
+    # the first reviews of new cards stop after the first day
+    assert round(reviews_per_day, 6) == round(20 * 1.01 + 10 / WORKLOAD_DAYS, 6)
@@ -0,0 +1,86 @@
+import os
+import sqlite3
+
+from more_overview_stats import history as history_module
+from more_overview_stats.history import StatsHistory, counting_unit
+
+DECK: int = 1
+PROFILE: str = "User 1"
+
+
+# Return a history stored in a file in the given directory
+def make_history(directory: str) -> StatsHistory:
+    history = StatsHistory()
+    history.load(os.path.join(directory, "history.sqlite"), PROFILE)
+    return history
+
+
+def test_recorded_stats_are_read_back(tmp_path) -> None:
+    history = make_history(str(tmp_path))
+    history.record(DECK, 10, [1, 2, 3, 4, 5, 15])
+    history.record(DECK, 11, [2, 2, 2, 4, 5, 15])
+
+    assert make_history(str(tmp_path)).get_series(DECK, 0) == [
+        (10, [1, 2, 3, 4, 5, 15]),
+        (11, [2, 2, 2, 4, 5, 15]),
+    ]
+
+
+def test_failed_inserts_are_not_kept_in_memory(tmp_path, monkeypatch) -> None:
+    history = make_history(str(tmp_path))
+    history.record(DECK, 10, [1, 2, 3, 4, 5, 15])
+
+    def fail(*args: object) -> bytes:
+        raise sqlite3.OperationalError("database is locked")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(history_module, "_encode_deltas", fail)
+        history.record(DECK, 11, [2, 2, 2, 4, 5, 15])
+
+    assert history.get_series(DECK, 0) == [(10, [1, 2, 3, 4, 5, 15])]
+
+    history.record(DECK, 12, [3, 2, 1, 4, 5, 15])
+
+    assert make_history(str(tmp_path)).get_series(DECK, 0) == [
+        (10, [1, 2, 3, 4, 5, 15]),
+        (12, [3, 2, 1, 4, 5, 15]),
+    ]
+
+
+def test_recorded_days_are_not_checked_on_disk_again(tmp_path, monkeypatch) -> None:
+    history = make_history(str(tmp_path))
+    history.record(DECK, 10, [1, 2, 3, 4, 5, 15])
+
+    def fail(*args: object) -> None:
+        raise AssertionError("the history file isn't opened again")
+
+    monkeypatch.setattr(history_module, "_create_table", fail)
+    history.record(DECK, 10, [2, 2, 2, 4, 5, 15])
+
+    assert history.get_series(DECK, 0) == [(10, [1, 2, 3, 4, 5, 15])]
+
+
+def test_rows_recorded_by_another_process_are_encoded_against(tmp_path) -> None:
+    history = make_history(str(tmp_path))
+    other = make_history(str(tmp_path))
+    history.record(DECK, 10, [1, 2, 3, 4, 5, 15])
+    other.record(DECK, 11, [2, 2, 2, 4, 5, 15])
+    history.record(DECK, 12, [3, 2, 1, 4, 5, 15])
+
+    assert make_history(str(tmp_path)).get_series(DECK, 0)[-1] == (
+        12,
+        [3, 2, 1, 4, 5, 15],
+    )
+
+
+def test_counting_units_are_recorded_separately(tmp_path) -> None:
+    history = make_history(str(tmp_path))
+    cards: str = counting_unit(False, 1)
+    notes: str = counting_unit(True, 1)
+    history.record(DECK, 10, [2, 4, 6, 8, 10, 30], cards)
+    history.record(DECK, 10, [1, 2, 3, 4, 5, 15], notes)
+    history.record(DECK, 11, [1, 2, 3, 4, 5, 15], counting_unit(False, 2))
+
+    assert history.get_series(DECK, 0, cards) == [(10, [2, 4, 6, 8, 10, 30])]
+    assert history.get_series(DECK, 0, notes) == [(10, [1, 2, 3, 4, 5, 15])]
+    assert counting_unit(False, 2) == "cards/2"
@@ -0,0 +1,65 @@
+from typing import List, Optional, Tuple
+
+import pytest
+
+from more_overview_stats.query import QueryPlanner, roll_up_deck_tree
+
+NOW: int = 1_700_000_000
+PARENT: int = 1
+LEFT: int = 2
+RIGHT: int = 3
+
+
+def test_notes_in_two_subdecks_are_counted_once_in_the_parent(db) -> None:
+    # A note with an unseen card in one subdeck and a mature one in the other
+    db.add_card(nid=1, did=LEFT, queue=0)
+    db.add_card(nid=1, did=RIGHT, queue=2, ivl=30)
+    db.add_card(nid=2, did=RIGHT, queue=2, ivl=30)
+
+    _, deck_ids = roll_up_deck_tree(
+        {PARENT: "Parent", LEFT: "Parent::Left", RIGHT: "Parent::Right"}, {}
+    )
+    counts = QueryPlanner().query_note_counts_by_tree(db, NOW, deck_ids)
+
+    # total, mature, young, unseen, buried, suspended, due
+    assert counts[PARENT][:7] == [2, 1, 0, 1, 0, 0, 0]
+    assert counts[LEFT][:7] == [1, 0, 0, 1, 0, 0, 0]
+    assert counts[RIGHT][:7] == [2, 2, 0, 0, 0, 0, 0]
+
+
+@pytest.mark.parametrize("count_notes", [False, True])
+@pytest.mark.parametrize("chunk_size", [1, 3, 100])
+def test_streamed_counts_match_the_single_query(
+    db, count_notes: bool, chunk_size: int
+) -> None:
+    # Cards of other decks between the counted ones, and notes with cards in
+    # both counted decks
+    for nid in range(1, 21):
+        db.add_card(nid=nid, did=LEFT, queue=nid % 4, ivl=nid * 3)
+        db.add_card(nid=nid, did=PARENT, queue=2, ivl=30)
+        if nid % 3 == 0:
+            db.add_card(nid=nid, did=RIGHT, queue=-1)
+
+    deck_limit: str = f"({LEFT:d}, {RIGHT:d})"
+    planner = QueryPlanner()
+    expected: Tuple[List[int], Optional[int]] = (
+        planner.query_note_counts(db, deck_limit, NOW)
+        if count_notes
+        else planner.query_card_counts(db, deck_limit, NOW)
+    )
+
+    streamed = list(
+        planner.stream_counts(db, deck_limit, NOW, count_notes, chunk_size)
+    )
+
+    assert streamed[-1] == expected
+    if chunk_size < 20:
+        assert len(streamed) > 1
+
+
+def test_no_count_query_scans_the_whole_cards_table(db) -> None:
+    planner = QueryPlanner()
+    deck_limit: str = f"({PARENT:d}, {LEFT:d})"
+
+    assert len(planner.explain(db, deck_limit)) == 9
+    assert planner.find_full_table_scans(db, deck_limit) == []
@@ -0,0 +1,109 @@
+from concurrent.futures import Future
+from types import SimpleNamespace
+from typing import Any, Callable, List, Tuple
+
+import pytest
+
+from more_overview_stats import scheduler as scheduler_module
+from more_overview_stats.scheduler import RefreshScheduler
+
+WINDOW: float = 0.5
+
+
+class FakeClock:
+    """Stands in for the `time` module, advanced by hand."""
+
+    def __init__(self) -> None:
+        self.now: float = 100.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+class FakeRunner:
+    """Keeps background tasks until they are finished by hand."""
+
+    def __init__(self) -> None:
+        self.running: List[Tuple[Callable[[], Any], Callable[[Future], None]]] = []
+
+    def __call__(
+        self, task: Callable[[], Any], on_done: Callable[[Future], None]
+    ) -> None:
+        self.running.append((task, on_done))
+
+    def finish(self) -> None:
+        task, on_done = self.running.pop(0)
+        future: Future = Future()
+        future.set_result(task())
+        on_done(future)
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    fake_clock = FakeClock()
+    monkeypatch.setattr(
+        scheduler_module, "time", SimpleNamespace(monotonic=fake_clock.monotonic)
+    )
+    return fake_clock
+
+
+def test_refreshes_of_the_same_key_are_reused_within_the_window(clock) -> None:
+    scheduler = RefreshScheduler(FakeRunner(), WINDOW)
+    refreshes: List[int] = []
+
+    assert scheduler.refresh((1, 10), lambda: refreshes.append(1))
+    clock.now += WINDOW / 2
+    assert not scheduler.refresh((1, 10), lambda: refreshes.append(2))
+    # Another deck or collection state is refreshed right away
+    assert scheduler.refresh((1, 11), lambda: refreshes.append(3))
+
+    assert refreshes == [1, 3]
+
+
+def test_the_window_expires_even_if_requests_keep_coming(clock) -> None:
+    scheduler = RefreshScheduler(FakeRunner(), WINDOW)
+    refreshes: List[float] = []
+
+    for _ in range(8):
+        scheduler.refresh((1, 10), lambda: refreshes.append(clock.now))
+        clock.now += WINDOW / 4
+
+    # Absorbed requests don't extend the window
+    assert refreshes == [100.0, 100.0 + WINDOW]
+
+
+def test_cleared_scheduler_refreshes_again(clock) -> None:
+    scheduler = RefreshScheduler(FakeRunner(), WINDOW)
+    scheduler.refresh((1, 10), lambda: None)
+
+    scheduler.clear()
+
+    assert scheduler.refresh((1, 10), lambda: None)
+
+
+def test_running_computations_are_shared() -> None:
+    runner = FakeRunner()
+    scheduler = RefreshScheduler(runner, WINDOW)
+    tasks: List[int] = []
+    results: List[Tuple[str, int]] = []
+
+    def task() -> int:
+        tasks.append(1)
+        return 42
+
+    scheduler.run_in_background(
+        (1, 10), task, lambda future: results.append(("first", future.result()))
+    )
+    scheduler.run_in_background(
+        (1, 10), task, lambda future: results.append(("second", future.result()))
+    )
+    assert len(runner.running) == 1
+
+    runner.finish()
+
+    assert tasks == [1]
+    assert results == [("first", 42), ("second", 42)]
+
+    # Finished computations aren't shared anymore
+    scheduler.run_in_background((1, 10), task, lambda future: None)
+    assert len(runner.running) == 1
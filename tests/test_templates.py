@@ -0,0 +1,22 @@
+from more_overview_stats.templates import diff_cell_values
+
+
+def test_only_changed_cells_are_returned() -> None:
+    old = {"mature": "10", "mature.percent": "50%", "doneDate": "01.01.2027"}
+    new = {"mature": "11", "mature.percent": "50%", "doneDate": "02.01.2027"}
+
+    assert diff_cell_values(old, new) == {"mature": "11", "doneDate": "02.01.2027"}
+
+
+def test_unchanged_tables_have_no_changed_cells() -> None:
+    values = {"mature": "10", "mature.percent": "50%"}
+
+    assert diff_cell_values(values, dict(values)) == {}
+
+
+def test_tables_with_other_cells_are_replaced() -> None:
+    # e.g. the deck was finished, which hides the study rows
+    old = {"new": "20", "mature": "10"}
+
+    assert diff_cell_values(old, {"deckName": "Default", "mature": "10"}) is None
+    assert diff_cell_values(old, {"mature": "10"}) is None